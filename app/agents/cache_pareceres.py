@@ -0,0 +1,111 @@
+"""
+Cache de pareceres de IA — SEPET
+Guarda o resultado do pipeline por um hash canônico das entradas que
+chegam ao LLM: as respostas do questionário e os dados do pet usados em
+`_montar_contexto`, particionado pela versão dos prompts.
+
+O nome do pet não entra na chave: ele é trocado por um marcador antes de
+gravar e reinserido na leitura, então triagens idênticas de animais
+diferentes compartilham o mesmo parecer. A troca só pega o nome com a
+grafia exata; nomes que também são palavras do vocabulário do parecer
+(ex.: "Alto", "Risco", "Apto") não têm como ser separados do texto, e o
+parecer desses animais não vai para o cache.
+"""
+import hashlib
+import json
+import re
+
+from app.config import (
+    CACHE_PARECERES_CAPACIDADE,
+    CACHE_PARECERES_DB,
+    CACHE_PARECERES_TTL_SEGUNDOS,
+)
+from app.services.cache import CacheLRU
+
+# Campos de `pet_info` que entram no contexto enviado ao LLM (exceto o nome)
+CAMPOS_PET_CHAVE = (
+    "pet_especie",
+    "pet_raca",
+    "pet_porte",
+    "pet_idade_anos",
+    "pet_idade_meses",
+    "pet_peso_kg",
+    "pet_sexo",
+)
+
+# Campo nominal trocado por um marcador no parecer armazenado
+CAMPO_NOME = "pet_nome"
+
+# Palavras dos vereditos e pareceres: um nome igual a uma delas não é trocado
+_VOCABULARIO_PARECER = frozenset({
+    "alto", "baixo", "risco", "riscos", "apto", "apta", "inapto", "inapta",
+    "veredito", "alerta", "atenção", "achados", "procedimento", "cirurgia",
+    "anestesia", "anestésico", "jejum", "parecer", "avaliação", "presencial",
+    "sim", "não",
+})
+
+_cache = CacheLRU(
+    "pareceres",
+    capacidade=CACHE_PARECERES_CAPACIDADE,
+    ttl_segundos=CACHE_PARECERES_TTL_SEGUNDOS,
+    caminho_sqlite=CACHE_PARECERES_DB,
+)
+
+
+def _normalizar(valor):
+    if isinstance(valor, str):
+        return " ".join(valor.split()).casefold()
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def chave_parecer(respostas: dict, pet_info: dict, versao: str) -> str:
+    """Hash canônico das entradas do pipeline, prefixado pela versão dos prompts."""
+    canonico = {
+        "respostas": {
+            campo: _normalizar(valor)
+            for campo, valor in respostas.items()
+            if not campo.startswith("_meta")
+        },
+        "pet": {campo: _normalizar(pet_info.get(campo)) for campo in CAMPOS_PET_CHAVE},
+    }
+    serializado = json.dumps(canonico, sort_keys=True, ensure_ascii=False)
+    return f"{versao}:{hashlib.sha256(serializado.encode()).hexdigest()}"
+
+
+def _marcador(campo: str) -> str:
+    return f"⟦{campo}⟧"
+
+
+def obter(respostas: dict, pet_info: dict, versao: str) -> dict | None:
+    """Retorna o parecer em cache com os nomes desta triagem, ou None."""
+    armazenado = _cache.obter(chave_parecer(respostas, pet_info, versao))
+    if armazenado is None:
+        return None
+
+    parecer = armazenado["parecer_ia"].replace(
+        _marcador(CAMPO_NOME), str(pet_info.get(CAMPO_NOME) or "")
+    )
+
+    return {**armazenado, "parecer_ia": parecer, "cache": True}
+
+
+def gravar(respostas: dict, pet_info: dict, versao: str, resultado: dict) -> None:
+    """Armazena o resultado trocando o nome do pet por um marcador."""
+    parecer = resultado["parecer_ia"]
+    nome = str(pet_info.get(CAMPO_NOME) or "").strip()
+    if nome:
+        if any(palavra.casefold() in _VOCABULARIO_PARECER for palavra in nome.split()):
+            # Trocar o nome corromperia o veredito; guardá-lo vazaria o nome
+            return
+        padrao = rf"(?<!\w){re.escape(nome)}(?!\w)"
+        parecer = re.sub(padrao, _marcador(CAMPO_NOME), parecer)
+        if re.search(padrao, parecer, re.IGNORECASE):
+            # O nome ainda aparece com outra caixa ("REX"): não vai para o cache
+            return
+
+    _cache.gravar(
+        chave_parecer(respostas, pet_info, versao),
+        {**resultado, "parecer_ia": parecer},
+    )
@@ -1,31 +1,102 @@
 """
 Agente Analista Clínico — SEPET  (Multi-Agent com LangChain)
-Orquestra 3 etapas sequenciais para analisar triagem veterinária:
+No modo `multi` (padrão), orquestra 3 etapas sequenciais para analisar
+a triagem veterinária:
   1. Lupa   – Analista de Triagem (extrai e organiza dados)
   2. Juiz   – Verificador de Riscos (emite alerta_risco)
   3. Relator – Redator Clínico (gera parecer humanizado)
 
+No modo `single` (`ANALISE_MODO=single`), faz uma única chamada com saída
+estruturada (JSON Schema), dispensando a extração por regex.
+
 Usa MiniMax-Text-01 como LLM via ChatOpenAI (compatível OpenAI).
+
+Antes do LLM, o motor de regras (`app.agents.regras`) avalia as regras
+obrigatórias. Quando uma regra de alto risco dispara, o veredito já está
+decidido: o Juiz é pulado e os achados das regras vão direto ao Relator.
+O campo `caminho` do resultado indica qual rota foi seguida:
+  - "llm"      – Lupa → Juiz → Relator
+  - "regras"   – Lupa → Relator, veredito decidido pelas regras
+  - "fallback" – análise determinística (LLM indisponível)
+
+Pareceres gerados pelo LLM ficam em cache (`app.agents.cache_pareceres`),
+particionado por `VERSAO_PROMPTS`; um acerto devolve o resultado sem
+nenhuma chamada ao LLM.
+
+`analisar_triagem_async` é a versão usada pelas rotas: chama a API assíncrona
+do LLM sem bloquear o event loop do uvicorn. Cada análise ocupa uma vaga
+do limitador (`app.agents.limitador`) do início ao fim, com limite global,
+cotas por tenant e fila justa entre tenants; com a fila do tenant cheia,
+`LimiteExcedido` é propagado antes da primeira etapa, em vez de cair no
+fallback. Dentro da vaga, `app.agents.resiliencia`
+aplica o prazo de cada etapa, novas tentativas com jitter, hedge e o
+disjuntor: com o circuito aberto, a análise vai direto para o fallback.
+`analisar_triagem` é o atalho síncrono para scripts.
+`analisar_triagem_stream` emite eventos de cada etapa e os tokens do Relator
+conforme são gerados (usado pelo endpoint SSE).
 """
+import asyncio
+import hashlib
 import json
 import logging
 import re
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable
 
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from app.config import MINIMAX_API_KEY
+from pydantic import BaseModel, Field
+from app import metricas
+from app.agents import cache_pareceres, limitador, resiliencia
+from app.agents.limitador import LimiteExcedido
+from app.agents.regras import ResultadoRegras, avaliar_regras
+from app.config import (
+    ANALISE_MODO,
+    LLM_PRAZO_JUIZ_SEGUNDOS,
+    LLM_PRAZO_LUPA_SEGUNDOS,
+    LLM_PRAZO_RELATOR_SEGUNDOS,
+    LLM_PRAZO_UNICO_SEGUNDOS,
+    MINIMAX_API_KEY,
+    MINIMAX_BASE_URL,
+    REGRAS_TRIAGEM_PATH,
+)
 
 logger = logging.getLogger("sepet.agente_clinico")
 
+ETAPA_LUPA = "lupa"
+ETAPA_JUIZ = "juiz"
+ETAPA_RELATOR = "relator"
+ETAPA_UNICO = "unico"
+
+# Prazo de cada etapa, incluindo novas tentativas (ver `app.agents.resiliencia`)
+PRAZOS_ETAPA = {
+    ETAPA_LUPA: LLM_PRAZO_LUPA_SEGUNDOS,
+    ETAPA_JUIZ: LLM_PRAZO_JUIZ_SEGUNDOS,
+    ETAPA_RELATOR: LLM_PRAZO_RELATOR_SEGUNDOS,
+    ETAPA_UNICO: LLM_PRAZO_UNICO_SEGUNDOS,
+}
+
 # ── LLM MiniMax ──────────────────────────────
+# Sem retries no cliente: as tentativas são feitas dentro do prazo da etapa
 llm = ChatOpenAI(
     model="MiniMax-Text-01",
     api_key=MINIMAX_API_KEY,
-    base_url="https://api.minimaxi.chat/v1",
+    base_url=MINIMAX_BASE_URL,
     temperature=0.3,
     max_tokens=1000,
+    stream_usage=True,
+    timeout=max(PRAZOS_ETAPA.values()),
+    max_retries=0,
 )
 
+MODO_MULTI = "multi"
+MODO_SINGLE = "single"
+
+CAMINHO_LLM = "llm"
+CAMINHO_REGRAS = "regras"
+CAMINHO_FALLBACK = "fallback"
+
 
 # ── Prompts dos agentes ──────────────────────
 
@@ -37,8 +108,8 @@ PROMPT_LUPA = (
     "garantindo que nenhuma informação vital seja omitida.\n\n"
     "Apresente um relatório organizado com:\n"
     "- Dados completos do animal (nome, espécie, raça, porte, peso, sexo, idade exata)\n"
-    "- Todas as respostas do questionário listadas\n"
-    "- Destaque para respostas positivas (sinais clínicos)\n"
+    "- Os sinais clínicos positivos do questionário (os ausentes são negativos)\n"
+    "- As respostas obrigatórias: jejum, consentimento anestésico e vacinas\n"
 )
 
 PROMPT_JUIZ = (
@@ -69,99 +140,446 @@ PROMPT_RELATOR = (
     "Onde 'alerta_risco' reflete o veredito do Auditor."
 )
 
+# Variante do Relator para streaming: texto corrido, sem JSON, pois o
+# veredito já vem do Juiz (ou das regras) antes do primeiro token.
+PROMPT_RELATOR_TEXTO = (
+    "Você é o Redator Médico Veterinário do SEPET. "
+    "Com base no relatório e no veredito abaixo, redija o parecer técnico final.\n\n"
+    "O parecer deve:\n"
+    "- Mencionar o nome e a idade exata do animal\n"
+    "- Listar os riscos identificados (se houver)\n"
+    "- Indicar se o animal é geriátrico\n"
+    "- Incluir recomendação final\n\n"
+    "Responda apenas com o texto do parecer, sem JSON e sem markdown."
+)
 
-# ── Função principal ─────────────────────────
+PROMPT_UNICO = (
+    "Você é o Médico Veterinário responsável pela triagem pré-cirúrgica do SEPET "
+    "(Serviço de Esterilização de Pets). Analise os dados do animal e TODAS as "
+    "respostas do questionário de triagem.\n\n"
+    "Regras obrigatórias:\n"
+    "- Se 'entendeu_risco_anestesico' = false → ALTO RISCO\n"
+    "- Se há desmaio, convulsão ou dificuldade respiratória → ALTO RISCO\n"
+    "- Se 'jejum_12h' = false → ALTO RISCO (não pode prosseguir)\n"
+    "- Animais com 7+ anos → atenção especial (geriátricos)\n"
+    "- Uso de medicação que pode interferir → risco adicional\n\n"
+    "O parecer técnico deve:\n"
+    "- Mencionar o nome e a idade exata do animal\n"
+    "- Listar os riscos identificados (se houver)\n"
+    "- Indicar se o animal é geriátrico\n"
+    "- Incluir recomendação final\n\n"
+    "Se houver ACHADOS DAS REGRAS OBRIGATÓRIAS, o veredito é ALTO RISCO."
+)
 
-def analisar_triagem(respostas_triagem: dict, pet_info: dict) -> dict:
+
+class ParecerEstruturado(BaseModel):
+    """Esquema da resposta do modo `single` (structured output)."""
+    alerta_risco: bool = Field(
+        ..., description="true se o veredito for ALTO RISCO, false se BAIXO RISCO"
+    )
+    riscos: list[str] = Field(
+        default_factory=list, description="Riscos identificados, com justificativa"
+    )
+    parecer_ia: str = Field(..., description="Parecer técnico final, humanizado")
+
+
+_llm_estruturado = llm.with_structured_output(
+    ParecerEstruturado, method="json_schema", include_raw=True
+)
+
+
+# Respostas enviadas ao LLM mesmo quando negativas (regras obrigatórias)
+CAMPOS_OBRIGATORIOS = ("jejum_12h", "entendeu_risco_anestesico", "vacinas_em_dia")
+
+# Versão do formato de `_montar_contexto`; entra na versão do cache
+VERSAO_CONTEXTO = "2"
+
+# Muda sempre que os prompts, as regras ou o contexto mudam, invalidando o cache
+VERSAO_PROMPTS = hashlib.sha256(
+    (VERSAO_CONTEXTO + PROMPT_LUPA + PROMPT_JUIZ + PROMPT_RELATOR + PROMPT_RELATOR_TEXTO + PROMPT_UNICO).encode()
+    + Path(REGRAS_TRIAGEM_PATH).read_bytes()
+).hexdigest()[:12]
+
+
+# ── Funções principais ───────────────────────
+
+async def analisar_triagem_async(
+    respostas_triagem: dict,
+    pet_info: dict,
+    modo: str | None = None,
+) -> dict:
     """
-    Analisa o questionário de triagem usando 3 etapas sequenciais com LangChain.
+    Analisa o questionário de triagem chamando o LLM de forma assíncrona.
 
     Args:
         respostas_triagem: dict com as respostas do questionário
         pet_info: dict com informações do pet (nome, espécie, raça, idade, porte, peso)
+        modo: "multi" ou "single"; por padrão usa `ANALISE_MODO`
 
     Returns:
-        dict com { alerta_risco: bool, parecer_ia: str }
+        dict com { alerta_risco: bool, parecer_ia: str, caminho: str, modo: str }
+
+    Raises:
+        LimiteExcedido: a fila do tenant no limitador do LLM está cheia
     """
-    contexto = _montar_contexto(respostas_triagem, pet_info)
+    modo = modo or ANALISE_MODO
+    versao = f"{VERSAO_PROMPTS}-{modo}"
     nome = pet_info.get("pet_nome", "N/A")
 
+    em_cache = cache_pareceres.obter(respostas_triagem, pet_info, versao)
+    if em_cache is not None:
+        logger.info("Parecer IA para %s servido do cache", nome)
+        metricas.registrar_resultado(em_cache)
+        return em_cache
+
     try:
-        logger.info(f"Iniciando análise multi-agente LangChain para {nome}...")
+        resultado = await executar_pipeline(respostas_triagem, pet_info, modo)
+    except LimiteExcedido:
+        raise
+    except resiliencia.CircuitoAberto as e:
+        logger.warning("Parecer IA para %s pelo fallback: %s", nome, e)
+        resultado = _analise_fallback(respostas_triagem, pet_info, modo)
+    except Exception as e:
+        logger.error("Erro ao gerar parecer IA (LangChain): %s", e)
+        resultado = _analise_fallback(respostas_triagem, pet_info, modo)
+    else:
+        cache_pareceres.gravar(respostas_triagem, pet_info, versao, resultado)
 
-        # ── Etapa 1: Lupa extrai e organiza ──
-        logger.info("[Lupa] Extraindo dados...")
-        resp_lupa = llm.invoke([
-            SystemMessage(content=PROMPT_LUPA),
-            HumanMessage(content=contexto),
-        ])
-        saida_lupa = resp_lupa.content
-        logger.info(f"[Lupa] Concluído ({len(saida_lupa)} chars)")
+    metricas.registrar_resultado(resultado)
+    return resultado
 
-        # ── Etapa 2: Juiz verifica riscos ──
-        logger.info("[Juiz] Verificando riscos...")
-        resp_juiz = llm.invoke([
-            SystemMessage(content=PROMPT_JUIZ),
-            HumanMessage(content=f"RELATÓRIO DO ANALISTA:\n\n{saida_lupa}"),
-        ])
-        saida_juiz = resp_juiz.content
-        logger.info(f"[Juiz] Concluído ({len(saida_juiz)} chars)")
-
-        # ── Etapa 3: Relator redige parecer ──
-        logger.info("[Relator] Redigindo parecer...")
-        resp_relator = llm.invoke([
-            SystemMessage(content=PROMPT_RELATOR),
-            HumanMessage(
-                content=(
-                    f"RELATÓRIO DO ANALISTA:\n\n{saida_lupa}\n\n"
-                    f"VEREDITO DO AUDITOR:\n\n{saida_juiz}"
-                )
-            ),
-        ])
-        saida_relator = resp_relator.content
-        logger.info(f"[Relator] Concluído ({len(saida_relator)} chars)")
-
-        # Extrair JSON da resposta do Relator
-        resultado = _extrair_json(saida_relator)
-
-        logger.info(
-            f"Parecer IA gerado para {nome}: "
-            f"alerta_risco={resultado.get('alerta_risco', False)}"
-        )
 
-        return {
-            "alerta_risco": resultado.get("alerta_risco", False),
-            "parecer_ia": resultado.get("parecer_ia", "Parecer não disponível."),
-        }
+def analisar_triagem(
+    respostas_triagem: dict,
+    pet_info: dict,
+    modo: str | None = None,
+) -> dict:
+    """
+    Versão síncrona de `analisar_triagem_async`, para scripts e contextos
+    sem event loop (não pode ser chamada de dentro de um loop em execução).
+    """
+    return asyncio.run(analisar_triagem_async(respostas_triagem, pet_info, modo))
+
 
+async def analisar_triagem_stream(
+    respostas_triagem: dict,
+    pet_info: dict,
+) -> AsyncIterator[dict]:
+    """
+    Executa o pipeline multi-agente emitindo eventos conforme ele avança:
+    `lupa_inicio`, `lupa_fim`, `juiz_inicio`, `juiz_veredito`, `relator_inicio`,
+    `token` (trechos do parecer) e, por fim, `resultado`. Se o LLM falhar,
+    emite `erro` seguido do `resultado` do fallback determinístico. Se a
+    fila do tenant no limitador estiver cheia, emite só `erro` (com
+    `retry_after`) e encerra sem resultado.
+    """
+    versao = f"{VERSAO_PROMPTS}-{MODO_MULTI}"
+    nome = pet_info.get("pet_nome", "N/A")
+
+    em_cache = cache_pareceres.obter(respostas_triagem, pet_info, versao)
+    if em_cache is not None:
+        logger.info("Parecer IA para %s servido do cache (stream)", nome)
+        metricas.registrar_resultado(em_cache)
+        yield {"evento": "resultado", **em_cache}
+        return
+
+    # O pipeline roda numa tarefa à parte, que ocupa a vaga do limitador e
+    # repassa os eventos por uma fila: o tempo que o cliente SSE leva para
+    # consumi-los não ocupa a vaga nem conta no prazo das etapas
+    fila: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def produzir() -> None:
+        try:
+            await _pipeline_stream(respostas_triagem, pet_info, versao, fila.put_nowait)
+        finally:
+            fila.put_nowait(None)
+
+    tarefa = asyncio.create_task(produzir())
+    try:
+        while (evento := await fila.get()) is not None:
+            yield evento
+        await tarefa
+    finally:
+        # Cliente desconectado: a análise em andamento é abandonada
+        tarefa.cancel()
+
+
+async def _pipeline_stream(
+    respostas_triagem: dict,
+    pet_info: dict,
+    versao: str,
+    emitir: Callable[[dict], None],
+) -> None:
+    """Pipeline multi-agente de `analisar_triagem_stream`, emitindo os eventos."""
+    nome = pet_info.get("pet_nome", "N/A")
+    regras = avaliar_regras(respostas_triagem, pet_info)
+    contexto = _montar_contexto(respostas_triagem, pet_info)
+
+    try:
+        async with limitador.vaga(metricas.tenant_atual.get()):
+            emitir({"evento": "lupa_inicio"})
+            saida_lupa = await _ainvocar(_mensagens_lupa(contexto), ETAPA_LUPA)
+            emitir({"evento": "lupa_fim", "caracteres": len(saida_lupa)})
+
+            if regras.veredito_decidido:
+                saida_juiz = regras.veredito_texto()
+                alerta = True
+            else:
+                emitir({"evento": "juiz_inicio"})
+                saida_juiz = await _ainvocar(_mensagens_juiz(saida_lupa), ETAPA_JUIZ)
+                alerta = _veredito_juiz(saida_juiz)
+            emitir({
+                "evento": "juiz_veredito",
+                "alerta_risco": alerta,
+                "regras_disparadas": regras.regras_disparadas,
+            })
+
+            emitir({"evento": "relator_inicio"})
+            partes = []
+            uso = None
+            async with resiliencia.protegido(ETAPA_RELATOR, PRAZOS_ETAPA[ETAPA_RELATOR]):
+                inicio = time.perf_counter()
+                async for trecho in llm.astream(
+                    _mensagens_relator(saida_lupa, saida_juiz, PROMPT_RELATOR_TEXTO)
+                ):
+                    if trecho.usage_metadata:
+                        uso = trecho.usage_metadata
+                    if trecho.content:
+                        partes.append(trecho.content)
+                        emitir({"evento": "token", "texto": trecho.content})
+                metricas.registrar_etapa(ETAPA_RELATOR, time.perf_counter() - inicio, uso)
+
+        resultado = _resultado_final(
+            alerta, "".join(partes).strip(), nome, regras, MODO_MULTI
+        )
+    except LimiteExcedido as e:
+        # Sem fallback: a análise fica para quando houver vaga
+        emitir({"evento": "erro", "detalhe": str(e), "retry_after": e.retry_after})
+        return
     except Exception as e:
-        logger.error(f"Erro ao gerar parecer IA (LangChain): {e}")
-        return _analise_fallback(respostas_triagem, pet_info)
+        logger.error("Erro ao gerar parecer IA em streaming (LangChain): %s", e)
+        emitir({"evento": "erro", "detalhe": str(e)})
+        resultado = _analise_fallback(respostas_triagem, pet_info, MODO_MULTI)
+    else:
+        cache_pareceres.gravar(respostas_triagem, pet_info, versao, resultado)
+
+    metricas.registrar_resultado(resultado)
+    emitir({"evento": "resultado", **resultado})
+
+
+async def executar_pipeline(respostas_triagem: dict, pet_info: dict, modo: str) -> dict:
+    """
+    Executa o pipeline do modo pedido, sem cache e sem fallback.
+    Erros do LLM são propagados (usado também pelo benchmark de modos).
+
+    A análise inteira ocupa uma única vaga do limitador: a admissão
+    (`LimiteExcedido`) acontece antes da primeira etapa, nunca depois de
+    a Lupa já ter sido paga.
+    """
+    if modo not in (MODO_SINGLE, MODO_MULTI):
+        raise ValueError(f"Modo de análise inválido: {modo!r}")
+    regras = avaliar_regras(respostas_triagem, pet_info)
+    contexto = _montar_contexto(respostas_triagem, pet_info)
+
+    async with limitador.vaga(metricas.tenant_atual.get()):
+        if modo == MODO_SINGLE:
+            return await _pipeline_single(contexto, pet_info, regras)
+        return await _pipeline_multi(contexto, pet_info, regras)
+
+
+async def _pipeline_multi(contexto: str, pet_info: dict, regras: ResultadoRegras) -> dict:
+    """Lupa → Juiz → Relator, com o Juiz pulado quando as regras já decidiram."""
+    nome = pet_info.get("pet_nome", "N/A")
+    logger.info("Iniciando análise multi-agente LangChain para %s...", nome)
+
+    # ── Etapa 1: Lupa extrai e organiza ──
+    logger.info("[Lupa] Extraindo dados...")
+    saida_lupa = await _ainvocar(_mensagens_lupa(contexto), ETAPA_LUPA)
+    logger.info("[Lupa] Concluído (%s chars)", len(saida_lupa))
+
+    # ── Etapa 2: Juiz verifica riscos (pulado se as regras já decidiram) ──
+    if regras.veredito_decidido:
+        logger.info("[Juiz] Pulado — regras disparadas: %s", regras.regras_disparadas)
+        saida_juiz = regras.veredito_texto()
+    else:
+        logger.info("[Juiz] Verificando riscos...")
+        saida_juiz = await _ainvocar(_mensagens_juiz(saida_lupa), ETAPA_JUIZ)
+        logger.info("[Juiz] Concluído (%s chars)", len(saida_juiz))
+
+    # ── Etapa 3: Relator redige parecer ──
+    logger.info("[Relator] Redigindo parecer...")
+    saida_relator = await _ainvocar(
+        _mensagens_relator(saida_lupa, saida_juiz), ETAPA_RELATOR
+    )
+    logger.info("[Relator] Concluído (%s chars)", len(saida_relator))
+
+    resultado = _extrair_json(saida_relator)
+    return _resultado_final(
+        resultado.get("alerta_risco", False),
+        resultado.get("parecer_ia", "Parecer não disponível."),
+        nome,
+        regras,
+        MODO_MULTI,
+    )
+
+
+async def _pipeline_single(contexto: str, pet_info: dict, regras: ResultadoRegras) -> dict:
+    """Uma única chamada com saída estruturada validada pelo JSON Schema."""
+    nome = pet_info.get("pet_nome", "N/A")
+    logger.info("[Único] Iniciando análise em chamada única para %s...", nome)
+
+    if regras.achados:
+        achados = "\n".join(f"- {achado}" for achado in regras.achados)
+        contexto = f"{contexto}\n\nACHADOS DAS REGRAS OBRIGATÓRIAS:\n{achados}"
+
+    inicio = time.perf_counter()
+    saida = await resiliencia.executar(
+        ETAPA_UNICO,
+        PRAZOS_ETAPA[ETAPA_UNICO],
+        lambda: _llm_estruturado.ainvoke([
+            SystemMessage(content=PROMPT_UNICO),
+            HumanMessage(content=contexto),
+        ]),
+    )
+    metricas.registrar_etapa(
+        ETAPA_UNICO,
+        time.perf_counter() - inicio,
+        getattr(saida["raw"], "usage_metadata", None),
+    )
+    if saida["parsing_error"] is not None:
+        raise saida["parsing_error"]
+
+    parecer: ParecerEstruturado = saida["parsed"]
+    logger.info("[Único] Concluído (%s chars)", len(parecer.parecer_ia))
+
+    return _resultado_final(
+        parecer.alerta_risco, parecer.parecer_ia, nome, regras, MODO_SINGLE
+    )
 
 
 # ── Helpers ───────────────────────────────────
 
+async def _ainvocar(mensagens: list, etapa: str) -> str:
+    """
+    Chama o LLM de forma assíncrona com o prazo, as novas tentativas e o
+    disjuntor da etapa (a vaga do limitador é da análise inteira).
+    """
+    inicio = time.perf_counter()
+    resposta = await resiliencia.executar(
+        etapa, PRAZOS_ETAPA[etapa], lambda: llm.ainvoke(mensagens)
+    )
+    metricas.registrar_etapa(
+        etapa, time.perf_counter() - inicio, resposta.usage_metadata
+    )
+    return resposta.content
+
+
+def _mensagens_lupa(contexto: str) -> list:
+    return [
+        SystemMessage(content=PROMPT_LUPA),
+        HumanMessage(content=contexto),
+    ]
+
+
+def _mensagens_juiz(saida_lupa: str) -> list:
+    return [
+        SystemMessage(content=PROMPT_JUIZ),
+        HumanMessage(content=f"RELATÓRIO DO ANALISTA:\n\n{saida_lupa}"),
+    ]
+
+
+def _mensagens_relator(
+    saida_lupa: str,
+    saida_juiz: str,
+    prompt: str = PROMPT_RELATOR,
+) -> list:
+    return [
+        SystemMessage(content=prompt),
+        HumanMessage(
+            content=(
+                f"RELATÓRIO DO ANALISTA:\n\n{saida_lupa}\n\n"
+                f"VEREDITO DO AUDITOR:\n\n{saida_juiz}"
+            )
+        ),
+    ]
+
+
+def _resultado_final(
+    alerta_risco: bool,
+    parecer_ia: str,
+    nome: str,
+    regras: ResultadoRegras,
+    modo: str,
+) -> dict:
+    """
+    Normaliza o resultado da análise.
+    Se as regras decidiram o veredito, ele prevalece sobre o do LLM.
+    """
+    alerta = regras.veredito_decidido or bool(alerta_risco)
+    caminho = CAMINHO_REGRAS if regras.veredito_decidido else CAMINHO_LLM
+
+    logger.info(
+        "Parecer IA gerado para %s: alerta_risco=%s | caminho=%s | modo=%s",
+        nome, alerta, caminho, modo,
+    )
+
+    return {
+        "alerta_risco": alerta,
+        "parecer_ia": parecer_ia,
+        "caminho": caminho,
+        "modo": modo,
+    }
+
+
 def _montar_contexto(respostas: dict, pet_info: dict) -> str:
-    """Monta o texto de contexto para os agentes."""
-    return (
-        f"Dados do Animal:\n"
-        f"- Nome: {pet_info.get('pet_nome', 'N/A')}\n"
-        f"- Espécie: {pet_info.get('pet_especie', 'N/A')}\n"
-        f"- Raça: {pet_info.get('pet_raca', 'N/A')}\n"
-        f"- Porte: {pet_info.get('pet_porte', 'N/A')}\n"
-        f"- Idade: {pet_info.get('pet_idade_anos', 0)} ano(s) e "
-        f"{pet_info.get('pet_idade_meses', 0)} mese(s)\n"
-        f"- Peso: {pet_info.get('pet_peso_kg', 0)} kg\n"
-        f"- Sexo: {pet_info.get('pet_sexo', 'N/A')}\n\n"
-        f"Respostas do Questionário de Triagem:\n"
-        f"{json.dumps(respostas, indent=2, ensure_ascii=False)}"
+    """
+    Monta o texto de contexto para os agentes, num formato compacto e
+    determinístico: cabeçalho curto do animal, só os sinais positivos, os
+    campos obrigatórios (sempre, com true/false) e as observações.
+    Chaves `_meta_*` e dados do tutor não são enviados ao LLM.
+    """
+    positivos = []
+    for campo in sorted(respostas):
+        valor = respostas[campo]
+        if campo.startswith("_") or campo == "observacoes" or campo in CAMPOS_OBRIGATORIOS:
+            continue
+        if valor is True:
+            positivos.append(campo)
+        elif valor not in (False, None, "", 0):
+            positivos.append(f"{campo}={valor}")
+
+    obrigatorios = "; ".join(
+        f"{campo}={'true' if respostas.get(campo) else 'false'}"
+        for campo in CAMPOS_OBRIGATORIOS
     )
+    linhas = [
+        f"Animal: {pet_info.get('pet_nome', 'N/A')} | {pet_info.get('pet_especie', 'N/A')} | "
+        f"{pet_info.get('pet_raca', 'N/A')} | porte {pet_info.get('pet_porte', 'N/A')} | "
+        f"{pet_info.get('pet_idade_anos', 0)} ano(s) e {pet_info.get('pet_idade_meses', 0)} mese(s) | "
+        f"{pet_info.get('pet_peso_kg', 0)} kg | sexo {pet_info.get('pet_sexo', 'N/A')}",
+        f"Sinais positivos: {', '.join(positivos) or 'nenhum'} (demais respostas: não)",
+        f"Obrigatórios: {obrigatorios}",
+    ]
+    observacoes = " ".join(str(respostas.get("observacoes") or "").split())
+    if observacoes:
+        linhas.append(f"Observações do tutor: {observacoes}")
+    return "\n".join(linhas)
+
+
+def _veredito_juiz(saida_juiz: str) -> bool:
+    """Lê o veredito do Juiz (`VEREDITO: ALTO RISCO` / `BAIXO RISCO`)."""
+    match = re.search(r"VEREDITO:\s*\**\s*(ALTO|BAIXO)\s+RISCO", saida_juiz.upper())
+    if match:
+        return match.group(1) == "ALTO"
+    return "ALTO RISCO" in saida_juiz.upper()
 
 
 def _extrair_json(texto: str) -> dict:
     """Tenta extrair um objeto JSON de um texto que pode conter markdown."""
     try:
-        return json.loads(texto)
+        resultado = json.loads(texto)
+        metricas.registrar_extrair_json("json_direto")
+        return resultado
     except (json.JSONDecodeError, TypeError):
         pass
 
@@ -169,7 +587,9 @@ def _extrair_json(texto: str) -> dict:
     match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', texto, re.DOTALL)
     if match:
         try:
-            return json.loads(match.group(1))
+            resultado = json.loads(match.group(1))
+            metricas.registrar_extrair_json("bloco_markdown")
+            return resultado
         except json.JSONDecodeError:
             pass
 
@@ -177,43 +597,31 @@ def _extrair_json(texto: str) -> dict:
     match = re.search(r'\{[^{}]*"alerta_risco"[^{}]*\}', texto, re.DOTALL)
     if match:
         try:
-            return json.loads(match.group(0))
+            resultado = json.loads(match.group(0))
+            metricas.registrar_extrair_json("objeto_embutido")
+            return resultado
         except json.JSONDecodeError:
             pass
 
     # Inferir do texto
+    metricas.registrar_extrair_json("inferido_texto")
     alerta = "ALTO RISCO" in texto.upper()
     return {"alerta_risco": alerta, "parecer_ia": texto.strip()}
 
 
-def _analise_fallback(respostas: dict, pet_info: dict) -> dict:
-    """Análise de risco determinística (fallback se a IA falhar)."""
-    riscos = []
-    alerta = False
-
-    if not respostas.get("entendeu_risco_anestesico", False):
-        riscos.append("Tutor NÃO compreendeu o risco anestésico")
-        alerta = True
-
-    if not respostas.get("jejum_12h", False):
-        riscos.append("Animal NÃO está em jejum de 12h")
-        alerta = True
-
-    for campo in ["desmaio", "convulsao", "dificuldade_respirar"]:
-        if respostas.get(campo, False):
-            riscos.append(f"Sinal grave detectado: {campo.replace('_', ' ')}")
-            alerta = True
+def _analise_fallback(respostas: dict, pet_info: dict, modo: str) -> dict:
+    """
+    Análise de risco determinística (fallback se a IA falhar). `modo` é o
+    modo pedido, mantido para o resultado ter o mesmo formato do LLM.
+    """
+    metricas.registrar_fallback()
+    regras = avaliar_regras(respostas, pet_info)
+    riscos = regras.achados
 
     idade_anos = pet_info.get("pet_idade_anos", 0)
     idade_meses = pet_info.get("pet_idade_meses", 0)
     nome = pet_info.get("pet_nome", "Animal")
 
-    if idade_anos >= 7:
-        riscos.append(
-            f"Animal geriátrico ({idade_anos} ano(s) e {idade_meses} mese(s)), "
-            f"requer atenção especial"
-        )
-
     if riscos:
         parecer = (
             f"Animal {nome} com {idade_anos} ano(s) e {idade_meses} mese(s). "
@@ -227,4 +635,9 @@ def _analise_fallback(respostas: dict, pet_info: dict) -> dict:
             f"Apto para o procedimento, sujeito a avaliação presencial."
         )
 
-    return {"alerta_risco": alerta, "parecer_ia": parecer}
+    return {
+        "alerta_risco": regras.veredito_decidido,
+        "parecer_ia": parecer,
+        "caminho": CAMINHO_FALLBACK,
+        "modo": modo,
+    }
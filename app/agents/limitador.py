@@ -0,0 +1,311 @@
+"""
+Limitador de chamadas ao LLM — SEPET
+Controla o acesso ao MiniMax por tenant, para que a rajada de um tenant
+(ex.: um reprocessamento em lote) não atrase as análises dos outros:
+
+  - limite global de chamadas simultâneas (`LLM_MAX_CONCORRENCIA`) e,
+    opcionalmente, de chamadas por minuto (`LLM_TAXA_POR_MINUTO`)
+  - cota por tenant: chamadas simultâneas (`LLM_TENANT_MAX_CONCORRENCIA`)
+    e balde de fichas com `LLM_TENANT_TAXA_POR_MINUTO` / `LLM_TENANT_RAJADA`
+  - fila justa ponderada entre tenants (*start-time fair queueing*): cada
+    chamada recebe uma etiqueta `max(V, última do tenant) + 1/peso` e a
+    vaga livre vai para a menor etiqueta entre os tenants elegíveis. Com
+    pesos iguais, tenants com fila alternam as vagas; `LLM_TENANT_PESOS`
+    dá a um tenant uma fatia proporcionalmente maior
+  - com `LLM_TENANT_FILA_MAX` chamadas já esperando, a próxima é recusada
+    na hora com `LimiteExcedido` (a API responde `429` com `Retry-After`)
+
+Uma "chamada" aqui é uma análise inteira: o agente clínico ocupa uma
+única vaga por todas as etapas do pipeline, para que uma análise admitida
+não seja recusada no meio, depois de já ter pago as primeiras etapas.
+
+O estado vive em memória, um limitador por event loop (cada worker do
+uvicorn tem o seu). `uso(tenant_id)` expõe a ocupação atual do tenant.
+"""
+import asyncio
+import logging
+import math
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app import metricas
+from app.config import (
+    LLM_MAX_CONCORRENCIA,
+    LLM_TAXA_POR_MINUTO,
+    LLM_TENANT_FILA_MAX,
+    LLM_TENANT_MAX_CONCORRENCIA,
+    LLM_TENANT_PESOS,
+    LLM_TENANT_RAJADA,
+    LLM_TENANT_TAXA_POR_MINUTO,
+)
+
+logger = logging.getLogger("sepet.limitador")
+
+# Duração estimada de uma chamada antes da primeira medição (para o Retry-After)
+_DURACAO_INICIAL = 5.0
+# Peso da última medição na média móvel da duração das chamadas
+_ALFA_DURACAO = 0.2
+
+
+class LimiteExcedido(Exception):
+    """A fila do tenant está cheia; tente de novo após `retry_after` segundos."""
+
+    def __init__(self, tenant_id: str, retry_after: int):
+        self.tenant_id = tenant_id
+        self.retry_after = retry_after
+        super().__init__(
+            f"Limite de análises simultâneas do tenant {tenant_id} atingido; "
+            f"tente novamente em {retry_after}s."
+        )
+
+
+def _ler_pesos(texto: str) -> dict[str, float]:
+    """Converte `tenant_a=2,tenant_b=0.5` em `{"tenant_a": 2.0, "tenant_b": 0.5}`."""
+    pesos = {}
+    for par in texto.split(","):
+        tenant, _, peso = par.partition("=")
+        if tenant.strip() and peso.strip():
+            pesos[tenant.strip()] = float(peso)
+    return pesos
+
+
+PESOS_TENANT = _ler_pesos(LLM_TENANT_PESOS)
+
+
+class _Balde:
+    """Balde de fichas: `taxa_por_minuto` fichas por minuto, até `rajada`."""
+
+    def __init__(self, taxa_por_minuto: float, rajada: int):
+        self.taxa = taxa_por_minuto / 60
+        self.capacidade = max(rajada, 1)
+        self.fichas = float(self.capacidade)
+        self._atualizado = time.monotonic()
+
+    def _repor(self, agora: float) -> None:
+        self.fichas = min(self.capacidade, self.fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def espera(self, agora: float) -> float:
+        """Segundos até haver uma ficha (0 = disponível agora)."""
+        self._repor(agora)
+        return 0.0 if self.fichas >= 1 else (1 - self.fichas) / self.taxa
+
+    def consumir(self) -> None:
+        self.fichas -= 1
+
+
+class _Tenant:
+    def __init__(self, tenant_id: str):
+        self.peso = PESOS_TENANT.get(tenant_id, 1.0)
+        self.fila: deque[tuple[float, asyncio.Future]] = deque()
+        self.ultima_etiqueta = 0.0
+        self.em_execucao = 0
+        self.atendidas = 0
+        self.recusadas = 0
+        self.balde = (
+            _Balde(LLM_TENANT_TAXA_POR_MINUTO, LLM_TENANT_RAJADA)
+            if LLM_TENANT_TAXA_POR_MINUTO > 0 else None
+        )
+
+
+class _Limitador:
+    def __init__(self):
+        self._tenants: dict[str, _Tenant] = {}
+        self._virtual = 0.0
+        self._em_execucao = 0
+        self._balde = (
+            _Balde(LLM_TAXA_POR_MINUTO, LLM_MAX_CONCORRENCIA)
+            if LLM_TAXA_POR_MINUTO > 0 else None
+        )
+        self._timer: asyncio.TimerHandle | None = None
+        self._duracao_media = _DURACAO_INICIAL
+
+    def _tenant(self, tenant_id: str) -> _Tenant:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            tenant = self._tenants[tenant_id] = _Tenant(tenant_id)
+        return tenant
+
+    def retry_after(self, tenant: _Tenant) -> int:
+        """Estimativa de quando a fila do tenant terá espaço de novo."""
+        rodadas = (len(tenant.fila) + 1) / max(LLM_TENANT_MAX_CONCORRENCIA, 1)
+        espera = rodadas * self._duracao_media
+        if tenant.balde is not None:
+            espera = max(espera, len(tenant.fila) / tenant.balde.taxa)
+        return max(1, math.ceil(espera))
+
+    def verificar(self, tenant_id: str) -> None:
+        tenant = self._tenant(tenant_id)
+        if len(tenant.fila) >= LLM_TENANT_FILA_MAX:
+            tenant.recusadas += 1
+            metricas.registrar_llm_recusada(tenant_id)
+            retry_after = self.retry_after(tenant)
+            logger.warning(
+                "Fila do LLM cheia para tenant %s (%s chamada(s) esperando); "
+                "recusada com Retry-After %ss",
+                tenant_id, len(tenant.fila), retry_after,
+            )
+            raise LimiteExcedido(tenant_id, retry_after)
+
+    async def adquirir(self, tenant_id: str) -> None:
+        self.verificar(tenant_id)
+        tenant = self._tenant(tenant_id)
+
+        inicio = max(self._virtual, tenant.ultima_etiqueta)
+        tenant.ultima_etiqueta = inicio + 1 / tenant.peso
+        futuro = asyncio.get_running_loop().create_future()
+        tenant.fila.append((inicio, futuro))
+        self._despachar()
+
+        entrada = time.perf_counter()
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                # A vaga chegou junto com o cancelamento: devolve-a
+                self.liberar(tenant_id, None)
+            else:
+                try:
+                    tenant.fila.remove((inicio, futuro))
+                except ValueError:
+                    pass
+                self._publicar(tenant_id, tenant)
+            raise
+        metricas.registrar_llm_espera(tenant_id, time.perf_counter() - entrada)
+
+    def liberar(self, tenant_id: str, duracao: float | None) -> None:
+        tenant = self._tenants[tenant_id]
+        tenant.em_execucao -= 1
+        self._em_execucao -= 1
+        if duracao is not None:
+            self._duracao_media += _ALFA_DURACAO * (duracao - self._duracao_media)
+        self._despachar()
+        self._publicar(tenant_id, tenant)
+
+    def _despachar(self) -> None:
+        """Entrega as vagas livres, pela menor etiqueta entre os tenants elegíveis."""
+        agora = time.monotonic()
+        while self._em_execucao < LLM_MAX_CONCORRENCIA:
+            if not any(tenant.fila for tenant in self._tenants.values()):
+                return
+            espera_global = self._balde.espera(agora) if self._balde is not None else 0.0
+            if espera_global > 0:
+                self._agendar(espera_global)
+                return
+
+            escolhido: tuple[float, str, _Tenant] | None = None
+            espera_fichas = math.inf
+            for tenant_id, tenant in self._tenants.items():
+                while tenant.fila and tenant.fila[0][1].done():
+                    tenant.fila.popleft()  # chamador cancelado
+                if not tenant.fila or tenant.em_execucao >= LLM_TENANT_MAX_CONCORRENCIA:
+                    continue
+                if tenant.balde is not None:
+                    espera = tenant.balde.espera(agora)
+                    if espera > 0:
+                        espera_fichas = min(espera_fichas, espera)
+                        continue
+                etiqueta = tenant.fila[0][0]
+                if escolhido is None or etiqueta < escolhido[0]:
+                    escolhido = (etiqueta, tenant_id, tenant)
+
+            if escolhido is None:
+                if espera_fichas < math.inf:
+                    self._agendar(espera_fichas)
+                return
+
+            etiqueta, tenant_id, tenant = escolhido
+            _, futuro = tenant.fila.popleft()
+            self._virtual = max(self._virtual, etiqueta)
+            tenant.em_execucao += 1
+            tenant.atendidas += 1
+            self._em_execucao += 1
+            if self._balde is not None:
+                self._balde.consumir()
+            if tenant.balde is not None:
+                tenant.balde.consumir()
+            futuro.set_result(None)
+            self._publicar(tenant_id, tenant)
+
+    def _agendar(self, atraso: float) -> None:
+        """Tenta despachar de novo quando o balde tiver fichas."""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(atraso, self._acordar)
+
+    def _acordar(self) -> None:
+        self._timer = None
+        self._despachar()
+
+    @staticmethod
+    def _publicar(tenant_id: str, tenant: _Tenant) -> None:
+        metricas.atualizar_uso_llm(tenant_id, len(tenant.fila), tenant.em_execucao)
+
+    def uso(self, tenant_id: str) -> dict:
+        tenant = self._tenant(tenant_id)
+        fichas = None
+        if tenant.balde is not None:
+            tenant.balde.espera(time.monotonic())
+            fichas = math.floor(tenant.balde.fichas)
+        return {
+            "tenant_id": tenant_id,
+            "peso": tenant.peso,
+            "em_execucao": tenant.em_execucao,
+            "na_fila": len(tenant.fila),
+            "limite_concorrencia": LLM_TENANT_MAX_CONCORRENCIA,
+            "limite_fila": LLM_TENANT_FILA_MAX,
+            "taxa_por_minuto": LLM_TENANT_TAXA_POR_MINUTO or None,
+            "fichas_disponiveis": fichas,
+            "atendidas": tenant.atendidas,
+            "recusadas": tenant.recusadas,
+            "global": {
+                "em_execucao": self._em_execucao,
+                "limite_concorrencia": LLM_MAX_CONCORRENCIA,
+                "tenants_na_fila": sum(1 for t in self._tenants.values() if t.fila),
+            },
+        }
+
+
+_limitadores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _limitador() -> _Limitador:
+    """Limitador do event loop atual."""
+    loop = asyncio.get_running_loop()
+    limitador = _limitadores.get(loop)
+    if limitador is None:
+        limitador = _limitadores[loop] = _Limitador()
+    return limitador
+
+
+# ── API pública ───────────────────────────────
+
+@asynccontextmanager
+async def vaga(tenant_id: str) -> AsyncIterator[None]:
+    """
+    Ocupa uma vaga de chamada ao LLM para o tenant durante o bloco,
+    esperando a sua vez na fila justa. Levanta `LimiteExcedido` se a fila
+    do tenant estiver cheia.
+    """
+    limitador = _limitador()
+    await limitador.adquirir(tenant_id)
+    inicio = time.perf_counter()
+    duracao = None
+    try:
+        yield
+        duracao = time.perf_counter() - inicio
+    finally:
+        limitador.liberar(tenant_id, duracao)
+
+
+def verificar(tenant_id: str) -> None:
+    """Recusa de antemão (`LimiteExcedido`) se a fila do tenant estiver cheia."""
+    _limitador().verificar(tenant_id)
+
+
+def uso(tenant_id: str) -> dict:
+    """Chamadas em execução e na fila do tenant, cotas e contadores."""
+    return _limitador().uso(tenant_id)
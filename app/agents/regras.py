@@ -0,0 +1,122 @@
+"""
+Motor de regras clínicas — SEPET
+Avalia de forma determinística as regras obrigatórias de triagem (as mesmas
+do PROMPT_JUIZ) antes do pipeline de LLM. As regras são declarativas e vêm
+de um arquivo JSON (`REGRAS_TRIAGEM_PATH`), compiladas uma única vez no
+carregamento; avaliar uma triagem custa alguns microssegundos.
+
+Efeitos possíveis de uma regra:
+  - alto_risco – decide o veredito (ALTO RISCO) sem precisar do Juiz
+  - atencao    – apenas registra um achado para o parecer
+"""
+import json
+import logging
+import operator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from app.config import REGRAS_TRIAGEM_PATH
+
+logger = logging.getLogger("sepet.regras")
+
+EFEITO_ALTO_RISCO = "alto_risco"
+EFEITO_ATENCAO = "atencao"
+
+_OPERADORES: dict[str, Callable[[Any, Any], bool]] = {
+    "verdadeiro": lambda valor, _: bool(valor),
+    "falso": lambda valor, _: not valor,
+    "igual": operator.eq,
+    "diferente": operator.ne,
+    "maior_igual": lambda valor, ref: valor is not None and valor >= ref,
+    "menor": lambda valor, ref: valor is not None and valor < ref,
+}
+_FONTES = ("respostas", "pet")
+_EFEITOS = (EFEITO_ALTO_RISCO, EFEITO_ATENCAO)
+
+
+class _Valores(dict):
+    """Dicionário para `str.format_map` que tolera chaves ausentes."""
+
+    def __missing__(self, chave: str) -> Any:
+        return 0
+
+
+@dataclass(frozen=True)
+class Regra:
+    id: str
+    fonte: str
+    campo: str
+    efeito: str
+    mensagem: str
+    teste: Callable[[Any, Any], bool]
+    valor: Any = None
+    padrao: Any = None
+
+    def dispara(self, respostas: dict, pet_info: dict) -> bool:
+        origem = respostas if self.fonte == "respostas" else pet_info
+        return self.teste(origem.get(self.campo, self.padrao), self.valor)
+
+
+@dataclass
+class ResultadoRegras:
+    """Achados das regras disparadas para uma triagem."""
+    achados: list[str] = field(default_factory=list)
+    regras_disparadas: list[str] = field(default_factory=list)
+    veredito_decidido: bool = False
+
+    def veredito_texto(self) -> str:
+        """Texto no formato do Juiz, entregue ao Relator quando o Juiz é pulado."""
+        linhas = ["VEREDITO: ALTO RISCO (regras obrigatórias do SEPET)"]
+        linhas += [f"- {achado}" for achado in self.achados]
+        return "\n".join(linhas)
+
+
+def carregar_regras(caminho: str | Path) -> list[Regra]:
+    """Lê e valida o arquivo de regras, devolvendo as regras compiladas."""
+    with open(caminho, encoding="utf-8") as f:
+        config = json.load(f)
+
+    regras = []
+    for item in config.get("regras", []):
+        regra_id = item.get("id", "?")
+        if item.get("operador") not in _OPERADORES:
+            raise ValueError(f"Regra '{regra_id}': operador inválido {item.get('operador')!r}")
+        if item.get("fonte", "respostas") not in _FONTES:
+            raise ValueError(f"Regra '{regra_id}': fonte inválida {item.get('fonte')!r}")
+        if item.get("efeito") not in _EFEITOS:
+            raise ValueError(f"Regra '{regra_id}': efeito inválido {item.get('efeito')!r}")
+
+        regras.append(Regra(
+            id=regra_id,
+            fonte=item.get("fonte", "respostas"),
+            campo=item["campo"],
+            efeito=item["efeito"],
+            mensagem=item["mensagem"],
+            teste=_OPERADORES[item["operador"]],
+            valor=item.get("valor"),
+            padrao=item.get("padrao"),
+        ))
+
+    logger.info("%s regra(s) clínica(s) carregada(s) de %s", len(regras), caminho)
+    return regras
+
+
+REGRAS = carregar_regras(REGRAS_TRIAGEM_PATH)
+
+
+def avaliar_regras(
+    respostas: dict,
+    pet_info: dict,
+    regras: list[Regra] | None = None,
+) -> ResultadoRegras:
+    """Avalia as regras sobre uma triagem, na ordem em que foram declaradas."""
+    resultado = ResultadoRegras()
+    for regra in REGRAS if regras is None else regras:
+        if not regra.dispara(respostas, pet_info):
+            continue
+        resultado.regras_disparadas.append(regra.id)
+        resultado.achados.append(regra.mensagem.format_map(_Valores(pet_info)))
+        if regra.efeito == EFEITO_ALTO_RISCO:
+            resultado.veredito_decidido = True
+    return resultado
@@ -0,0 +1,285 @@
+"""
+Resiliência das chamadas ao LLM — SEPET
+Envolve cada etapa do pipeline (Lupa, Juiz, Relator, Único) para que uma
+degradação do MiniMax custe no máximo o prazo da etapa, e não minutos:
+
+  - prazo por etapa (`LLM_PRAZO_*_SEGUNDOS`), que cobre todas as tentativas
+  - novas tentativas só em erros transitórios (tempo esgotado, conexão,
+    429, 5xx), até `LLM_TENTATIVAS`, com espera aleatória (*full jitter*)
+  - disjuntor: com a taxa de erro das últimas etapas acima de
+    `LLM_DISJUNTOR_TAXA_ERRO`, abre por `LLM_DISJUNTOR_ABERTO_SEGUNDOS` e
+    as chamadas falham na hora com `CircuitoAberto` (o agente cai no
+    fallback determinístico). Depois disso, uma única chamada de teste
+    (meio-aberto) decide se o circuito fecha ou abre de novo
+  - *hedge* (`LLM_HEDGE_ATIVO`): se a chamada passa do p95 recente da
+    etapa, uma cópia é disparada e vale a que responder primeiro
+
+O cliente `ChatOpenAI` é criado com `max_retries=0`: as tentativas ficam
+todas aqui, dentro do prazo. O estado do disjuntor é do processo.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+import openai
+
+from app import metricas
+from app.config import (
+    LLM_BACKOFF_SEGUNDOS,
+    LLM_DISJUNTOR_ABERTO_SEGUNDOS,
+    LLM_DISJUNTOR_JANELA,
+    LLM_DISJUNTOR_MIN_CHAMADAS,
+    LLM_DISJUNTOR_TAXA_ERRO,
+    LLM_HEDGE_ATIVO,
+    LLM_TENTATIVAS,
+)
+
+logger = logging.getLogger("sepet.resiliencia")
+
+T = TypeVar("T")
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Erros que valem uma nova tentativa; os demais (ex.: 400, 401) falham direto
+_TRANSITORIOS = (
+    TimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Durações recentes por etapa, para o p95 do hedge
+_AMOSTRAS_MAX = 200
+_AMOSTRAS_MIN = 20
+
+
+class CircuitoAberto(Exception):
+    """O disjuntor do LLM está aberto; a chamada nem foi feita."""
+
+    def __init__(self, segundos_restantes: float):
+        self.segundos_restantes = segundos_restantes
+        super().__init__(
+            f"Circuito do LLM aberto após falhas seguidas; nova tentativa em "
+            f"{segundos_restantes:.0f}s."
+        )
+
+
+class Disjuntor:
+    """Disjuntor por taxa de erro numa janela deslizante de etapas."""
+
+    def __init__(self, janela: int, min_chamadas: int, taxa_erro: float, aberto_segundos: float):
+        self._resultados: deque[bool] = deque(maxlen=janela)  # True = erro
+        self._min_chamadas = min_chamadas
+        self._taxa_erro = taxa_erro
+        self._aberto_segundos = aberto_segundos
+        self._aberto_ate = 0.0
+        self._sonda = False
+        self.estado = FECHADO
+
+    def _mudar(self, estado: str) -> None:
+        if estado != self.estado:
+            logger.warning("[Disjuntor] Circuito do LLM: %s → %s", self.estado, estado)
+            self.estado = estado
+            metricas.registrar_circuito_llm(estado)
+
+    def permitir(self) -> None:
+        """Levanta `CircuitoAberto` se a chamada não deve ser feita agora."""
+        if self.estado == ABERTO:
+            restante = self._aberto_ate - time.monotonic()
+            if restante > 0:
+                raise CircuitoAberto(restante)
+            self._mudar(MEIO_ABERTO)
+        if self.estado == MEIO_ABERTO:
+            if self._sonda:
+                raise CircuitoAberto(0)
+            self._sonda = True
+
+    def sucesso(self) -> None:
+        if self.estado == MEIO_ABERTO:
+            self._resultados.clear()
+            self._sonda = False
+            self._mudar(FECHADO)
+        self._resultados.append(False)
+
+    def falha(self) -> None:
+        if self.estado == MEIO_ABERTO:
+            self._abrir()
+            return
+        self._resultados.append(True)
+        erros = sum(self._resultados)
+        if (
+            self.estado == FECHADO
+            and len(self._resultados) >= self._min_chamadas
+            and erros / len(self._resultados) >= self._taxa_erro
+        ):
+            self._abrir()
+
+    def abandonar(self) -> None:
+        """Chamada cancelada sem resultado: libera a vaga de teste."""
+        if self.estado == MEIO_ABERTO:
+            self._sonda = False
+
+    def _abrir(self) -> None:
+        self._aberto_ate = time.monotonic() + self._aberto_segundos
+        self._sonda = False
+        self._resultados.clear()
+        self._mudar(ABERTO)
+
+
+disjuntor = Disjuntor(
+    LLM_DISJUNTOR_JANELA,
+    LLM_DISJUNTOR_MIN_CHAMADAS,
+    LLM_DISJUNTOR_TAXA_ERRO,
+    LLM_DISJUNTOR_ABERTO_SEGUNDOS,
+)
+
+_duracoes: dict[str, deque[float]] = {}
+
+
+def _registrar_duracao(etapa: str, segundos: float) -> None:
+    amostras = _duracoes.get(etapa)
+    if amostras is None:
+        amostras = _duracoes[etapa] = deque(maxlen=_AMOSTRAS_MAX)
+    amostras.append(segundos)
+
+
+def p95(etapa: str) -> float | None:
+    """p95 das chamadas recentes da etapa (None com poucas amostras)."""
+    amostras = _duracoes.get(etapa)
+    if not amostras or len(amostras) < _AMOSTRAS_MIN:
+        return None
+    ordenadas = sorted(amostras)
+    return ordenadas[int(len(ordenadas) * 0.95)]
+
+
+async def _chamar(etapa: str, chamada: Callable[[], Awaitable[T]], tempo: float) -> T:
+    """Uma tentativa; com hedge, duplica a chamada que passar do p95."""
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + tempo
+    atraso = p95(etapa) if LLM_HEDGE_ATIVO else None
+    hedge_em = loop.time() + atraso if atraso is not None and atraso < tempo else None
+
+    inicios: dict[asyncio.Future, float] = {}
+
+    def disparar() -> asyncio.Future:
+        tarefa = asyncio.ensure_future(chamada())
+        inicios[tarefa] = loop.time()
+        return tarefa
+
+    pendentes = {disparar()}
+    erro: BaseException | None = None
+    try:
+        while pendentes:
+            agora = loop.time()
+            if agora >= limite:
+                raise TimeoutError(f"Etapa {etapa} sem resposta em {tempo:.1f}s")
+            espera = limite - agora
+            if hedge_em is not None:
+                espera = min(espera, max(hedge_em - agora, 0))
+            feitas, pendentes = await asyncio.wait(
+                pendentes, timeout=espera, return_when=asyncio.FIRST_COMPLETED
+            )
+            for tarefa in feitas:
+                if tarefa.exception() is None:
+                    _registrar_duracao(etapa, loop.time() - inicios[tarefa])
+                    if tarefa is not next(iter(inicios)):
+                        metricas.registrar_resiliencia_llm(etapa, "hedge_venceu")
+                    return tarefa.result()
+                erro = tarefa.exception()
+
+            if hedge_em is not None and pendentes and loop.time() >= hedge_em:
+                logger.info(
+                    "[Hedge] %s: chamada passou do p95 (%.1fs); duplicando",
+                    etapa, atraso,
+                )
+                metricas.registrar_resiliencia_llm(etapa, "hedge")
+                pendentes.add(disparar())
+                hedge_em = None
+
+        # Todas as chamadas terminaram com erro
+        raise erro
+    finally:
+        for tarefa in inicios:
+            if not tarefa.done():
+                tarefa.cancel()
+
+
+async def executar(etapa: str, prazo: float, chamada: Callable[[], Awaitable[T]]) -> T:
+    """
+    Executa `chamada` (uma chamada ao LLM) com o prazo da etapa, novas
+    tentativas em erros transitórios, hedge e disjuntor.
+    Levanta `CircuitoAberto` sem chamar o LLM se o circuito estiver aberto.
+    """
+    disjuntor.permitir()
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + prazo
+    try:
+        for tentativa in range(1, LLM_TENTATIVAS + 1):
+            restante = limite - loop.time()
+            # O prazo restante é dividido entre as tentativas que faltam
+            tempo = restante / (LLM_TENTATIVAS - tentativa + 1)
+            try:
+                resultado = await _chamar(etapa, chamada, tempo)
+                break
+            except _TRANSITORIOS as e:
+                espera = random.uniform(0, LLM_BACKOFF_SEGUNDOS * 2 ** (tentativa - 1))
+                if tentativa == LLM_TENTATIVAS or loop.time() + espera >= limite:
+                    raise
+                logger.warning(
+                    "[%s] Erro transitório no LLM (tentativa %s/%s): %s: %s | "
+                    "nova tentativa em %.2fs",
+                    etapa, tentativa, LLM_TENTATIVAS, type(e).__name__, e, espera,
+                )
+                metricas.registrar_resiliencia_llm(etapa, "nova_tentativa")
+                await asyncio.sleep(espera)
+    except asyncio.CancelledError:
+        disjuntor.abandonar()
+        raise
+    except Exception as e:
+        disjuntor.falha()
+        if isinstance(e, TimeoutError):
+            metricas.registrar_resiliencia_llm(etapa, "prazo_esgotado")
+        raise
+    disjuntor.sucesso()
+    return resultado
+
+
+@asynccontextmanager
+async def protegido(etapa: str, prazo: float) -> AsyncIterator[None]:
+    """
+    Prazo e disjuntor para chamadas em streaming, em que não há como
+    repetir nem duplicar (os tokens já foram enviados ao cliente).
+    """
+    disjuntor.permitir()
+    try:
+        async with asyncio.timeout(prazo):
+            yield
+    except TimeoutError:
+        disjuntor.falha()
+        metricas.registrar_resiliencia_llm(etapa, "prazo_esgotado")
+        raise TimeoutError(f"Etapa {etapa} excedeu o prazo de {prazo:.0f}s")
+    except Exception:
+        disjuntor.falha()
+        raise
+    except BaseException:
+        disjuntor.abandonar()
+        raise
+    disjuntor.sucesso()
+
+
+def estado() -> dict:
+    """Estado do disjuntor e p95 recente por etapa."""
+    return {
+        "circuito": disjuntor.estado,
+        "p95_segundos": {
+            etapa: round(valor, 3)
+            for etapa in _duracoes
+            if (valor := p95(etapa)) is not None
+        },
+    }
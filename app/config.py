@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -6,9 +7,133 @@ load_dotenv()
 # ----- Supabase -----
 SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
+# Pool HTTP compartilhado do cliente assíncrono (PostgREST)
+DB_POOL_MAX_CONEXOES: int = int(os.getenv("DB_POOL_MAX_CONEXOES", "20"))
+DB_POOL_KEEPALIVE: int = int(os.getenv("DB_POOL_KEEPALIVE", "10"))
+DB_KEEPALIVE_SEGUNDOS: float = float(os.getenv("DB_KEEPALIVE_SEGUNDOS", "30"))
+DB_TIMEOUT_SEGUNDOS: float = float(os.getenv("DB_TIMEOUT_SEGUNDOS", "10"))
+DB_TIMEOUT_CONEXAO_SEGUNDOS: float = float(os.getenv("DB_TIMEOUT_CONEXAO_SEGUNDOS", "3"))
+# Tentativas por requisição em erros transitórios (rede, 502/503/504)
+DB_TENTATIVAS: int = int(os.getenv("DB_TENTATIVAS", "3"))
+DB_RETENTATIVA_BASE_SEGUNDOS: float = float(os.getenv("DB_RETENTATIVA_BASE_SEGUNDOS", "0.2"))
+
+# ----- Paginação das listagens -----
+PAGINA_LIMITE_PADRAO: int = int(os.getenv("PAGINA_LIMITE_PADRAO", "50"))
+PAGINA_LIMITE_MAX: int = int(os.getenv("PAGINA_LIMITE_MAX", "200"))
 
 # ----- MiniMax / LLM -----
 MINIMAX_API_KEY: str = os.getenv("MINIMAX_API_KEY", "")
+# Endpoint compatível com a API da OpenAI (ex.: o LLM local dos benchmarks)
+MINIMAX_BASE_URL: str = os.getenv("MINIMAX_BASE_URL", "https://api.minimaxi.chat/v1")
+LLM_MAX_CONCORRENCIA: int = int(os.getenv("LLM_MAX_CONCORRENCIA", "4"))
+# Chamadas por minuto aceitas pela conta MiniMax, somando todos os tenants (0 = sem limite)
+LLM_TAXA_POR_MINUTO: float = float(os.getenv("LLM_TAXA_POR_MINUTO", "0"))
+# Cota de cada tenant: chamadas simultâneas, chamadas por minuto (0 = sem
+# limite) com rajada, e chamadas aguardando na fila antes de responder 429
+LLM_TENANT_MAX_CONCORRENCIA: int = int(os.getenv("LLM_TENANT_MAX_CONCORRENCIA", "2"))
+LLM_TENANT_TAXA_POR_MINUTO: float = float(os.getenv("LLM_TENANT_TAXA_POR_MINUTO", "0"))
+LLM_TENANT_RAJADA: int = int(os.getenv("LLM_TENANT_RAJADA", "10"))
+LLM_TENANT_FILA_MAX: int = int(os.getenv("LLM_TENANT_FILA_MAX", "20"))
+# Pesos do escalonamento justo entre tenants ("tenant_a=2,tenant_b=1"; padrão 1)
+LLM_TENANT_PESOS: str = os.getenv("LLM_TENANT_PESOS", "")
+# Prazo de cada etapa do pipeline, somando tentativas e requisições duplicadas
+LLM_PRAZO_LUPA_SEGUNDOS: float = float(os.getenv("LLM_PRAZO_LUPA_SEGUNDOS", "25"))
+LLM_PRAZO_JUIZ_SEGUNDOS: float = float(os.getenv("LLM_PRAZO_JUIZ_SEGUNDOS", "20"))
+LLM_PRAZO_RELATOR_SEGUNDOS: float = float(os.getenv("LLM_PRAZO_RELATOR_SEGUNDOS", "30"))
+LLM_PRAZO_UNICO_SEGUNDOS: float = float(os.getenv("LLM_PRAZO_UNICO_SEGUNDOS", "40"))
+# Tentativas por etapa em erros transitórios, com espera aleatória até
+# LLM_BACKOFF_SEGUNDOS * 2^(tentativa-1)
+LLM_TENTATIVAS: int = int(os.getenv("LLM_TENTATIVAS", "2"))
+LLM_BACKOFF_SEGUNDOS: float = float(os.getenv("LLM_BACKOFF_SEGUNDOS", "0.5"))
+# Disjuntor: abre quando a taxa de erro das últimas JANELA etapas (com pelo
+# menos MIN_CHAMADAS) chega a TAXA_ERRO; aberto, as análises vão direto
+# para o fallback por ABERTO_SEGUNDOS, até uma chamada de teste passar
+LLM_DISJUNTOR_JANELA: int = int(os.getenv("LLM_DISJUNTOR_JANELA", "20"))
+LLM_DISJUNTOR_MIN_CHAMADAS: int = int(os.getenv("LLM_DISJUNTOR_MIN_CHAMADAS", "5"))
+LLM_DISJUNTOR_TAXA_ERRO: float = float(os.getenv("LLM_DISJUNTOR_TAXA_ERRO", "0.5"))
+LLM_DISJUNTOR_ABERTO_SEGUNDOS: float = float(os.getenv("LLM_DISJUNTOR_ABERTO_SEGUNDOS", "30"))
+# Requisição duplicada quando uma chamada passa do p95 da etapa
+LLM_HEDGE_ATIVO: bool = os.getenv("LLM_HEDGE_ATIVO", "false").lower() == "true"
+# "multi" (Lupa → Juiz → Relator) ou "single" (uma chamada estruturada)
+ANALISE_MODO: str = os.getenv("ANALISE_MODO", "multi")
+
+# ----- Regras clínicas determinísticas -----
+REGRAS_TRIAGEM_PATH: str = os.getenv(
+    "REGRAS_TRIAGEM_PATH",
+    str(Path(__file__).parent / "agents" / "regras_triagem.json"),
+)
+
+# ----- Cache de pareceres de IA -----
+CACHE_PARECERES_CAPACIDADE: int = int(os.getenv("CACHE_PARECERES_CAPACIDADE", "1024"))
+CACHE_PARECERES_TTL_SEGUNDOS: float = float(
+    os.getenv("CACHE_PARECERES_TTL_SEGUNDOS", "86400")
+)
+# Caminho do SQLite compartilhado entre workers (vazio = só memória)
+CACHE_PARECERES_DB: str = os.getenv("CACHE_PARECERES_DB", "")
+
+# ----- Cache de agendamento + triagem (leituras por id) -----
+CACHE_AGENDAMENTOS_CAPACIDADE: int = int(os.getenv("CACHE_AGENDAMENTOS_CAPACIDADE", "2048"))
+CACHE_AGENDAMENTOS_TTL_SEGUNDOS: float = float(
+    os.getenv("CACHE_AGENDAMENTOS_TTL_SEGUNDOS", "600")
+)
+# SQLite compartilhado entre workers (vazio = só memória). Com ou sem ele, a
+# L1 de cada worker vale no máximo CACHE_AGENDAMENTOS_TTL_L1_SEGUNDOS, para
+# que uma invalidação feita em um worker chegue logo aos demais.
+CACHE_AGENDAMENTOS_DB: str = os.getenv("CACHE_AGENDAMENTOS_DB", "")
+CACHE_AGENDAMENTOS_TTL_L1_SEGUNDOS: float = float(
+    os.getenv("CACHE_AGENDAMENTOS_TTL_L1_SEGUNDOS", "5")
+)
+
+# ----- Cache de comprovantes renderizados (por versão dos dados) -----
+CACHE_COMPROVANTES_CAPACIDADE: int = int(os.getenv("CACHE_COMPROVANTES_CAPACIDADE", "512"))
+CACHE_COMPROVANTES_TTL_SEGUNDOS: float = float(
+    os.getenv("CACHE_COMPROVANTES_TTL_SEGUNDOS", "3600")
+)
+# Exportação em lote (ZIP): linhas por consulta
+COMPROVANTES_LOTE_PAGINA: int = int(os.getenv("COMPROVANTES_LOTE_PAGINA", "100"))
+# Exportação NDJSON/CSV (GET /exportacao): linhas por consulta
+EXPORTACAO_PAGINA: int = int(os.getenv("EXPORTACAO_PAGINA", "500"))
+
+# ----- Capacidade diária de atendimento -----
+# Vagas por dia para tenants sem linha em `capacidade_atendimento` (0 = sem limite)
+CAPACIDADE_VAGAS_PADRAO: int = int(os.getenv("CAPACIDADE_VAGAS_PADRAO", "40"))
+# Vagas ocupadas por porte (portes ausentes ocupam 1)
+CAPACIDADE_PESOS_PORTE: str = os.getenv("CAPACIDADE_PESOS_PORTE", "G=2,XG=3")
+# Validade do calendário de disponibilidade em memória
+CAPACIDADE_CACHE_TTL_SEGUNDOS: float = float(
+    os.getenv("CAPACIDADE_CACHE_TTL_SEGUNDOS", "5")
+)
+
+# ----- Idempotency-Key em POST /agendamentos/ (SQLite local) -----
+IDEMPOTENCIA_DB_PATH: str = os.getenv("IDEMPOTENCIA_DB_PATH", "sepet_idempotencia.db")
+# Por quanto tempo um reenvio com a mesma chave recebe a resposta original
+IDEMPOTENCIA_TTL_SEGUNDOS: float = float(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+# Espera máxima de um reenvio concorrente pela requisição original
+IDEMPOTENCIA_ESPERA_SEGUNDOS: float = float(os.getenv("IDEMPOTENCIA_ESPERA_SEGUNDOS", "30"))
+# Validade da reserva de uma requisição em andamento, renovada enquanto ela
+# executa; só vence se o processo morrer (bem acima do prazo de uma requisição)
+IDEMPOTENCIA_RESERVA_SEGUNDOS: float = float(os.getenv("IDEMPOTENCIA_RESERVA_SEGUNDOS", "300"))
+
+# ----- Fila de análises (SQLite local) -----
+FILA_DB_PATH: str = os.getenv("FILA_DB_PATH", "sepet_fila.db")
+FILA_WORKERS: int = int(os.getenv("FILA_WORKERS", "2"))
+FILA_MAX_TENTATIVAS: int = int(os.getenv("FILA_MAX_TENTATIVAS", "3"))
+FILA_LEASE_SEGUNDOS: int = int(os.getenv("FILA_LEASE_SEGUNDOS", "300"))
+FILA_INTERVALO_SEGUNDOS: float = float(os.getenv("FILA_INTERVALO_SEGUNDOS", "2"))
+# Paralelismo padrão de um lote de reprocessamento (limitado por FILA_WORKERS)
+LOTE_PARALELISMO: int = int(os.getenv("LOTE_PARALELISMO", "2"))
+
+# ----- Logs -----
+LOG_NIVEL: str = os.getenv("LOG_NIVEL", "INFO").upper()
+# "json" (uma linha JSON por evento) ou "texto"
+LOG_FORMATO: str = os.getenv("LOG_FORMATO", "json")
+# Fração das requisições GET bem-sucedidas registradas no log de acesso;
+# erros e requisições lentas são sempre registrados
+LOG_AMOSTRAGEM_GET: float = float(os.getenv("LOG_AMOSTRAGEM_GET", "1"))
+# Amostragem por rota, sobrepondo a de GET ("/painel/=0.05,/agendamentos/{agendamento_id}=0.1")
+LOG_AMOSTRAGEM_ROTAS: str = os.getenv("LOG_AMOSTRAGEM_ROTAS", "")
+# A partir desta duração a requisição é sempre registrada, como lenta
+LOG_LENTA_MS: float = float(os.getenv("LOG_LENTA_MS", "1000"))
 
 # ----- Constantes do SEPET -----
 SEPET_ENDERECO = "Av. Umberto Calderaro, 934 – Adrianópolis, Manaus-AM"
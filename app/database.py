@@ -1,16 +1,134 @@
-from supabase import create_client, Client
-from app.config import SUPABASE_URL, SUPABASE_KEY
+"""
+Acesso ao Supabase — SEPET
+Cliente assíncrono do Supabase sobre um único `httpx.AsyncClient`, com pool
+de conexões configurável, compartilhado por todas as rotas e pela fila.
+O ciclo de vida (abrir/fechar o pool) é controlado pelo `lifespan` da app.
 
-_client: Client | None = None
+Erros transitórios são repetidos na camada de transporte, com backoff
+exponencial e jitter:
+  - falhas de conexão (a requisição não chegou a sair): qualquer método
+  - timeouts de leitura, quedas de conexão e 502/503/504: só métodos
+    idempotentes (GET, HEAD, PUT, DELETE), para não duplicar inserts
+"""
+import asyncio
+import logging
+import random
 
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 
-def get_supabase() -> Client:
-    """Retorna a instância singleton do cliente Supabase."""
-    global _client
-    if _client is None:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            raise RuntimeError(
-                "SUPABASE_URL e SUPABASE_KEY devem estar definidos no .env"
+from app.config import (
+    DB_KEEPALIVE_SEGUNDOS,
+    DB_POOL_KEEPALIVE,
+    DB_POOL_MAX_CONEXOES,
+    DB_RETENTATIVA_BASE_SEGUNDOS,
+    DB_TENTATIVAS,
+    DB_TIMEOUT_CONEXAO_SEGUNDOS,
+    DB_TIMEOUT_SEGUNDOS,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+)
+from app.metricas import instrumentar_http
+
+logger = logging.getLogger("sepet.database")
+
+_METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+_STATUS_TRANSITORIOS = {502, 503, 504}
+_ERROS_SEM_ENVIO = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_ERROS_TRANSITORIOS = (httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+_client: AsyncClient | None = None
+_http: httpx.AsyncClient | None = None
+
+
+class _TransporteComRetentativa(httpx.AsyncBaseTransport):
+    """Transporte httpx que repete requisições em erros transitórios."""
+
+    def __init__(self, transporte: httpx.AsyncBaseTransport, tentativas: int):
+        self._transporte = transporte
+        self._tentativas = max(1, tentativas)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        idempotente = request.method in _METODOS_IDEMPOTENTES
+        for tentativa in range(1, self._tentativas + 1):
+            ultima = tentativa == self._tentativas
+            try:
+                resposta = await self._transporte.handle_async_request(request)
+            except _ERROS_SEM_ENVIO as e:
+                if ultima:
+                    raise
+                motivo = type(e).__name__
+            except _ERROS_TRANSITORIOS as e:
+                if ultima or not idempotente:
+                    raise
+                motivo = type(e).__name__
+            else:
+                if ultima or not idempotente or resposta.status_code not in _STATUS_TRANSITORIOS:
+                    return resposta
+                await resposta.aclose()
+                motivo = f"HTTP {resposta.status_code}"
+
+            atraso = DB_RETENTATIVA_BASE_SEGUNDOS * 2 ** (tentativa - 1)
+            atraso *= random.uniform(0.5, 1.5)
+            logger.warning(
+                "[DB] %s %s falhou (%s); tentativa %s/%s em %.2fs",
+                request.method, request.url.path, motivo, tentativa + 1, self._tentativas, atraso,
             )
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+            await asyncio.sleep(atraso)
+
+    async def aclose(self) -> None:
+        await self._transporte.aclose()
+
+
+def _criar_http() -> httpx.AsyncClient:
+    limites = httpx.Limits(
+        max_connections=DB_POOL_MAX_CONEXOES,
+        max_keepalive_connections=DB_POOL_KEEPALIVE,
+        keepalive_expiry=DB_KEEPALIVE_SEGUNDOS,
+    )
+    transporte = _TransporteComRetentativa(
+        httpx.AsyncHTTPTransport(limits=limites, http2=True),
+        DB_TENTATIVAS,
+    )
+    cliente = httpx.AsyncClient(
+        transport=transporte,
+        timeout=httpx.Timeout(DB_TIMEOUT_SEGUNDOS, connect=DB_TIMEOUT_CONEXAO_SEGUNDOS),
+        follow_redirects=True,
+    )
+    instrumentar_http(cliente)
+    return cliente
+
+
+async def iniciar() -> None:
+    """Abre o pool HTTP e cria o cliente assíncrono (chamado no lifespan)."""
+    global _client, _http
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        logger.warning("SUPABASE_URL/SUPABASE_KEY ausentes: acesso ao banco desativado")
+        return
+    _http = _criar_http()
+    _client = await acreate_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=AsyncClientOptions(httpx_client=_http),
+    )
+    logger.info(
+        "Supabase conectado (pool=%s, timeout=%ss, tentativas=%s)",
+        DB_POOL_MAX_CONEXOES, DB_TIMEOUT_SEGUNDOS, DB_TENTATIVAS,
+    )
+
+
+async def encerrar() -> None:
+    """Fecha as conexões do pool."""
+    global _client, _http
+    if _http is not None:
+        await _http.aclose()
+    _client, _http = None, None
+
+
+def get_supabase() -> AsyncClient:
+    """Retorna o cliente assíncrono do Supabase aberto pelo lifespan."""
+    if _client is None:
+        raise RuntimeError(
+            "SUPABASE_URL e SUPABASE_KEY devem estar definidos no .env"
+        )
     return _client
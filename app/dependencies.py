@@ -1,4 +1,12 @@
-from fastapi import Header, HTTPException
+from datetime import date
+
+from fastapi import Header, HTTPException, Query
+
+from app.config import PAGINA_LIMITE_MAX, PAGINA_LIMITE_PADRAO
+from app.repositorio import FiltrosListagem
+
+# Cabeçalho com o cursor da próxima página das listagens
+CABECALHO_PROXIMO_CURSOR = "X-Proximo-Cursor"
 
 
 async def get_tenant_id(x_tenant_id: str = Header(...)) -> str:
@@ -9,3 +17,40 @@ async def get_tenant_id(x_tenant_id: str = Header(...)) -> str:
             detail="Header X-Tenant-ID é obrigatório e não pode estar vazio.",
         )
     return x_tenant_id.strip()
+
+
+async def get_filtros_listagem(
+    data_inicio: date | None = Query(None, description="data_atendimento a partir de"),
+    data_fim: date | None = Query(None, description="data_atendimento até"),
+    status_ia: str | None = Query(None, description="Pendente, Em análise, Analisado, Provisório, Falhou"),
+    especie: str | None = Query(None, description="Canina, Felina, ..."),
+    alerta_risco: bool | None = Query(None, description="Só triagens com/sem alerta de risco"),
+) -> FiltrosListagem:
+    """Filtros comuns das listagens de agendamentos e triagens."""
+    if data_inicio and data_fim and data_inicio > data_fim:
+        raise HTTPException(status_code=400, detail="data_inicio maior que data_fim.")
+    return FiltrosListagem(data_inicio, data_fim, status_ia, especie, alerta_risco)
+
+
+async def get_limite(
+    limite: int = Query(
+        PAGINA_LIMITE_PADRAO, ge=1, le=PAGINA_LIMITE_MAX,
+        description="Itens por página",
+    ),
+) -> int:
+    return limite
+
+
+def parse_campos(fields: str | None, permitidos: tuple[str, ...]) -> list[str] | None:
+    """Converte `fields=a,b` numa lista validada de colunas (None = todas)."""
+    if not fields:
+        return None
+    campos = [c.strip() for c in fields.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campo(s) inválido(s) em fields: {', '.join(invalidos)}. "
+                   f"Permitidos: {', '.join(permitidos)}.",
+        )
+    return campos
@@ -0,0 +1,168 @@
+"""
+Logs estruturados — SEPET
+Os loggers da aplicação só enfileiram o registro (`QueueHandler`); a
+formatação da mensagem e a escrita no stdout acontecem numa thread à parte
+(`QueueListener`), fora do event loop. As mensagens usam formatação
+preguiçosa (`logger.info("... %s", valor)`): os argumentos só viram texto
+na thread do listener, e nem isso se o nível estiver desligado.
+
+Cada linha sai como um objeto JSON (`LOG_FORMATO=json`) com o `request_id`
+e o tenant da requisição (ou do job da fila), propagados por ContextVar.
+O middleware HTTP registra uma linha por requisição com rota, status e
+duração; requisições GET bem-sucedidas podem ser amostradas
+(`LOG_AMOSTRAGEM_GET` / `LOG_AMOSTRAGEM_ROTAS`), mas erros e requisições
+lentas (`LOG_LENTA_MS`) são sempre registrados.
+"""
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app import metricas
+from app.config import (
+    LOG_AMOSTRAGEM_GET,
+    LOG_AMOSTRAGEM_ROTAS,
+    LOG_FORMATO,
+    LOG_LENTA_MS,
+    LOG_NIVEL,
+)
+
+SEM_REQUISICAO = "-"
+
+request_id_atual: ContextVar[str] = ContextVar("request_id_atual", default=SEM_REQUISICAO)
+
+# Atributos padrão do LogRecord; os demais (passados em `extra=`) vão para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "taskName",
+}
+
+_listener: QueueListener | None = None
+
+
+def _ler_amostragem(texto: str) -> dict[str, float]:
+    """Converte `/painel/=0.05,/triagens/=0.2` em `{"/painel/": 0.05, ...}`."""
+    fracoes = {}
+    for par in texto.split(","):
+        rota, _, fracao = par.rpartition("=")
+        if rota.strip() and fracao.strip():
+            fracoes[rota.strip()] = float(fracao)
+    return fracoes
+
+
+AMOSTRAGEM_ROTAS = _ler_amostragem(LOG_AMOSTRAGEM_ROTAS)
+
+
+class _ContextoRequisicao(logging.Filter):
+    """Anexa `request_id` e `tenant` ao registro, na thread que o emitiu."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_atual.get()
+        record.tenant = metricas.tenant_atual.get()
+        return True
+
+
+class _QueueHandlerPreguicoso(QueueHandler):
+    """
+    Enfileira o registro sem formatá-lo: o `QueueHandler` padrão monta a
+    mensagem na thread que loga, justamente o trabalho que queremos tirar
+    do event loop. Listener e handler estão no mesmo processo, então o
+    registro não precisa ser serializável.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de `extra=` no topo."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                evento[chave] = valor
+        if record.exc_info:
+            evento["exc"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def configurar() -> None:
+    """Liga o logging em fila no logger raiz (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    saida = logging.StreamHandler(sys.stdout)
+    if LOG_FORMATO == "json":
+        saida.setFormatter(FormatadorJson())
+    else:
+        saida.setFormatter(logging.Formatter(
+            "%(asctime)s | %(name)s | %(levelname)s | %(request_id)s | %(tenant)s | %(message)s"
+        ))
+
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandlerPreguicoso(fila)
+    handler.addFilter(_ContextoRequisicao())
+
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(LOG_NIVEL)
+
+    _listener = QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+
+
+def encerrar() -> None:
+    """Esvazia a fila e para a thread do listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def registrar_requisicao(
+    logger: logging.Logger,
+    metodo: str,
+    rota: str,
+    caminho: str,
+    status: int,
+    duracao_ms: float,
+) -> None:
+    """Linha de acesso de uma requisição, respeitando a amostragem de GET."""
+    lenta = duracao_ms >= LOG_LENTA_MS
+    if metodo == "GET" and status < 400 and not lenta:
+        fracao = AMOSTRAGEM_ROTAS.get(rota, LOG_AMOSTRAGEM_GET)
+        if fracao < 1 and random.random() >= fracao:
+            return
+
+    nivel = logging.WARNING if lenta or status >= 500 else logging.INFO
+    logger.log(
+        nivel,
+        "%s %s %s %.1fms",
+        metodo,
+        caminho,
+        status,
+        duracao_ms,
+        extra={
+            "metodo": metodo,
+            "rota": rota,
+            "caminho": caminho,
+            "status": status,
+            "duracao_ms": round(duracao_ms, 1),
+            "lenta": lenta,
+        },
+    )
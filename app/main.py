@@ -1,24 +1,38 @@
 import logging
+import time
+import uuid
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from pathlib import Path
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from app import database, logs, metricas
 from app.config import SEPET_ENDERECO
-from app.routes import agendamentos, triagens, analise, comprovantes
+from app.dependencies import CABECALHO_PROXIMO_CURSOR
+from app.routes import agendamentos, triagens, analise, comprovantes, exportacao, painel
+from app.services import fila_analise, idempotencia
+from app.services.cache import caches_registrados
 
 # ── Logging ──────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(name)s | %(levelname)s | %(message)s",
-)
+logs.configurar()
 logger = logging.getLogger("sepet")
+logger_acesso = logging.getLogger("sepet.acesso")
+
+CABECALHO_REQUEST_ID = "X-Request-ID"
 
 
 # ── Lifespan ─────────────────────────────────
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info(f"🐾 SEPET Backend iniciado | {SEPET_ENDERECO}")
+    logger.info("🐾 SEPET Backend iniciado")
+    await database.iniciar()
+    await fila_analise.iniciar()
     yield
+    await fila_analise.encerrar()
+    idempotencia.encerrar()
+    await database.encerrar()
     logger.info("🐾 SEPET Backend encerrado")
+    logs.encerrar()
 
 
 # ── App ──────────────────────────────────────
@@ -40,19 +54,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        CABECALHO_PROXIMO_CURSOR,
+        CABECALHO_REQUEST_ID,
+        idempotencia.CABECALHO_REPETIDA,
+        "Retry-After",
+    ],
 )
 
 
 # ── Middleware de log ────────────────────────
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    tenant = request.headers.get("X-Tenant-ID", "sem-tenant")
-    logger.info(
-        f"➡ {request.method} {request.url.path} | Tenant: {tenant} | "
-        f"Local: {SEPET_ENDERECO}"
-    )
-    response = await call_next(request)
-    return response
+    tenant = request.headers.get("X-Tenant-ID", metricas.SEM_TENANT).strip() or metricas.SEM_TENANT
+    metricas.tenant_atual.set(tenant)
+    # Reaproveita o id do proxy/cliente, se vier, para correlacionar os logs
+    request_id = request.headers.get(CABECALHO_REQUEST_ID, "").strip()[:128] or uuid.uuid4().hex
+    logs.request_id_atual.set(request_id)
+
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[CABECALHO_REQUEST_ID] = request_id
+        return response
+    finally:
+        segundos = time.perf_counter() - inicio
+        # Rótulo pelo template da rota (ex.: /agendamentos/{agendamento_id})
+        rota = getattr(request.scope.get("route"), "path", "desconhecida")
+        metricas.registrar_http(request.method, rota, status, segundos)
+        logs.registrar_requisicao(
+            logger_acesso, request.method, rota, request.url.path, status, segundos * 1000
+        )
+
+
+# ── Arquivos estáticos ───────────────────────
+class _EstaticosVersionados(StaticFiles):
+    """
+    Arquivos referenciados com `?v=<hash do conteúdo>` (ex.: o CSS dos
+    comprovantes): o navegador pode guardá-los por um ano sem revalidar.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+app.mount(
+    "/static",
+    _EstaticosVersionados(directory=Path(__file__).parent / "static"),
+    name="static",
+)
 
 
 # ── Rotas ────────────────────────────────────
@@ -60,6 +114,8 @@ app.include_router(agendamentos.router)
 app.include_router(triagens.router)
 app.include_router(analise.router)
 app.include_router(comprovantes.router)
+app.include_router(painel.router)
+app.include_router(exportacao.router)
 
 
 # ── Health check ─────────────────────────────
@@ -70,3 +126,16 @@ async def root():
         "servico": "SEPET – Sistema de Esterilização de Pets",
         "endereco": SEPET_ENDERECO,
     }
+
+
+@app.get("/cache", tags=["Health"])
+async def estatisticas_cache():
+    """Estatísticas de acertos, faltas e expulsões de cada cache do processo."""
+    return [cache.estatisticas() for cache in caches_registrados()]
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def exportar_metricas():
+    """Métricas no formato texto do Prometheus."""
+    corpo, content_type = metricas.exportar()
+    return Response(content=corpo, media_type=content_type)
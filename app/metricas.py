@@ -0,0 +1,250 @@
+"""
+Métricas Prometheus — SEPET
+Instrumentação de latência e volume, exposta em `GET /metrics` no formato
+texto do Prometheus:
+  - tempo de parede por etapa do pipeline (Lupa, Juiz, Relator, Único)
+  - tokens de entrada/saída por etapa
+  - ativações do fallback, caminhos do `_extrair_json` e vereditos
+  - latência por rota do FastAPI e por tabela/operação no Supabase
+  - acertos/faltas/expulsões dos caches da aplicação
+  - requisições com Idempotency-Key (novas, repetidas, conflitos)
+  - fila do limitador do LLM por tenant (na fila, em execução, recusadas)
+  - estado do disjuntor do LLM, novas tentativas, prazos esgotados e hedges
+
+As séries são rotuladas pelo tenant da requisição (ou do job da fila),
+propagado pela ContextVar `tenant_atual`.
+"""
+import time
+from contextvars import ContextVar
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+from app.services.cache import caches_registrados
+
+SEM_TENANT = "sem-tenant"
+
+tenant_atual: ContextVar[str] = ContextVar("tenant_atual", default=SEM_TENANT)
+
+_BUCKETS_LLM = (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+_BUCKETS_IO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LLM_ETAPA_SEGUNDOS = Histogram(
+    "sepet_llm_etapa_segundos",
+    "Tempo de parede de cada etapa do pipeline de análise",
+    ["etapa", "tenant"],
+    buckets=_BUCKETS_LLM,
+)
+LLM_TOKENS = Counter(
+    "sepet_llm_tokens",
+    "Tokens consumidos no LLM, por etapa e tipo (entrada/saida)",
+    ["etapa", "tipo", "tenant"],
+)
+ANALISE_FALLBACK = Counter(
+    "sepet_analise_fallback",
+    "Análises resolvidas pelo fallback determinístico",
+    ["tenant"],
+)
+EXTRAIR_JSON_CAMINHO = Counter(
+    "sepet_extrair_json_caminho",
+    "Caminho usado por _extrair_json para recuperar o JSON do Relator",
+    ["caminho", "tenant"],
+)
+ANALISE_RESULTADO = Counter(
+    "sepet_analise_resultado",
+    "Análises concluídas, por alerta_risco e caminho",
+    ["alerta_risco", "caminho", "tenant"],
+)
+HTTP_SEGUNDOS = Histogram(
+    "sepet_http_requisicao_segundos",
+    "Latência das requisições HTTP por rota",
+    ["metodo", "rota", "status", "tenant"],
+    buckets=_BUCKETS_IO,
+)
+DB_SEGUNDOS = Histogram(
+    "sepet_db_segundos",
+    "Latência das chamadas ao Supabase (PostgREST) por tabela e operação",
+    ["tabela", "operacao", "tenant"],
+    buckets=_BUCKETS_IO,
+)
+IDEMPOTENCIA_RESULTADO = Counter(
+    "sepet_idempotencia",
+    "Requisições com Idempotency-Key, por resultado (nova, repetida, conflito, em_andamento)",
+    ["resultado", "tenant"],
+)
+LLM_FILA_ESPERA_SEGUNDOS = Histogram(
+    "sepet_llm_fila_espera_segundos",
+    "Espera na fila do limitador antes de cada chamada ao LLM",
+    ["tenant"],
+    buckets=_BUCKETS_LLM,
+)
+LLM_NA_FILA = Gauge(
+    "sepet_llm_na_fila",
+    "Chamadas ao LLM aguardando vaga no limitador, por tenant",
+    ["tenant"],
+)
+LLM_EM_EXECUCAO = Gauge(
+    "sepet_llm_em_execucao",
+    "Chamadas ao LLM em execução, por tenant",
+    ["tenant"],
+)
+LLM_RECUSADAS = Counter(
+    "sepet_llm_recusadas",
+    "Chamadas ao LLM recusadas com a fila do tenant cheia (429)",
+    ["tenant"],
+)
+LLM_CIRCUITO = Gauge(
+    "sepet_llm_circuito",
+    "Estado do disjuntor do LLM (1 no estado atual: fechado, aberto, meio_aberto)",
+    ["estado"],
+)
+LLM_RESILIENCIA = Counter(
+    "sepet_llm_resiliencia",
+    "Eventos de resiliência por etapa (nova_tentativa, prazo_esgotado, hedge, hedge_venceu)",
+    ["etapa", "evento", "tenant"],
+)
+LLM_CIRCUITO.labels("fechado").set(1)
+
+_OPERACOES_HTTP = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "PUT": "upsert",
+    "DELETE": "delete",
+}
+
+
+# ── Registro ─────────────────────────────────
+
+def registrar_etapa(etapa: str, segundos: float, uso: dict | None) -> None:
+    """Registra duração e tokens (`usage_metadata` do LangChain) de uma etapa."""
+    tenant = tenant_atual.get()
+    LLM_ETAPA_SEGUNDOS.labels(etapa, tenant).observe(segundos)
+    if uso:
+        LLM_TOKENS.labels(etapa, "entrada", tenant).inc(uso.get("input_tokens", 0))
+        LLM_TOKENS.labels(etapa, "saida", tenant).inc(uso.get("output_tokens", 0))
+
+
+def registrar_resultado(resultado: dict) -> None:
+    ANALISE_RESULTADO.labels(
+        str(resultado["alerta_risco"]).lower(),
+        resultado.get("caminho", "desconhecido"),
+        tenant_atual.get(),
+    ).inc()
+
+
+def registrar_fallback() -> None:
+    ANALISE_FALLBACK.labels(tenant_atual.get()).inc()
+
+
+def registrar_extrair_json(caminho: str) -> None:
+    EXTRAIR_JSON_CAMINHO.labels(caminho, tenant_atual.get()).inc()
+
+
+def registrar_idempotencia(resultado: str) -> None:
+    IDEMPOTENCIA_RESULTADO.labels(resultado, tenant_atual.get()).inc()
+
+
+def registrar_llm_espera(tenant: str, segundos: float) -> None:
+    LLM_FILA_ESPERA_SEGUNDOS.labels(tenant).observe(segundos)
+
+
+def registrar_llm_recusada(tenant: str) -> None:
+    LLM_RECUSADAS.labels(tenant).inc()
+
+
+def atualizar_uso_llm(tenant: str, na_fila: int, em_execucao: int) -> None:
+    LLM_NA_FILA.labels(tenant).set(na_fila)
+    LLM_EM_EXECUCAO.labels(tenant).set(em_execucao)
+
+
+def registrar_circuito_llm(estado: str) -> None:
+    for nome in ("fechado", "aberto", "meio_aberto"):
+        LLM_CIRCUITO.labels(nome).set(1 if nome == estado else 0)
+
+
+def registrar_resiliencia_llm(etapa: str, evento: str) -> None:
+    LLM_RESILIENCIA.labels(etapa, evento, tenant_atual.get()).inc()
+
+
+def registrar_http(metodo: str, rota: str, status: int, segundos: float) -> None:
+    HTTP_SEGUNDOS.labels(metodo, rota, str(status), tenant_atual.get()).observe(segundos)
+
+
+# ── Supabase (hooks do cliente httpx do PostgREST) ──
+
+def _tabela_operacao(request: httpx.Request) -> tuple[str, str]:
+    """Deduz tabela e operação a partir de `/rest/v1/<tabela>` ou `/rpc/<funcao>`."""
+    partes = request.url.path.rstrip("/").split("/")
+    if len(partes) >= 2 and partes[-2] == "rpc":
+        return partes[-1], "rpc"
+    operacao = _OPERACOES_HTTP.get(request.method, request.method.lower())
+    if operacao == "insert" and "resolution=merge-duplicates" in request.headers.get("prefer", ""):
+        operacao = "upsert"
+    return partes[-1], operacao
+
+
+def _hook_requisicao(request: httpx.Request) -> None:
+    request.extensions["sepet_inicio"] = time.perf_counter()
+
+
+def _hook_resposta(response: httpx.Response) -> None:
+    inicio = response.request.extensions.get("sepet_inicio")
+    if inicio is None:
+        return
+    tabela, operacao = _tabela_operacao(response.request)
+    DB_SEGUNDOS.labels(tabela, operacao, tenant_atual.get()).observe(
+        time.perf_counter() - inicio
+    )
+
+
+async def _hook_requisicao_async(request: httpx.Request) -> None:
+    _hook_requisicao(request)
+
+
+async def _hook_resposta_async(response: httpx.Response) -> None:
+    _hook_resposta(response)
+
+
+def instrumentar_http(cliente: httpx.Client | httpx.AsyncClient) -> None:
+    """Registra os hooks de latência num cliente httpx do PostgREST."""
+    if isinstance(cliente, httpx.AsyncClient):
+        cliente.event_hooks["request"].append(_hook_requisicao_async)
+        cliente.event_hooks["response"].append(_hook_resposta_async)
+    else:
+        cliente.event_hooks["request"].append(_hook_requisicao)
+        cliente.event_hooks["response"].append(_hook_resposta)
+
+
+# ── Caches ───────────────────────────────────
+
+class _ColetorCaches:
+    """Exporta as estatísticas dos caches registrados a cada coleta."""
+
+    def collect(self):
+        acertos = CounterMetricFamily(
+            "sepet_cache_acertos", "Acertos por cache e camada", labels=["cache", "camada"]
+        )
+        faltas = CounterMetricFamily("sepet_cache_faltas", "Faltas por cache", labels=["cache"])
+        expulsoes = CounterMetricFamily(
+            "sepet_cache_expulsoes", "Expulsões por LRU", labels=["cache"]
+        )
+        itens = GaugeMetricFamily("sepet_cache_itens", "Itens na L1", labels=["cache"])
+        for cache in caches_registrados():
+            est = cache.estatisticas()
+            acertos.add_metric([est["nome"], "l1"], est["acertos"])
+            acertos.add_metric([est["nome"], "l2"], est["acertos_l2"])
+            faltas.add_metric([est["nome"]], est["faltas"])
+            expulsoes.add_metric([est["nome"]], est["expulsoes"])
+            itens.add_metric([est["nome"]], est["itens"])
+        yield from (acertos, faltas, expulsoes, itens)
+
+
+REGISTRY.register(_ColetorCaches())
+
+
+def exportar() -> tuple[bytes, str]:
+    """Corpo e content-type do endpoint `/metrics`."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
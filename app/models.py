@@ -83,3 +83,69 @@ class AgendamentoResponse(BaseModel):
     data_atendimento: str | None = None
     status_ia: str = "Pendente"
     created_at: str | None = None
+
+
+# ──────────────────────────────────────────────
+# Modelos do Painel de Gestão
+# ──────────────────────────────────────────────
+class TriagemResumo(BaseModel):
+    """Resumo da triagem exibido em cada linha do painel."""
+    id: str | None = None
+    alerta_risco: bool = False
+    parecer_ia: str | None = None
+    respostas_triagem: dict[str, Any] = {}
+
+
+class PainelItem(AgendamentoResponse):
+    triagem: TriagemResumo | None = None
+
+
+class TotalPorData(BaseModel):
+    data: str
+    total: int
+    alertas: int
+
+
+class PainelTotais(BaseModel):
+    """Totais do período filtrado, calculados no banco."""
+    agendamentos: int = 0
+    alertas_risco: int = 0
+    com_parecer: int = 0
+    analisados: int = 0
+    provisorios: int = 0
+    pendentes: int = 0
+    em_analise: int = 0
+    falhas: int = 0
+    por_data: list[TotalPorData] | None = None
+
+
+class PainelResponse(BaseModel):
+    itens: list[PainelItem] = []
+    proximo_cursor: str | None = None
+    totais: PainelTotais | None = None
+
+
+# ──────────────────────────────────────────────
+# Modelos de Disponibilidade
+# ──────────────────────────────────────────────
+class VagasGrupo(BaseModel):
+    """Vagas de um grupo (`*` ou espécie) num dia; `vagas` None = sem limite."""
+    vagas: int | None = None
+    ocupadas: int = 0
+    livres: int | None = None
+
+
+class DisponibilidadeDia(BaseModel):
+    data: str
+    grupos: dict[str, VagasGrupo] = {}
+
+
+class DisponibilidadeMes(BaseModel):
+    """
+    Calendário do mês. A espécie usa o seu próprio grupo se ele existir
+    em `grupos`, senão o grupo geral `*`; cada agendamento ocupa o peso
+    do porte em `pesos_porte` (1 para portes ausentes).
+    """
+    mes: str
+    pesos_porte: dict[str, int] = {}
+    dias: list[DisponibilidadeDia] = []
@@ -0,0 +1,629 @@
+"""
+Repositório de agendamentos e triagens — SEPET
+Ponto único de acesso às tabelas `agendamentos` e `triagens`.
+
+Leituras selecionam só as colunas usadas pela API e trazem o agendamento
+junto com a sua triagem numa única consulta (recurso embutido do PostgREST,
+pela FK `triagens.agendamento_id`). As variantes em lote resolvem muitos
+ids com uma consulta por bloco de `_BLOCO_IDS`.
+
+Leituras por id (`obter_agendamento`, `obter_triagem_do_agendamento`,
+`obter_agendamento_com_triagem`) passam por um cache read-through chaveado
+por `(tenant_id, agendamento_id)`, invalidado pelas escritas deste módulo.
+
+Listagens são paginadas por keyset em `(created_at, id)`, do mais recente
+para o mais antigo: o cursor é opaco (base64 da última linha da página) e
+cada página custa uma consulta indexada, qualquer que seja a profundidade.
+
+Escritas que envolvem as duas tabelas usam, sempre que o banco tem as
+funções de `supabase/migrations/`, uma única chamada RPC transacional:
+  - criar_agendamento_com_triagem – reserva a vaga do dia e insere
+                                    agendamento + triagem juntos
+  - registrar_analise             – grava o parecer e o status_ia juntos
+
+Sem as funções (banco antigo ou backend substituto), cai para as escritas
+sequenciais, desfazendo o agendamento se a triagem não puder ser gravada
+(e sem controle de capacidade).
+"""
+import asyncio
+import base64
+import json
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import date
+
+from postgrest.exceptions import APIError
+from postgrest.types import CountMethod
+
+from app.config import (
+    CACHE_AGENDAMENTOS_CAPACIDADE,
+    CACHE_AGENDAMENTOS_DB,
+    CACHE_AGENDAMENTOS_TTL_L1_SEGUNDOS,
+    CACHE_AGENDAMENTOS_TTL_SEGUNDOS,
+    PAGINA_LIMITE_MAX,
+)
+from app.database import get_supabase
+from app.services.cache import CacheLRU
+
+logger = logging.getLogger("sepet.repositorio")
+
+COLUNAS_AGENDAMENTO = (
+    "id,tenant_id,nome_tutor,cpf_tutor,nome_animal,especie,raca,porte,"
+    "data_atendimento,status_ia,created_at"
+)
+COLUNAS_TRIAGEM = "id,agendamento_id,respostas_triagem,alerta_risco,parecer_ia,created_at"
+COLUNAS_PET = "id,nome_animal,especie,raca,porte"
+COLUNAS_RESUMO_TRIAGEM = "id,alerta_risco,parecer_ia,respostas_triagem"
+
+CAMPOS_AGENDAMENTO = tuple(COLUNAS_AGENDAMENTO.split(","))
+CAMPOS_TRIAGEM = tuple(COLUNAS_TRIAGEM.split(","))
+
+# Tamanho dos blocos de ids nas consultas `in` (limite de URL do PostgREST)
+_BLOCO_IDS = 100
+
+# Códigos do PostgREST/Postgres para "função não existe"
+_ERROS_FUNCAO_AUSENTE = {"PGRST202", "42883"}
+
+# Códigos do PostgREST/Postgres para "tabela não existe"
+_ERROS_TABELA_AUSENTE = {"PGRST205", "42P01"}
+
+# SQLSTATE levantado por `reservar_vaga` quando o dia está lotado
+_ERRO_SEM_VAGAS = "SEP01"
+
+# RPCs/tabelas que já falharam por ausência, para não pagar a ida e volta de novo
+_rpc_ausentes: set[str] = set()
+_tabelas_ausentes: set[str] = set()
+
+# Retorno de `_rpc` quando a função não existe (None é um retorno válido)
+_SEM_RPC = object()
+
+# Agendamento + triagem por (tenant, id); ver `invalidar_agendamento`.
+# Ausências não são guardadas, então criar um agendamento não invalida nada.
+# A L1 vale pouco mesmo sem a L2: com vários workers, a invalidação só
+# acontece no worker que gravou, e os demais não podem servir o status e o
+# parecer antigos pelo TTL inteiro.
+_cache = CacheLRU(
+    "agendamentos",
+    capacidade=CACHE_AGENDAMENTOS_CAPACIDADE,
+    ttl_segundos=CACHE_AGENDAMENTOS_TTL_SEGUNDOS,
+    caminho_sqlite=CACHE_AGENDAMENTOS_DB,
+    ttl_l1_segundos=CACHE_AGENDAMENTOS_TTL_L1_SEGUNDOS,
+)
+
+# Contador de invalidações: uma leitura iniciada antes de uma escrita não
+# grava no cache o valor que ela acabou de tornar obsoleto.
+_invalidacoes = 0
+
+
+class SemVagas(Exception):
+    """A data escolhida não tem vagas suficientes para o porte do animal."""
+
+
+async def _rpc(funcao: str, parametros: dict):
+    """Chama uma função RPC; retorna `_SEM_RPC` se ela não existe no banco."""
+    if funcao in _rpc_ausentes:
+        return _SEM_RPC
+    try:
+        result = await get_supabase().rpc(funcao, parametros).execute()
+    except APIError as e:
+        if e.code not in _ERROS_FUNCAO_AUSENTE:
+            raise
+        _rpc_ausentes.add(funcao)
+        logger.warning(
+            "Função %s não encontrada no banco; usando o caminho sem RPC. "
+            "Aplique supabase/migrations para a versão em uma única chamada.",
+            funcao,
+        )
+        return _SEM_RPC
+    return result.data
+
+
+def _unico(valor) -> dict | None:
+    """Normaliza um recurso embutido (lista 1:N ou objeto 1:1) para um registro."""
+    if isinstance(valor, list):
+        return valor[0] if valor else None
+    return valor
+
+
+def _separar_triagem(linha: dict) -> dict:
+    """Move o `triagens` embutido para a chave `triagem` (dict ou None)."""
+    agendamento = dict(linha)
+    agendamento["triagem"] = _unico(agendamento.pop("triagens", None))
+    return agendamento
+
+
+# ── Paginação ────────────────────────────────
+
+@dataclass
+class FiltrosListagem:
+    """Filtros das listagens; campos None não filtram."""
+    data_inicio: date | None = None
+    data_fim: date | None = None
+    status_ia: str | None = None
+    especie: str | None = None
+    alerta_risco: bool | None = None
+
+
+def codificar_cursor(linha: dict) -> str:
+    bruto = json.dumps([linha["created_at"], linha["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[str, str]:
+    """Lê `(created_at, id)` de um cursor; ValueError se estiver malformado."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        criado_em, registro_id = json.loads(bruto)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor inválido.") from e
+    return str(criado_em), str(registro_id)
+
+
+def _literal(valor: str) -> str:
+    """Valor entre aspas para filtros `or` do PostgREST (datas têm `:` e `+`)."""
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _colunas(campos: list[str] | None, todos: tuple[str, ...]) -> list[str]:
+    """Colunas da projeção, sempre incluindo as chaves do cursor."""
+    escolhidos = list(campos or todos)
+    return escolhidos + [c for c in ("id", "created_at") if c not in escolhidos]
+
+
+def _projetar(linhas: list[dict], campos: list[str] | None) -> list[dict]:
+    if not campos:
+        return linhas
+    return [{c: linha[c] for c in campos if c in linha} for linha in linhas]
+
+
+async def paginar(consulta, limite: int, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """
+    Executa uma consulta já filtrada como uma página keyset.
+
+    Returns:
+        (linhas da página, cursor da próxima página ou None na última)
+    """
+    if cursor:
+        criado_em, registro_id = decodificar_cursor(cursor)
+        criado_em, registro_id = _literal(criado_em), _literal(registro_id)
+        consulta = consulta.or_(
+            f"created_at.lt.{criado_em},"
+            f"and(created_at.eq.{criado_em},id.lt.{registro_id})"
+        )
+    result = await (
+        consulta.order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limite + 1)
+        .execute()
+    )
+    linhas = result.data
+    proximo = codificar_cursor(linhas[limite - 1]) if len(linhas) > limite else None
+    return linhas[:limite], proximo
+
+
+def _filtrar(consulta, filtros: FiltrosListagem, agendamento: str, triagem: str):
+    """Aplica os filtros; `agendamento`/`triagem` são os prefixos das colunas."""
+    if filtros.data_inicio:
+        consulta = consulta.gte(f"{agendamento}data_atendimento", filtros.data_inicio.isoformat())
+    if filtros.data_fim:
+        consulta = consulta.lte(f"{agendamento}data_atendimento", filtros.data_fim.isoformat())
+    if filtros.status_ia:
+        consulta = consulta.eq(f"{agendamento}status_ia", filtros.status_ia)
+    if filtros.especie:
+        consulta = consulta.eq(f"{agendamento}especie", filtros.especie)
+    if filtros.alerta_risco is not None:
+        consulta = consulta.eq(f"{triagem}alerta_risco", filtros.alerta_risco)
+    return consulta
+
+
+# ── Cache de leituras por id ─────────────────
+
+def _chave(tenant_id: str, agendamento_id: str) -> str:
+    return f"{tenant_id}:{agendamento_id}"
+
+
+def _copia(registro: dict) -> dict:
+    """Cópia rasa do registro em cache, para o chamador poder alterá-la."""
+    triagem = registro.get("triagem")
+    return {**registro, "triagem": dict(triagem) if triagem else None}
+
+
+def invalidar_agendamento(tenant_id: str, agendamento_id: str) -> None:
+    """Descarta o agendamento (e sua triagem) do cache após uma escrita."""
+    global _invalidacoes
+    _invalidacoes += 1
+    _cache.invalidar(_chave(tenant_id, agendamento_id))
+
+
+# ── Leituras ─────────────────────────────────
+
+async def listar_agendamentos(
+    tenant_id: str,
+    limite: int,
+    cursor: str | None = None,
+    campos: list[str] | None = None,
+    filtros: FiltrosListagem | None = None,
+) -> tuple[list[dict], str | None]:
+    """Página de agendamentos; `campos` restringe as colunas devolvidas."""
+    filtros = filtros or FiltrosListagem()
+    select = ",".join(_colunas(campos, CAMPOS_AGENDAMENTO))
+    if filtros.alerta_risco is not None:
+        select += ",triagens!inner()"
+    consulta = _filtrar(
+        get_supabase().table("agendamentos").select(select).eq("tenant_id", tenant_id),
+        filtros, agendamento="", triagem="triagens.",
+    )
+    linhas, proximo = await paginar(consulta, limite, cursor)
+    return _projetar(linhas, campos), proximo
+
+
+async def listar_triagens(
+    tenant_id: str,
+    limite: int,
+    cursor: str | None = None,
+    campos: list[str] | None = None,
+    filtros: FiltrosListagem | None = None,
+) -> tuple[list[dict], str | None]:
+    """Página de triagens; filtros de agendamento usam um join interno."""
+    filtros = filtros or FiltrosListagem()
+    select = ",".join(_colunas(campos, CAMPOS_TRIAGEM))
+    if any((filtros.data_inicio, filtros.data_fim, filtros.status_ia, filtros.especie)):
+        select += ",agendamentos!inner()"
+    consulta = _filtrar(
+        get_supabase().table("triagens").select(select).eq("tenant_id", tenant_id),
+        filtros, agendamento="agendamentos.", triagem="",
+    )
+    linhas, proximo = await paginar(consulta, limite, cursor)
+    return _projetar(linhas, campos), proximo
+
+
+async def obter_agendamento_com_triagem(agendamento_id: str, tenant_id: str) -> dict | None:
+    """Agendamento com a triagem em `triagem` (None se ainda não existe)."""
+    chave = _chave(tenant_id, agendamento_id)
+    registro = _cache.obter(chave)
+    if registro is None:
+        invalidacoes = _invalidacoes
+        result = await (
+            get_supabase().table("agendamentos")
+            .select(f"{COLUNAS_AGENDAMENTO},triagens({COLUNAS_TRIAGEM})")
+            .eq("id", agendamento_id)
+            .eq("tenant_id", tenant_id)
+            .execute()
+        )
+        if not result.data:
+            return None
+        registro = _separar_triagem(result.data[0])
+        if invalidacoes == _invalidacoes:
+            _cache.gravar(chave, registro)
+    return _copia(registro)
+
+
+async def obter_agendamento(agendamento_id: str, tenant_id: str) -> dict | None:
+    registro = await obter_agendamento_com_triagem(agendamento_id, tenant_id)
+    if registro is None:
+        return None
+    registro.pop("triagem")
+    return registro
+
+
+async def obter_triagem_do_agendamento(agendamento_id: str, tenant_id: str) -> dict | None:
+    registro = await obter_agendamento_com_triagem(agendamento_id, tenant_id)
+    return registro["triagem"] if registro else None
+
+
+async def listar_agendamentos_com_triagem(ids: list[str], tenant_id: str) -> list[dict]:
+    """Variante em lote de `obter_agendamento_com_triagem`."""
+    linhas = []
+    for inicio in range(0, len(ids), _BLOCO_IDS):
+        result = await (
+            get_supabase().table("agendamentos")
+            .select(f"{COLUNAS_AGENDAMENTO},triagens({COLUNAS_TRIAGEM})")
+            .eq("tenant_id", tenant_id)
+            .in_("id", ids[inicio:inicio + _BLOCO_IDS])
+            .execute()
+        )
+        linhas.extend(result.data)
+    return [_separar_triagem(linha) for linha in linhas]
+
+
+async def iterar_agendamentos_com_triagem(
+    tenant_id: str,
+    filtros: FiltrosListagem,
+    tamanho_pagina: int,
+) -> AsyncIterator[list[dict]]:
+    """
+    Percorre todos os agendamentos do filtro, página a página (keyset),
+    já com a triagem completa em `triagem`. Só uma página fica em memória.
+    """
+    cursor = None
+    while True:
+        consulta = _filtrar(
+            get_supabase().table("agendamentos")
+            .select(f"{COLUNAS_AGENDAMENTO},triagens({COLUNAS_TRIAGEM})")
+            .eq("tenant_id", tenant_id),
+            filtros, agendamento="", triagem="triagens.",
+        )
+        linhas, cursor = await paginar(consulta, tamanho_pagina, cursor)
+        if linhas:
+            yield [_separar_triagem(linha) for linha in linhas]
+        if cursor is None:
+            return
+
+
+async def listar_pets_com_triagem_por_status(
+    tenant_id: str,
+    status_ia: list[str],
+) -> list[dict]:
+    """
+    Dados do pet dos agendamentos com o `status_ia` dado, cada um com
+    `triagem` (id e respostas) — entrada do reprocessamento em lote.
+    Lido em páginas keyset: uma consulta única seria cortada em silêncio
+    pelo `max-rows` do PostgREST num backlog grande.
+    """
+    linhas, cursor = [], None
+    while True:
+        consulta = (
+            get_supabase().table("agendamentos")
+            .select(f"{COLUNAS_PET},created_at,triagens(id,respostas_triagem)")
+            .eq("tenant_id", tenant_id)
+            .in_("status_ia", status_ia)
+        )
+        pagina, cursor = await paginar(consulta, PAGINA_LIMITE_MAX, cursor)
+        linhas.extend(_separar_triagem(linha) for linha in pagina)
+        if cursor is None:
+            return linhas
+
+
+async def obter_triagem_com_pet(triagem_id: str, tenant_id: str) -> dict | None:
+    """Triagem com os dados do pet do agendamento em `agendamento`."""
+    result = await (
+        get_supabase().table("triagens")
+        .select(f"id,agendamento_id,respostas_triagem,agendamentos({COLUNAS_PET})")
+        .eq("id", triagem_id)
+        .eq("tenant_id", tenant_id)
+        .execute()
+    )
+    if not result.data:
+        return None
+    triagem = dict(result.data[0])
+    triagem["agendamento"] = _unico(triagem.pop("agendamentos", None))
+    return triagem
+
+
+# ── Painel ───────────────────────────────────
+
+async def listar_painel(
+    tenant_id: str,
+    limite: int,
+    cursor: str | None = None,
+    filtros: FiltrosListagem | None = None,
+) -> tuple[list[dict], str | None]:
+    """Página de agendamentos com o resumo da triagem já unido em `triagem`."""
+    filtros = filtros or FiltrosListagem()
+    juncao = "triagens!inner" if filtros.alerta_risco is not None else "triagens"
+    consulta = _filtrar(
+        get_supabase().table("agendamentos")
+        .select(f"{COLUNAS_AGENDAMENTO},{juncao}({COLUNAS_RESUMO_TRIAGEM})")
+        .eq("tenant_id", tenant_id),
+        filtros, agendamento="", triagem="triagens.",
+    )
+    linhas, proximo = await paginar(consulta, limite, cursor)
+    return [_separar_triagem(linha) for linha in linhas], proximo
+
+
+async def painel_totais(
+    tenant_id: str,
+    filtros: FiltrosListagem,
+    status_conhecidos: list[str],
+) -> dict:
+    """
+    Totais do painel no período/espécie dos filtros, calculados no banco:
+    `agendamentos`, `alertas_risco`, `com_parecer`, `por_status` e `por_data`.
+
+    Sem a função `painel_totais` no banco, faz contagens `head` em paralelo
+    (uma por total) e `por_data` fica None.
+    """
+    parametros = {
+        "p_tenant_id": tenant_id,
+        "p_data_inicio": filtros.data_inicio.isoformat() if filtros.data_inicio else None,
+        "p_data_fim": filtros.data_fim.isoformat() if filtros.data_fim else None,
+        "p_especie": filtros.especie,
+    }
+    totais = await _rpc("painel_totais", parametros)
+    if totais is not _SEM_RPC:
+        return totais
+
+    periodo = FiltrosListagem(filtros.data_inicio, filtros.data_fim, especie=filtros.especie)
+
+    async def contar(tabela: str, select: str, agendamento: str, triagem: str, ajuste) -> int:
+        consulta = get_supabase().table(tabela).select(
+            select, count=CountMethod.exact, head=True
+        ).eq("tenant_id", tenant_id)
+        consulta = ajuste(_filtrar(consulta, periodo, agendamento, triagem))
+        return (await consulta.execute()).count or 0
+
+    def agendamentos(ajuste):
+        return contar("agendamentos", "id", "", "triagens.", ajuste)
+
+    def triagens(ajuste):
+        return contar("triagens", "id,agendamentos!inner()", "agendamentos.", "", ajuste)
+
+    total, alertas, com_parecer, *por_status = await asyncio.gather(
+        agendamentos(lambda c: c),
+        triagens(lambda c: c.eq("alerta_risco", True)),
+        triagens(lambda c: c.not_.is_("parecer_ia", "null")),
+        *(agendamentos(lambda c, s=status: c.eq("status_ia", s)) for status in status_conhecidos),
+    )
+    return {
+        "agendamentos": total,
+        "alertas_risco": alertas,
+        "com_parecer": com_parecer,
+        "por_status": dict(zip(status_conhecidos, por_status)),
+        "por_data": None,
+    }
+
+
+# ── Capacidade ───────────────────────────────
+
+async def obter_capacidade(tenant_id: str) -> dict[str, int] | None:
+    """
+    Vagas por grupo (`'*'` ou espécie) configuradas para o tenant.
+    None se a tabela `capacidade_atendimento` não existe no banco.
+    """
+    if "capacidade_atendimento" in _tabelas_ausentes:
+        return None
+    try:
+        result = await (
+            get_supabase().table("capacidade_atendimento")
+            .select("especie,vagas")
+            .eq("tenant_id", tenant_id)
+            .execute()
+        )
+    except APIError as e:
+        if e.code not in _ERROS_TABELA_AUSENTE:
+            raise
+        _tabelas_ausentes.add("capacidade_atendimento")
+        return None
+    return {linha["especie"]: linha["vagas"] for linha in result.data}
+
+
+async def obter_ocupacao(tenant_id: str, inicio: date, fim: date) -> list[dict] | None:
+    """
+    Linhas `{data, grupo, ocupadas}` do índice de ocupação no período.
+    None se a tabela `ocupacao_diaria` não existe no banco.
+    """
+    if "ocupacao_diaria" in _tabelas_ausentes:
+        return None
+    try:
+        result = await (
+            get_supabase().table("ocupacao_diaria")
+            .select("data,grupo,ocupadas")
+            .eq("tenant_id", tenant_id)
+            .gte("data", inicio.isoformat())
+            .lte("data", fim.isoformat())
+            .execute()
+        )
+    except APIError as e:
+        if e.code not in _ERROS_TABELA_AUSENTE:
+            raise
+        _tabelas_ausentes.add("ocupacao_diaria")
+        return None
+    return result.data
+
+
+async def listar_portes_por_data(tenant_id: str, inicio: date, fim: date) -> list[dict]:
+    """
+    `data_atendimento` e `porte` de cada agendamento do período, para
+    calcular a ocupação quando o banco não tem o índice `ocupacao_diaria`.
+    """
+    filtros = FiltrosListagem(data_inicio=inicio, data_fim=fim)
+    linhas, cursor = [], None
+    while True:
+        consulta = _filtrar(
+            get_supabase().table("agendamentos")
+            .select("id,created_at,data_atendimento,porte")
+            .eq("tenant_id", tenant_id),
+            filtros, agendamento="", triagem="triagens.",
+        )
+        pagina, cursor = await paginar(consulta, PAGINA_LIMITE_MAX, cursor)
+        linhas.extend(pagina)
+        if cursor is None:
+            return linhas
+
+
+# ── Escritas ─────────────────────────────────
+
+async def criar_agendamento_com_triagem(
+    agendamento: dict,
+    triagem: dict,
+    peso: int = 1,
+    vagas_padrao: int | None = None,
+) -> tuple[dict, str]:
+    """
+    Cria o agendamento e a triagem de forma atômica, reservando `peso`
+    vagas na data (`vagas_padrao` vale para tenants sem capacidade
+    configurada; None = sem limite).
+
+    Returns:
+        (linha do agendamento, id da triagem)
+
+    Raises:
+        SemVagas: a data não comporta o agendamento.
+    """
+    parametros = {
+        "p_agendamento": agendamento,
+        "p_triagem": triagem,
+        "p_peso": peso,
+        "p_vagas_padrao": vagas_padrao,
+    }
+    try:
+        dados = await _rpc("criar_agendamento_com_triagem", parametros)
+    except APIError as e:
+        if e.code == _ERRO_SEM_VAGAS:
+            raise SemVagas(e.message) from e
+        raise
+    if dados is not _SEM_RPC:
+        return dados["agendamento"], str(dados["triagem_id"])
+
+    db = get_supabase()
+    ag_result = await db.table("agendamentos").insert(agendamento).execute()
+    criado = ag_result.data[0]
+    try:
+        tr_result = await db.table("triagens").insert(
+            {**triagem, "agendamento_id": criado["id"]}
+        ).execute()
+    except Exception:
+        # Compensação: não deixar agendamento órfão sem triagem
+        try:
+            await db.table("agendamentos").delete().eq("id", criado["id"]).execute()
+        except Exception as e:
+            logger.error("Erro ao desfazer agendamento órfão %s: %s", criado["id"], e)
+        raise
+    return criado, tr_result.data[0]["id"]
+
+
+async def registrar_analise(
+    triagem_id: str,
+    tenant_id: str,
+    alerta_risco: bool,
+    parecer_ia: str,
+    status_ia: str,
+) -> str | None:
+    """
+    Grava o resultado da análise na triagem e o `status_ia` do agendamento.
+    Retorna o id do agendamento (None se a triagem não existe no tenant).
+    """
+    parametros = {
+        "p_triagem_id": triagem_id,
+        "p_tenant_id": tenant_id,
+        "p_alerta_risco": alerta_risco,
+        "p_parecer_ia": parecer_ia,
+        "p_status_ia": status_ia,
+    }
+    agendamento_id = await _rpc("registrar_analise", parametros)
+    if agendamento_id is not _SEM_RPC:
+        if agendamento_id:
+            invalidar_agendamento(tenant_id, agendamento_id)
+        return agendamento_id
+
+    db = get_supabase()
+    tr_result = await (
+        db.table("triagens")
+        .update({"alerta_risco": alerta_risco, "parecer_ia": parecer_ia})
+        .eq("id", triagem_id)
+        .eq("tenant_id", tenant_id)
+        .execute()
+    )
+    if not tr_result.data:
+        return None
+    agendamento_id = tr_result.data[0]["agendamento_id"]
+    await atualizar_status(agendamento_id, tenant_id, status_ia)
+    return agendamento_id
+
+
+async def atualizar_status(agendamento_id: str, tenant_id: str, status_ia: str) -> None:
+    await get_supabase().table("agendamentos").update(
+        {"status_ia": status_ia}
+    ).eq("id", agendamento_id).eq("tenant_id", tenant_id).execute()
+    invalidar_agendamento(tenant_id, agendamento_id)
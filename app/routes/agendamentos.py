@@ -1,29 +1,94 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import get_supabase
-from app.dependencies import get_tenant_id
-from app.models import AgendamentoCreate, AgendamentoResponse
-from app.config import SEPET_ENDERECO
-from app.agents.clinical_analyst import analisar_triagem
+from datetime import date
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from app import repositorio, serializacao
+from app.dependencies import (
+    CABECALHO_PROXIMO_CURSOR,
+    get_filtros_listagem,
+    get_limite,
+    get_tenant_id,
+    parse_campos,
+)
+from app.repositorio import FiltrosListagem
+from app.models import AgendamentoCreate, AgendamentoResponse, DisponibilidadeMes
+from app.services import capacidade, fila_analise, idempotencia
 
 logger = logging.getLogger("sepet.agendamentos")
 
 router = APIRouter(prefix="/agendamentos", tags=["Agendamentos"])
 
 
-@router.post("/", response_model=AgendamentoResponse, status_code=201)
+@router.post("/", response_model=AgendamentoResponse, status_code=202)
 async def criar_agendamento(
     dados: AgendamentoCreate,
     tenant_id: str = Depends(get_tenant_id),
+    idempotency_key: str | None = Header(
+        None,
+        alias=idempotencia.CABECALHO_CHAVE,
+        description="Chave única do envio; reenvios com a mesma chave recebem a resposta original",
+    ),
 ):
     """
     Cria um novo agendamento com os dados do tutor, do pet e da triagem clínica.
-    Salva os dados básicos em `agendamentos` e o questionário em `triagens`.
-    Dispara automaticamente a análise de risco por IA.
+    Salva os dados básicos em `agendamentos` e o questionário em `triagens`
+    numa única chamada transacional (nenhum agendamento fica sem triagem).
+    A vaga do dia é reservada na mesma transação, pelo peso do porte;
+    sem vagas na data, responde `409`.
+    A análise de risco por IA é enfileirada e processada em segundo plano;
+    acompanhe o progresso pelo `status_ia` do agendamento.
+
+    Com `Idempotency-Key`, um reenvio devolve a resposta original (com
+    `Idempotent-Replayed: true`) sem gravar nem analisar de novo; reenvios
+    concorrentes esperam o primeiro terminar.
     """
-    db = get_supabase()
+    if idempotency_key is None:
+        return await _criar_agendamento(dados, tenant_id)
+
+    chave = idempotency_key.strip()
+    if not chave or len(chave) > idempotencia.TAMANHO_MAX_CHAVE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{idempotencia.CABECALHO_CHAVE} deve ter de 1 a "
+                   f"{idempotencia.TAMANHO_MAX_CHAVE} caracteres.",
+        )
 
-    # 1) Inserir na tabela agendamentos (SOMENTE colunas que existem no banco)
+    reserva = await idempotencia.reservar(
+        tenant_id, chave, idempotencia.impressao(dados.model_dump(mode="json"))
+    )
+    if reserva.situacao == idempotencia.CONFLITO:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{idempotencia.CABECALHO_CHAVE} já usada com outros dados.",
+        )
+    if reserva.situacao == idempotencia.EM_ANDAMENTO:
+        raise HTTPException(
+            status_code=409,
+            detail="Um envio com a mesma chave ainda está em processamento.",
+        )
+    if reserva.situacao == idempotencia.REPETIDA:
+        logger.info("Reenvio com Idempotency-Key repetida para tenant %s", tenant_id)
+        return JSONResponse(
+            content=reserva.resposta,
+            status_code=reserva.codigo,
+            headers={idempotencia.CABECALHO_REPETIDA: "true"},
+        )
+
+    try:
+        resposta = await _criar_agendamento(dados, tenant_id)
+    except BaseException:
+        await idempotencia.liberar(tenant_id, chave)
+        raise
+
+    try:
+        await idempotencia.concluir(tenant_id, chave, 202, resposta.model_dump(mode="json"))
+    except Exception as e:
+        logger.error("Erro ao guardar a resposta da Idempotency-Key: %s", e)
+    return resposta
+
+
+async def _criar_agendamento(dados: AgendamentoCreate, tenant_id: str) -> AgendamentoResponse:
+    # 1) Dados básicos do agendamento (SOMENTE colunas que existem no banco)
     agendamento_payload = {
         "tenant_id": tenant_id,
         "nome_tutor": dados.nome_tutor,
@@ -36,22 +101,6 @@ async def criar_agendamento(
         "status_ia": "Pendente",
     }
 
-    try:
-        result = (
-            db.table("agendamentos").insert(agendamento_payload).execute()
-        )
-    except Exception as e:
-        logger.error(f"Erro ao inserir agendamento: {e} | Local: {SEPET_ENDERECO}")
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar agendamento: {e}")
-
-    agendamento = result.data[0]
-    agendamento_id = agendamento["id"]
-
-    logger.info(
-        f"Agendamento {agendamento_id} criado para tenant {tenant_id} | "
-        f"Pet: {dados.nome_animal} | Local: {SEPET_ENDERECO}"
-    )
-
     # 2) Montar respostas da triagem como JSON
     #    Inclui as respostas clínicas + dados extras do pet/tutor que não
     #    cabem na tabela agendamentos
@@ -68,28 +117,42 @@ async def criar_agendamento(
     }
 
     triagem_payload = {
-        "agendamento_id": agendamento_id,
         "tenant_id": tenant_id,
         "respostas_triagem": respostas,
         "alerta_risco": False,
         "parecer_ia": None,
     }
 
+    # Agendamento + triagem numa única escrita transacional
     try:
-        triagem_result = (
-            db.table("triagens").insert(triagem_payload).execute()
+        agendamento, triagem_id = await repositorio.criar_agendamento_com_triagem(
+            agendamento_payload,
+            triagem_payload,
+            peso=capacidade.peso_do_porte(dados.porte),
+            vagas_padrao=capacidade.VAGAS_PADRAO,
+        )
+    except repositorio.SemVagas:
+        logger.info(
+            "Sem vagas em %s para tenant %s (%s, porte %s)",
+            dados.data_atendimento, tenant_id, dados.especie, dados.porte,
+        )
+        raise HTTPException(
+            status_code=409,
+            detail=f"Não há vagas disponíveis em {dados.data_atendimento:%d/%m/%Y}.",
         )
     except Exception as e:
-        logger.error(f"Erro ao inserir triagem: {e} | Local: {SEPET_ENDERECO}")
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar triagem: {e}")
+        logger.error("Erro ao salvar agendamento e triagem: %s", e)
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar agendamento: {e}")
 
-    triagem_id = triagem_result.data[0]["id"]
+    agendamento_id = agendamento["id"]
+    capacidade.invalidar(tenant_id, dados.data_atendimento)
 
     logger.info(
-        f"Triagem {triagem_id} salva para agendamento {agendamento_id} | Local: {SEPET_ENDERECO}"
+        "Agendamento %s e triagem %s criados para tenant %s | Pet: %s",
+        agendamento_id, triagem_id, tenant_id, dados.nome_animal,
     )
 
-    # 3) Disparar análise de risco por IA automaticamente
+    # 3) Enfileirar análise de risco por IA (processada pelos workers da fila)
     pet_info = {
         "pet_nome": dados.nome_animal,
         "pet_especie": dados.especie,
@@ -102,52 +165,71 @@ async def criar_agendamento(
     }
 
     try:
-        logger.info(f"Iniciando análise IA para triagem {triagem_id}...")
-        resultado_ia = analisar_triagem(respostas, pet_info)
-
-        # Atualizar triagem com o parecer da IA
-        db.table("triagens").update({
-            "alerta_risco": resultado_ia["alerta_risco"],
-            "parecer_ia": resultado_ia["parecer_ia"],
-        }).eq("id", triagem_id).execute()
-
-        # Atualizar status_ia do agendamento
-        db.table("agendamentos").update({
-            "status_ia": "Analisado",
-        }).eq("id", agendamento_id).execute()
-
-        agendamento["status_ia"] = "Analisado"
-
-        logger.info(
-            f"Análise IA concluída para triagem {triagem_id}: "
-            f"alerta_risco={resultado_ia['alerta_risco']} | Local: {SEPET_ENDERECO}"
+        await fila_analise.enfileirar(
+            triagem_id, agendamento_id, tenant_id, respostas, pet_info
         )
     except Exception as e:
         logger.error(
-            f"Erro na análise IA para triagem {triagem_id}: {e} | "
-            f"O agendamento foi salvo, mas o parecer ficará pendente."
+            "Erro ao enfileirar análise IA para triagem %s: %s | "
+            "O agendamento foi salvo, mas o parecer ficará pendente.",
+            triagem_id, e,
         )
 
     return AgendamentoResponse(**agendamento)
 
 
-@router.get("/", response_model=list[AgendamentoResponse])
-async def listar_agendamentos(tenant_id: str = Depends(get_tenant_id)):
-    """Lista todos os agendamentos filtrados pelo tenant."""
-    db = get_supabase()
+@router.get(
+    "/",
+    response_model=list[AgendamentoResponse],
+    response_model_exclude_unset=True,
+)
+async def listar_agendamentos(
+    cursor: str | None = Query(None, description="Valor de X-Proximo-Cursor da página anterior"),
+    fields: str | None = Query(None, description="Colunas separadas por vírgula"),
+    limite: int = Depends(get_limite),
+    filtros: FiltrosListagem = Depends(get_filtros_listagem),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Lista os agendamentos do tenant, paginados do mais recente para o mais antigo.
+    Se houver mais itens, o cabeçalho `X-Proximo-Cursor` traz o cursor da
+    próxima página. `fields` restringe as colunas de cada item.
+    """
+    campos = parse_campos(fields, repositorio.CAMPOS_AGENDAMENTO)
     try:
-        result = (
-            db.table("agendamentos")
-            .select("*")
-            .eq("tenant_id", tenant_id)
-            .order("created_at", desc=True)
-            .execute()
+        agendamentos, proximo = await repositorio.listar_agendamentos(
+            tenant_id, limite, cursor, campos, filtros
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao listar agendamentos: {e}")
+        logger.error("Erro ao listar agendamentos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    return [AgendamentoResponse(**row) for row in result.data]
+    headers = {CABECALHO_PROXIMO_CURSOR: proximo} if proximo else None
+    return serializacao.resposta_lista(AgendamentoResponse, agendamentos, headers)
+
+
+# Declarada antes de /{agendamento_id} para "disponibilidade" não ser lido como id
+@router.get("/disponibilidade", response_model=DisponibilidadeMes)
+async def obter_disponibilidade(
+    mes: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="Mês no formato AAAA-MM"),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Vagas, ocupação e vagas livres de cada dia do mês, por grupo (`*` ou
+    espécie). Lido do índice de ocupação mantido a cada reserva.
+    """
+    try:
+        primeiro_dia = date.fromisoformat(f"{mes}-01")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mês inválido.")
+
+    try:
+        return await capacidade.disponibilidade_mes(tenant_id, primeiro_dia)
+    except Exception as e:
+        logger.error("Erro ao calcular disponibilidade: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{agendamento_id}", response_model=AgendamentoResponse)
@@ -156,19 +238,12 @@ async def obter_agendamento(
     tenant_id: str = Depends(get_tenant_id),
 ):
     """Retorna um agendamento específico pelo ID, respeitando o tenant."""
-    db = get_supabase()
     try:
-        result = (
-            db.table("agendamentos")
-            .select("*")
-            .eq("id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
+        agendamento = await repositorio.obter_agendamento(agendamento_id, tenant_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    if not result.data:
+    if agendamento is None:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado.")
 
-    return AgendamentoResponse(**result.data[0])
+    return AgendamentoResponse(**agendamento)
@@ -1,94 +1,237 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import get_supabase
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app import repositorio
+from app.config import FILA_WORKERS, LOTE_PARALELISMO
 from app.dependencies import get_tenant_id
-from app.agents.clinical_analyst import analisar_triagem
+from app.serializacao import RespostaJson, para_json
+from app.agents import limitador, resiliencia
+from app.agents.clinical_analyst import analisar_triagem_async, analisar_triagem_stream
+from app.agents.limitador import LimiteExcedido
+from app.services import comprovante, fila_analise
 
 logger = logging.getLogger("sepet.analise")
 
 router = APIRouter(prefix="/analise", tags=["Análise IA"])
 
+# Status de agendamento elegíveis para reprocessamento em lote
+STATUS_REPROCESSAVEIS = [
+    fila_analise.STATUS_PENDENTE,
+    fila_analise.STATUS_PROVISORIO,
+    fila_analise.STATUS_FALHOU,
+]
 
-@router.post("/{triagem_id}")
-async def executar_analise(
-    triagem_id: str,
+
+def _pet_info(agendamento: dict, respostas: dict) -> dict:
+    """Monta o `pet_info` do agente a partir do agendamento e do `_meta_pet`."""
+    meta_pet = respostas.get("_meta_pet", {})
+    return {
+        "pet_nome": agendamento.get("nome_animal", ""),
+        "pet_especie": agendamento.get("especie", ""),
+        "pet_raca": agendamento.get("raca", ""),
+        "pet_porte": agendamento.get("porte", ""),
+        "pet_idade_anos": meta_pet.get("idade_anos", 0),
+        "pet_idade_meses": meta_pet.get("idade_meses", 0),
+        "pet_sexo": meta_pet.get("sexo", ""),
+        "pet_peso_kg": meta_pet.get("peso_kg", 0),
+    }
+
+
+def _limite_excedido(erro: LimiteExcedido) -> HTTPException:
+    """Resposta imediata quando a fila do tenant no limitador do LLM está cheia."""
+    return HTTPException(
+        status_code=429,
+        detail=str(erro),
+        headers={"Retry-After": str(erro.retry_after)},
+    )
+
+
+async def _carregar_triagem(triagem_id: str, tenant_id: str) -> tuple[dict, dict]:
+    """Busca a triagem e os dados do pet, devolvendo (respostas, pet_info)."""
+    try:
+        triagem = await repositorio.obter_triagem_com_pet(triagem_id, tenant_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if triagem is None:
+        raise HTTPException(status_code=404, detail="Triagem não encontrada.")
+
+    respostas = triagem.get("respostas_triagem") or {}
+    agendamento = triagem.get("agendamento")
+    pet_info = _pet_info(agendamento, respostas) if agendamento else {}
+    return respostas, pet_info
+
+
+@router.post("/lote", status_code=202, response_class=RespostaJson)
+async def executar_analise_lote(
+    paralelismo: int = Query(
+        LOTE_PARALELISMO, ge=1, le=FILA_WORKERS,
+        description="Análises simultâneas deste lote (no máximo FILA_WORKERS)",
+    ),
     tenant_id: str = Depends(get_tenant_id),
 ):
     """
-    Dispara a análise de risco por IA para uma triagem específica.
-    Atualiza os campos `alerta_risco` e `parecer_ia` na tabela `triagens`.
+    Reprocessa em lote todas as triagens do tenant cujo agendamento está
+    `Pendente`, `Provisório` (parecer do fallback) ou `Falhou` (ex.: após
+    uma indisponibilidade do MiniMax).
+    As análises vão para a fila durável; acompanhe o progresso em
+    `GET /analise/lote/{lote_id}`.
     """
-    db = get_supabase()
-
-    # 1) Buscar a triagem
     try:
-        result = (
-            db.table("triagens")
-            .select("*")
-            .eq("id", triagem_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
+        agendamentos = await repositorio.listar_pets_com_triagem_por_status(
+            tenant_id, STATUS_REPROCESSAVEIS
         )
     except Exception as e:
+        logger.error("Erro ao buscar triagens pendentes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    if not result.data:
-        raise HTTPException(status_code=404, detail="Triagem não encontrada.")
+    com_triagem = [ag for ag in agendamentos if ag["triagem"]]
+    ativas = await fila_analise.triagens_ativas(tenant_id)
+    itens = []
+    for agendamento in com_triagem:
+        triagem = agendamento["triagem"]
+        if triagem["id"] in ativas:
+            continue
+        respostas = triagem.get("respostas_triagem") or {}
+        itens.append({
+            "triagem_id": triagem["id"],
+            "agendamento_id": agendamento["id"],
+            "respostas": respostas,
+            "pet_info": _pet_info(agendamento, respostas),
+        })
 
-    triagem = result.data[0]
-    respostas = triagem.get("respostas_triagem", {})
-    agendamento_id = triagem.get("agendamento_id")
+    lote_id = await fila_analise.enfileirar_lote(tenant_id, itens, paralelismo)
 
-    # 2) Buscar dados do pet (agendamento) — usa colunas reais do banco
-    pet_info = {}
-    meta_pet = respostas.get("_meta_pet", {})
+    return RespostaJson(
+        {
+            "lote_id": lote_id,
+            "total": len(itens),
+            "ignoradas_em_andamento": len(com_triagem) - len(itens),
+            "paralelismo": paralelismo,
+            "progresso": f"/analise/lote/{lote_id}",
+        },
+        status_code=202,
+    )
 
-    if agendamento_id:
-        try:
-            ag_result = (
-                db.table("agendamentos")
-                .select("*")
-                .eq("id", agendamento_id)
-                .eq("tenant_id", tenant_id)
-                .execute()
-            )
-            if ag_result.data:
-                ag = ag_result.data[0]
-                pet_info = {
-                    "pet_nome": ag.get("nome_animal", ""),
-                    "pet_especie": ag.get("especie", ""),
-                    "pet_raca": ag.get("raca", ""),
-                    "pet_porte": ag.get("porte", ""),
-                    "pet_idade_anos": meta_pet.get("idade_anos", 0),
-                    "pet_idade_meses": meta_pet.get("idade_meses", 0),
-                    "pet_sexo": meta_pet.get("sexo", ""),
-                    "pet_peso_kg": meta_pet.get("peso_kg", 0),
-                }
-        except Exception as e:
-            logger.warning(f"Erro ao buscar dados do pet: {e}")
-
-    # 3) Executar análise
-    logger.info(f"Iniciando análise de risco para triagem {triagem_id}")
-    resultado = analisar_triagem(respostas, pet_info)
-
-    # 4) Atualizar a triagem no banco
+
+@router.get("/lote/{lote_id}", response_class=RespostaJson)
+async def obter_progresso_lote(
+    lote_id: str,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Progresso de um lote: concluídos, falhas, restantes e throughput."""
+    progresso = await fila_analise.progresso_lote(lote_id, tenant_id)
+    if progresso is None:
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    return RespostaJson(progresso)
+
+
+@router.get("/uso", response_class=RespostaJson)
+async def obter_uso(tenant_id: str = Depends(get_tenant_id)):
+    """
+    Uso atual do LLM pelo tenant neste worker: chamadas em execução e na
+    fila, cotas configuradas e chamadas atendidas/recusadas, além do estado
+    do disjuntor do LLM e do p95 recente de cada etapa.
+    """
+    return RespostaJson({**limitador.uso(tenant_id), "resiliencia": resiliencia.estado()})
+
+
+@router.post("/{triagem_id}", response_class=RespostaJson)
+async def executar_analise(
+    triagem_id: str,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Dispara a análise de risco por IA para uma triagem específica.
+    Atualiza os campos `alerta_risco` e `parecer_ia` na tabela `triagens`
+    e marca o agendamento como `Analisado` (ou `Provisório`, se o parecer
+    veio do fallback determinístico), numa única escrita.
+    Com a fila do tenant no limitador do LLM cheia, responde `429` com
+    `Retry-After`.
+    """
+    respostas, pet_info = await _carregar_triagem(triagem_id, tenant_id)
+
+    # Executar análise
+    logger.info("Iniciando análise de risco para triagem %s", triagem_id)
     try:
-        db.table("triagens").update({
-            "alerta_risco": resultado["alerta_risco"],
-            "parecer_ia": resultado["parecer_ia"],
-        }).eq("id", triagem_id).execute()
+        resultado = await analisar_triagem_async(respostas, pet_info)
+    except LimiteExcedido as e:
+        raise _limite_excedido(e)
+
+    # Atualizar a triagem e o agendamento no banco
+    try:
+        agendamento_id = await repositorio.registrar_analise(
+            triagem_id,
+            tenant_id,
+            resultado["alerta_risco"],
+            resultado["parecer_ia"],
+            fila_analise.status_resultado(resultado),
+        )
     except Exception as e:
-        logger.error(f"Erro ao atualizar triagem: {e}")
+        logger.error("Erro ao atualizar triagem: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro ao salvar parecer: {e}")
+    if agendamento_id:
+        await comprovante.pre_renderizar(agendamento_id, tenant_id)
 
     logger.info(
-        f"Análise concluída para triagem {triagem_id}: "
-        f"alerta_risco={resultado['alerta_risco']}"
+        "Análise concluída para triagem %s: alerta_risco=%s | caminho=%s",
+        triagem_id, resultado["alerta_risco"], resultado["caminho"],
     )
 
-    return {
+    return RespostaJson({
         "triagem_id": triagem_id,
         "alerta_risco": resultado["alerta_risco"],
         "parecer_ia": resultado["parecer_ia"],
+        "caminho": resultado["caminho"],
         "status": "analise_concluida",
-    }
+    })
+
+
+@router.get("/{triagem_id}/stream")
+async def executar_analise_stream(
+    triagem_id: str,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Executa a análise de risco por IA transmitindo o progresso via
+    Server-Sent Events: transições de etapa (Lupa, Juiz) e os tokens do
+    parecer do Relator conforme são gerados. Ao final, `alerta_risco` e
+    `parecer_ia` são gravados na tabela `triagens` e o agendamento passa a
+    `Analisado` (ou `Provisório`, pelo fallback). Com a fila do tenant no limitador do LLM cheia, responde
+    `429` antes de abrir o stream.
+    """
+    respostas, pet_info = await _carregar_triagem(triagem_id, tenant_id)
+    try:
+        limitador.verificar(tenant_id)
+    except LimiteExcedido as e:
+        raise _limite_excedido(e)
+
+    async def eventos():
+        logger.info("Iniciando análise em streaming para triagem %s", triagem_id)
+        async for evento in analisar_triagem_stream(respostas, pet_info):
+            if evento["evento"] == "resultado":
+                try:
+                    agendamento_id = await repositorio.registrar_analise(
+                        triagem_id,
+                        tenant_id,
+                        evento["alerta_risco"],
+                        evento["parecer_ia"],
+                        fila_analise.status_resultado(evento),
+                    )
+                    evento["persistido"] = True
+                    if agendamento_id:
+                        await comprovante.pre_renderizar(agendamento_id, tenant_id)
+                except Exception as e:
+                    logger.error("Erro ao atualizar triagem: %s", e)
+                    evento["persistido"] = False
+                logger.info(
+                    "Análise em streaming concluída para triagem %s: alerta_risco=%s | caminho=%s",
+                    triagem_id, evento["alerta_risco"], evento["caminho"],
+                )
+            yield f"event: {evento['evento']}\ndata: {para_json(evento).decode()}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
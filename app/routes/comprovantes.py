@@ -1,100 +1,110 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import HTMLResponse
-from app.database import get_supabase
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+from app import repositorio
+from app.config import COMPROVANTES_LOTE_PAGINA
 from app.dependencies import get_tenant_id
-from app.services.comprovante import gerar_comprovante_html, gerar_comprovante_json
+from app.serializacao import RespostaJson
+from app.services.comprovante import (
+    gerar_comprovante_json,
+    gerar_zip_lote,
+    renderizar_comprovante,
+    versao_comprovante,
+)
 
 logger = logging.getLogger("sepet.comprovantes")
 
 router = APIRouter(prefix="/comprovantes", tags=["Comprovantes"])
 
 
-@router.get("/{agendamento_id}", response_class=HTMLResponse)
-async def gerar_comprovante(
-    agendamento_id: str,
-    tenant_id: str = Depends(get_tenant_id),
-):
-    """
-    Gera o comprovante de agendamento em formato HTML.
-    Inclui dados do animal, tutor, parecer IA e contatos oficiais.
-    """
-    db = get_supabase()
-
-    # Buscar agendamento
+async def _carregar_comprovante(agendamento_id: str, tenant_id: str) -> tuple[dict, dict | None]:
+    """Busca agendamento e triagem (pode não existir ainda) numa única consulta."""
     try:
-        ag_result = (
-            db.table("agendamentos")
-            .select("*")
-            .eq("id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
+        agendamento = await repositorio.obter_agendamento_com_triagem(agendamento_id, tenant_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    if not ag_result.data:
+    if agendamento is None:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado.")
 
-    agendamento = ag_result.data[0]
+    return agendamento, agendamento.pop("triagem")
 
-    # Buscar triagem (pode não existir ainda)
-    triagem = None
-    try:
-        tr_result = (
-            db.table("triagens")
-            .select("*")
-            .eq("agendamento_id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
-        if tr_result.data:
-            triagem = tr_result.data[0]
-    except Exception as e:
-        logger.warning(f"Erro ao buscar triagem: {e}")
 
-    html = gerar_comprovante_html(agendamento, triagem)
-    return HTMLResponse(content=html)
+def _etag_confere(if_none_match: str | None, etag: str) -> bool:
+    """Compara o `If-None-Match` do cliente com o ETag atual (comparação fraca)."""
+    if not if_none_match:
+        return False
+    etags = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return "*" in etags or etag in etags
 
 
-@router.get("/{agendamento_id}/json")
-async def gerar_comprovante_dados(
-    agendamento_id: str,
+# Declarada antes de /{agendamento_id} para "lote" não ser lido como id
+@router.get("/lote")
+async def exportar_lote(
+    data: date = Query(..., description="Data do atendimento (AAAA-MM-DD)"),
     tenant_id: str = Depends(get_tenant_id),
 ):
     """
-    Retorna os dados do comprovante em formato JSON.
+    Baixa um ZIP com o comprovante (HTML e JSON) de cada agendamento do
+    tenant na data. O arquivo é gerado e transmitido página a página.
     """
-    db = get_supabase()
-
+    paginas = repositorio.iterar_agendamentos_com_triagem(
+        tenant_id,
+        repositorio.FiltrosListagem(data_inicio=data, data_fim=data),
+        COMPROVANTES_LOTE_PAGINA,
+    )
     try:
-        ag_result = (
-            db.table("agendamentos")
-            .select("*")
-            .eq("id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
+        primeira = await anext(paginas, None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if primeira is None:
+        raise HTTPException(status_code=404, detail="Nenhum agendamento nesta data.")
 
-    if not ag_result.data:
-        raise HTTPException(status_code=404, detail="Agendamento não encontrado.")
+    async def todas_as_paginas():
+        yield primeira
+        async for pagina in paginas:
+            yield pagina
 
-    agendamento = ag_result.data[0]
+    return StreamingResponse(
+        gerar_zip_lote(todas_as_paginas()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="comprovantes_{data}.zip"'},
+    )
 
-    triagem = None
-    try:
-        tr_result = (
-            db.table("triagens")
-            .select("*")
-            .eq("agendamento_id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
-        if tr_result.data:
-            triagem = tr_result.data[0]
-    except Exception as e:
-        logger.warning(f"Erro ao buscar triagem: {e}")
 
-    return gerar_comprovante_json(agendamento, triagem)
+@router.get("/{agendamento_id}", response_class=HTMLResponse)
+async def gerar_comprovante(
+    agendamento_id: str,
+    request: Request,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Gera o comprovante de agendamento em formato HTML.
+    Inclui dados do animal, tutor, parecer IA e contatos oficiais.
+
+    A resposta traz um ETag derivado dos dados; com `If-None-Match`
+    igual, devolve `304` sem corpo. O navegador sempre revalida
+    (`no-cache`), então um comprovante atualizado pela análise nunca
+    fica velho no cliente.
+    """
+    agendamento, triagem = await _carregar_comprovante(agendamento_id, tenant_id)
+    versao = versao_comprovante(agendamento, triagem)
+    headers = {"ETag": f'"{versao}"', "Cache-Control": "private, no-cache"}
+    if _etag_confere(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    _, html = renderizar_comprovante(agendamento, triagem, versao)
+    return HTMLResponse(content=html, headers=headers)
+
+
+@router.get("/{agendamento_id}/json", response_class=RespostaJson)
+async def gerar_comprovante_dados(
+    agendamento_id: str,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Retorna os dados do comprovante em formato JSON.
+    """
+    agendamento, triagem = await _carregar_comprovante(agendamento_id, tenant_id)
+    return RespostaJson(gerar_comprovante_json(agendamento, triagem))
@@ -0,0 +1,53 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app import repositorio
+from app.config import EXPORTACAO_PAGINA
+from app.dependencies import get_filtros_listagem, get_tenant_id
+from app.repositorio import FiltrosListagem
+from app.services import exportacao
+
+router = APIRouter(prefix="/exportacao", tags=["Exportação"])
+
+
+@router.get("/")
+async def exportar(
+    formato: str = Query(
+        exportacao.FORMATO_NDJSON,
+        pattern=f"^({exportacao.FORMATO_NDJSON}|{exportacao.FORMATO_CSV})$",
+        description="ndjson (um objeto JSON por linha) ou csv",
+    ),
+    filtros: FiltrosListagem = Depends(get_filtros_listagem),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Exporta todos os agendamentos do tenant (com os filtros das listagens),
+    uma linha por agendamento com a triagem achatada em colunas: parecer,
+    alerta de risco, dados do pet/tutor e cada resposta do questionário.
+    As linhas são lidas do banco em páginas de `EXPORTACAO_PAGINA` e
+    transmitidas conforme chegam, sem montar a exportação em memória.
+    """
+    paginas = repositorio.iterar_agendamentos_com_triagem(tenant_id, filtros, EXPORTACAO_PAGINA)
+    # A primeira página é buscada antes de responder: um erro no banco
+    # ainda vira 500, e não um download vazio com status 200
+    try:
+        primeira = await anext(paginas, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def todas_as_paginas():
+        if primeira is None:
+            return
+        yield primeira
+        async for pagina in paginas:
+            yield pagina
+
+    return StreamingResponse(
+        exportacao.gerar(formato, todas_as_paginas()),
+        media_type=exportacao.TIPOS_MIDIA[formato],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="agendamentos_{date.today()}.{formato}"'
+            ),
+        },
+    )
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import repositorio, serializacao
+from app.dependencies import get_filtros_listagem, get_limite, get_tenant_id
+from app.models import PainelItem, PainelResponse, PainelTotais, TriagemResumo
+from app.repositorio import FiltrosListagem
+from app.serializacao import RespostaJson
+from app.services.fila_analise import (
+    STATUS_ANALISADO,
+    STATUS_EM_ANALISE,
+    STATUS_FALHOU,
+    STATUS_PENDENTE,
+    STATUS_PROVISORIO,
+)
+
+logger = logging.getLogger("sepet.painel")
+
+router = APIRouter(prefix="/painel", tags=["Painel"])
+
+_STATUS = [
+    STATUS_PENDENTE, STATUS_EM_ANALISE, STATUS_ANALISADO, STATUS_PROVISORIO, STATUS_FALHOU,
+]
+
+
+def _montar_totais(bruto: dict) -> PainelTotais:
+    por_status = bruto.get("por_status") or {}
+    return PainelTotais(
+        agendamentos=bruto.get("agendamentos", 0),
+        alertas_risco=bruto.get("alertas_risco", 0),
+        com_parecer=bruto.get("com_parecer", 0),
+        analisados=por_status.get(STATUS_ANALISADO, 0),
+        provisorios=por_status.get(STATUS_PROVISORIO, 0),
+        pendentes=por_status.get(STATUS_PENDENTE, 0),
+        em_analise=por_status.get(STATUS_EM_ANALISE, 0),
+        falhas=por_status.get(STATUS_FALHOU, 0),
+        por_data=bruto.get("por_data"),
+    )
+
+
+def _item(linha: dict) -> dict:
+    """Linha do painel recortada nas colunas de `PainelItem` e `TriagemResumo`."""
+    item = serializacao.projetar(PainelItem, linha)
+    if linha.get("triagem"):
+        item["triagem"] = serializacao.projetar(TriagemResumo, linha["triagem"])
+    return item
+
+
+@router.get("/", response_model=PainelResponse, response_class=RespostaJson)
+async def obter_painel(
+    cursor: str | None = Query(None, description="proximo_cursor da página anterior"),
+    limite: int = Depends(get_limite),
+    filtros: FiltrosListagem = Depends(get_filtros_listagem),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Painel de gestão: agendamentos paginados com o resumo da triagem já
+    unido, mais os totais do período (agendamentos, alertas de risco,
+    pareceres, por status e por data) calculados no banco.
+    Os totais vêm só na primeira página (sem `cursor`) e consideram os
+    filtros de período e espécie.
+    """
+    try:
+        if cursor:
+            linhas, proximo = await repositorio.listar_painel(tenant_id, limite, cursor, filtros)
+            totais = None
+        else:
+            (linhas, proximo), totais = await asyncio.gather(
+                repositorio.listar_painel(tenant_id, limite, None, filtros),
+                repositorio.painel_totais(tenant_id, filtros, _STATUS),
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao montar painel: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Serializada uma vez só; o `response_model` fica para o OpenAPI
+    return RespostaJson({
+        "itens": [_item(linha) for linha in linhas],
+        "proximo_cursor": proximo,
+        "totais": _montar_totais(totais) if totais is not None else None,
+    })
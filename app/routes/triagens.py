@@ -1,7 +1,14 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import get_supabase
-from app.dependencies import get_tenant_id
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import repositorio, serializacao
+from app.dependencies import (
+    CABECALHO_PROXIMO_CURSOR,
+    get_filtros_listagem,
+    get_limite,
+    get_tenant_id,
+    parse_campos,
+)
+from app.repositorio import FiltrosListagem
 from app.models import TriagemResponse
 
 logger = logging.getLogger("sepet.triagens")
@@ -9,23 +16,36 @@ logger = logging.getLogger("sepet.triagens")
 router = APIRouter(prefix="/triagens", tags=["Triagens"])
 
 
-@router.get("/", response_model=list[TriagemResponse])
-async def listar_triagens(tenant_id: str = Depends(get_tenant_id)):
-    """Lista todas as triagens do tenant."""
-    db = get_supabase()
+@router.get(
+    "/",
+    response_model=list[TriagemResponse],
+    response_model_exclude_unset=True,
+)
+async def listar_triagens(
+    cursor: str | None = Query(None, description="Valor de X-Proximo-Cursor da página anterior"),
+    fields: str | None = Query(None, description="Colunas separadas por vírgula"),
+    limite: int = Depends(get_limite),
+    filtros: FiltrosListagem = Depends(get_filtros_listagem),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Lista as triagens do tenant, paginadas da mais recente para a mais antiga.
+    Se houver mais itens, o cabeçalho `X-Proximo-Cursor` traz o cursor da
+    próxima página. `fields` restringe as colunas de cada item.
+    """
+    campos = parse_campos(fields, repositorio.CAMPOS_TRIAGEM)
     try:
-        result = (
-            db.table("triagens")
-            .select("*")
-            .eq("tenant_id", tenant_id)
-            .order("created_at", desc=True)
-            .execute()
+        triagens, proximo = await repositorio.listar_triagens(
+            tenant_id, limite, cursor, campos, filtros
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao listar triagens: {e}")
+        logger.error("Erro ao listar triagens: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    return [TriagemResponse(**row) for row in result.data]
+    headers = {CABECALHO_PROXIMO_CURSOR: proximo} if proximo else None
+    return serializacao.resposta_lista(TriagemResponse, triagens, headers)
 
 
 @router.get("/{agendamento_id}", response_model=TriagemResponse)
@@ -34,19 +54,12 @@ async def obter_triagem(
     tenant_id: str = Depends(get_tenant_id),
 ):
     """Retorna a triagem associada a um agendamento específico."""
-    db = get_supabase()
     try:
-        result = (
-            db.table("triagens")
-            .select("*")
-            .eq("agendamento_id", agendamento_id)
-            .eq("tenant_id", tenant_id)
-            .execute()
-        )
+        triagem = await repositorio.obter_triagem_do_agendamento(agendamento_id, tenant_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    if not result.data:
+    if triagem is None:
         raise HTTPException(status_code=404, detail="Triagem não encontrada.")
 
-    return TriagemResponse(**result.data[0])
+    return TriagemResponse(**triagem)
@@ -0,0 +1,74 @@
+"""
+Serialização das respostas JSON — SEPET
+As listagens devolvem as linhas do PostgREST quase como vieram: cada linha
+é só recortada nas colunas do modelo de resposta e a página inteira vai de
+uma vez para o `orjson`. Não há um objeto Pydantic por linha na rota nem a
+revalidação da lista no `response_model` do FastAPI: os tipos já são os das
+colunas da tabela, e o `response_model` continua declarado nas rotas só
+para a documentação do OpenAPI.
+
+Respostas que já são dicionários montados pelo serviço (comprovante em
+JSON, análise, painel) usam `RespostaJson`, com o mesmo codificador no lugar do
+`json.dumps` da biblioteca padrão.
+"""
+from functools import cache
+from typing import Any, Iterable
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_OPCOES = orjson.OPT_NON_STR_KEYS
+
+
+def _padrao(valor: Any) -> Any:
+    """Tipos que o orjson não conhece (ex.: Decimal, modelos) viram texto/dict."""
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    return str(valor)
+
+
+def para_json(dados: Any) -> bytes:
+    """JSON compacto em UTF-8 (sem escapar acentos)."""
+    return orjson.dumps(dados, default=_padrao, option=_OPCOES)
+
+
+@cache
+def _campos(modelo: type[BaseModel]) -> frozenset[str]:
+    return frozenset(modelo.model_fields)
+
+
+def projetar(modelo: type[BaseModel], linha: dict) -> dict:
+    """Linha do banco recortada nas colunas do modelo que vieram na consulta."""
+    campos = _campos(modelo)
+    return {coluna: valor for coluna, valor in linha.items() if coluna in campos}
+
+
+def serializar_lista(modelo: type[BaseModel], linhas: Iterable[dict]) -> bytes:
+    """
+    JSON de uma página de linhas do banco no formato de `list[modelo]`.
+    Como no `response_model_exclude_unset`, colunas que não vieram na
+    consulta (`fields=`) ficam de fora, e as que não são do modelo também.
+    """
+    return para_json([projetar(modelo, linha) for linha in linhas])
+
+
+def resposta_lista(
+    modelo: type[BaseModel],
+    linhas: Iterable[dict],
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Resposta HTTP de uma listagem, já serializada (ver `serializar_lista`)."""
+    return Response(
+        content=serializar_lista(modelo, linhas),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+class RespostaJson(JSONResponse):
+    """`JSONResponse` com o `orjson` no lugar do `json` da biblioteca padrão."""
+
+    def render(self, content: Any) -> bytes:
+        return para_json(content)
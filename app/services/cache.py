@@ -0,0 +1,183 @@
+"""
+Cache em camadas — SEPET
+Infraestrutura genérica de cache usada pelos serviços da aplicação:
+  - L1: LRU em memória, por processo, com TTL
+  - L2: SQLite opcional em disco, compartilhado entre workers
+
+Cada cache é registrado pelo nome, para que as estatísticas de acertos,
+faltas e expulsões fiquem observáveis em `GET /cache`.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger("sepet.cache")
+
+_registro: dict[str, "CacheLRU"] = {}
+
+
+class CacheSQLite:
+    """Segunda camada em SQLite, com valores JSON e expiração por TTL."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        namespace  TEXT NOT NULL,
+        chave      TEXT NOT NULL,
+        valor      TEXT NOT NULL,
+        expira_em  REAL NOT NULL,
+        PRIMARY KEY (namespace, chave)
+    );
+    """
+
+    def __init__(self, caminho: str, namespace: str):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            caminho, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=2000")
+        self._conn.executescript(self._SCHEMA)
+
+    def obter(self, chave: str) -> tuple[Any, float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valor, expira_em FROM cache WHERE namespace = ? AND chave = ?",
+                (self.namespace, chave),
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def gravar(self, chave: str, valor: Any, expira_em: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, chave, valor, expira_em) "
+                "VALUES (?, ?, ?, ?)",
+                (self.namespace, chave, json.dumps(valor, ensure_ascii=False), expira_em),
+            )
+
+    def invalidar(self, chave: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND chave = ?",
+                (self.namespace, chave),
+            )
+
+
+class CacheLRU:
+    """
+    LRU em memória com TTL e segunda camada SQLite opcional.
+
+    `ttl_l1_segundos` limita quanto tempo um item fica na L1: com a L2
+    compartilhada entre workers, uma invalidação feita por um worker chega
+    aos demais no máximo nesse intervalo.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        capacidade: int,
+        ttl_segundos: float,
+        caminho_sqlite: str = "",
+        ttl_l1_segundos: float | None = None,
+    ):
+        self.nome = nome
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self.ttl_l1_segundos = ttl_l1_segundos
+        self._itens: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._l2 = CacheSQLite(caminho_sqlite, nome) if caminho_sqlite else None
+        self.acertos = 0
+        self.acertos_l2 = 0
+        self.faltas = 0
+        self.expulsoes = 0
+        _registro[nome] = self
+
+    def obter(self, chave: str) -> Any | None:
+        """Busca na L1 e, se ausente, na L2 (promovendo o valor para a L1)."""
+        agora = time.time()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                valor, expira_em = item
+                if expira_em >= agora:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._itens[chave]
+
+        if self._l2 is not None:
+            try:
+                encontrado = self._l2.obter(chave)
+            except sqlite3.Error as e:
+                logger.warning("[Cache %s] Erro ao ler L2: %s", self.nome, e)
+                encontrado = None
+            if encontrado is not None:
+                valor, expira_em = encontrado
+                with self._lock:
+                    self._inserir_l1(chave, valor, expira_em)
+                    self.acertos_l2 += 1
+                return valor
+
+        with self._lock:
+            self.faltas += 1
+        return None
+
+    def gravar(self, chave: str, valor: Any) -> None:
+        expira_em = time.time() + self.ttl_segundos
+        with self._lock:
+            self._inserir_l1(chave, valor, expira_em)
+        if self._l2 is not None:
+            try:
+                self._l2.gravar(chave, valor, expira_em)
+            except sqlite3.Error as e:
+                logger.warning("[Cache %s] Erro ao gravar L2: %s", self.nome, e)
+
+    def invalidar(self, chave: str) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+        if self._l2 is not None:
+            try:
+                self._l2.invalidar(chave)
+            except sqlite3.Error as e:
+                logger.warning("[Cache %s] Erro ao invalidar L2: %s", self.nome, e)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.acertos_l2 + self.faltas
+            return {
+                "nome": self.nome,
+                "itens": len(self._itens),
+                "capacidade": self.capacidade,
+                "ttl_segundos": self.ttl_segundos,
+                "l2_sqlite": self._l2 is not None,
+                "acertos": self.acertos,
+                "acertos_l2": self.acertos_l2,
+                "faltas": self.faltas,
+                "expulsoes": self.expulsoes,
+                "taxa_acerto": (
+                    round((self.acertos + self.acertos_l2) / consultas, 4)
+                    if consultas else 0.0
+                ),
+            }
+
+    def _inserir_l1(self, chave: str, valor: Any, expira_em: float) -> None:
+        if self.ttl_l1_segundos is not None:
+            expira_em = min(expira_em, time.time() + self.ttl_l1_segundos)
+        self._itens[chave] = (valor, expira_em)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+            self.expulsoes += 1
+
+
+def caches_registrados() -> list[CacheLRU]:
+    """Todos os caches criados no processo, na ordem de criação."""
+    return list(_registro.values())
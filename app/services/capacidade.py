@@ -0,0 +1,121 @@
+"""
+Capacidade diária de atendimento — SEPET
+Calcula o peso de cada agendamento (pelo porte) e monta o calendário de
+disponibilidade do mês a partir do índice `ocupacao_diaria`, mantido pelo
+banco a cada reserva (ver supabase/migrations). A reserva em si é atômica
+e acontece dentro da RPC `criar_agendamento_com_triagem`.
+
+O calendário de cada (tenant, mês) fica em cache por poucos segundos e é
+descartado quando este processo grava um agendamento naquele mês.
+"""
+import asyncio
+import calendar
+import logging
+from datetime import date
+
+from app import repositorio
+from app.config import (
+    CAPACIDADE_CACHE_TTL_SEGUNDOS,
+    CAPACIDADE_PESOS_PORTE,
+    CAPACIDADE_VAGAS_PADRAO,
+)
+from app.services.cache import CacheLRU
+
+logger = logging.getLogger("sepet.capacidade")
+
+GRUPO_GERAL = "*"
+
+
+def _ler_pesos(texto: str) -> dict[str, int]:
+    """Converte `G=2,XG=3` em `{"G": 2, "XG": 3}`."""
+    pesos = {}
+    for par in texto.split(","):
+        porte, _, peso = par.partition("=")
+        if porte.strip() and peso.strip():
+            pesos[porte.strip()] = int(peso)
+    return pesos
+
+
+PESOS_PORTE = _ler_pesos(CAPACIDADE_PESOS_PORTE)
+
+# None = sem limite para tenants sem capacidade configurada
+VAGAS_PADRAO: int | None = CAPACIDADE_VAGAS_PADRAO or None
+
+_cache = CacheLRU(
+    "disponibilidade",
+    capacidade=256,
+    ttl_segundos=CAPACIDADE_CACHE_TTL_SEGUNDOS,
+)
+
+
+def peso_do_porte(porte: str) -> int:
+    return PESOS_PORTE.get(porte, 1)
+
+
+def _chave(tenant_id: str, dia: date) -> str:
+    return f"{tenant_id}:{dia:%Y-%m}"
+
+
+def invalidar(tenant_id: str, dia: date) -> None:
+    """Descarta o calendário do mês após uma reserva neste processo."""
+    _cache.invalidar(_chave(tenant_id, dia))
+
+
+async def _ocupacao(tenant_id: str, inicio: date, fim: date) -> list[dict]:
+    """Índice de ocupação do período; sem a tabela, soma os agendamentos."""
+    linhas = await repositorio.obter_ocupacao(tenant_id, inicio, fim)
+    if linhas is not None:
+        return linhas
+
+    logger.warning(
+        "Tabela ocupacao_diaria não encontrada; calculando a ocupação a partir "
+        "dos agendamentos. Aplique supabase/migrations."
+    )
+    por_data: dict[str, int] = {}
+    for linha in await repositorio.listar_portes_por_data(tenant_id, inicio, fim):
+        data = linha["data_atendimento"]
+        por_data[data] = por_data.get(data, 0) + peso_do_porte(linha["porte"])
+    return [
+        {"data": data, "grupo": GRUPO_GERAL, "ocupadas": ocupadas}
+        for data, ocupadas in por_data.items()
+    ]
+
+
+async def disponibilidade_mes(tenant_id: str, mes: date) -> dict:
+    """Vagas, ocupação e vagas livres por dia e grupo no mês de `mes`."""
+    chave = _chave(tenant_id, mes)
+    calendario = _cache.obter(chave)
+    if calendario is not None:
+        return calendario
+
+    inicio = mes.replace(day=1)
+    fim = mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+    capacidade, ocupacao = await asyncio.gather(
+        repositorio.obter_capacidade(tenant_id),
+        _ocupacao(tenant_id, inicio, fim),
+    )
+    # Mesma regra de `reservar_vaga`: sem linha '*', o grupo geral usa o padrão
+    vagas = {GRUPO_GERAL: VAGAS_PADRAO, **(capacidade or {})}
+
+    ocupadas: dict[tuple[str, str], int] = {}
+    for linha in ocupacao:
+        ocupadas[(linha["data"], linha["grupo"])] = linha["ocupadas"]
+    grupos = sorted(set(vagas) | {grupo for _, grupo in ocupadas})
+
+    dias = []
+    for numero in range(1, fim.day + 1):
+        data = inicio.replace(day=numero).isoformat()
+        dia = {}
+        for grupo in grupos:
+            total = vagas.get(grupo)
+            usadas = ocupadas.get((data, grupo), 0)
+            dia[grupo] = {
+                "vagas": total,
+                "ocupadas": usadas,
+                "livres": max(total - usadas, 0) if total is not None else None,
+            }
+        dias.append({"data": data, "grupos": dia})
+
+    calendario = {"mes": f"{inicio:%Y-%m}", "pesos_porte": PESOS_PORTE, "dias": dias}
+    _cache.gravar(chave, calendario)
+    return calendario
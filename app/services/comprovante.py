@@ -2,270 +2,75 @@
 Serviço de geração de comprovantes — SEPET
 Gera o HTML do comprovante de agendamento com dados do animal,
 aviso obrigatório e informações de contato.
+
+O template (`app/templates/comprovante.html`) é lido e compilado uma única
+vez; o CSS fica em `app/static/comprovante.css`, servido à parte com cache
+longo. Cada página renderizada é guardada pela sua *versão* — um hash dos
+dados do agendamento e da triagem —, que também é o ETag da resposta.
+
+Para a exportação em lote, `gerar_zip_lote` monta um ZIP incrementalmente:
+cada página de agendamentos é renderizada e compactada numa thread, fora
+do event loop, e despejada para o cliente antes da próxima chegar.
+O CSS vai uma vez na raiz do ZIP, ao lado dos HTMLs, que o referenciam
+pelo caminho relativo: o arquivo abre formatado fora do servidor.
 """
+import asyncio
+import hashlib
+import html
+import json
+import logging
+import re
+import zipfile
+from collections.abc import AsyncIterator
 from datetime import datetime
-from app.config import SEPET_ENDERECO, SEPET_EMAIL, SEPET_TELEFONE
-
-
-def gerar_comprovante_html(agendamento: dict, triagem: dict | None = None) -> str:
-    """Gera o HTML completo do comprovante de agendamento."""
-
-    # Campos diretos da tabela agendamentos
-    nome = agendamento.get("nome_animal", "N/A")
-    especie = agendamento.get("especie", "N/A")
-    raca = agendamento.get("raca", "SRD")
-    porte = agendamento.get("porte", "N/A")
-    nome_tutor = agendamento.get("nome_tutor", "N/A")
-    cpf_tutor = agendamento.get("cpf_tutor", "N/A")
-    data_atendimento = agendamento.get("data_atendimento", "N/A")
-    status_ia = agendamento.get("status_ia", "Pendente")
-    agendamento_id = agendamento.get("id", "N/A")
-
-    # Campos extras armazenados no JSONB da triagem
-    meta_pet = {}
-    meta_tutor = {}
-    if triagem:
-        respostas = triagem.get("respostas_triagem", {})
-        meta_pet = respostas.get("_meta_pet", {})
-        meta_tutor = respostas.get("_meta_tutor", {})
+from pathlib import Path
+from string import Template
 
-    idade_anos = meta_pet.get("idade_anos", 0)
-    idade_meses = meta_pet.get("idade_meses", 0)
-    sexo = meta_pet.get("sexo", "N/A")
-    peso = meta_pet.get("peso_kg", 0)
-    telefone_tutor = meta_tutor.get("telefone", "N/A")
+from app import repositorio
+from app.config import (
+    CACHE_COMPROVANTES_CAPACIDADE,
+    CACHE_COMPROVANTES_TTL_SEGUNDOS,
+    SEPET_EMAIL,
+    SEPET_ENDERECO,
+    SEPET_TELEFONE,
+)
+from app.services.cache import CacheLRU
 
-    # Formatação de idade
-    partes_idade = []
-    if idade_anos > 0:
-        partes_idade.append(f"{idade_anos} Ano{'s' if idade_anos > 1 else ''}")
-    if idade_meses > 0:
-        partes_idade.append(f"{idade_meses} Mes{'es' if idade_meses > 1 else ''}")
-    idade_formatada = " e ".join(partes_idade) if partes_idade else "Não informado"
-
-    # Parecer IA
-    parecer_ia = ""
-    alerta_risco = False
-    if triagem:
-        parecer_ia = triagem.get("parecer_ia", "")
-        alerta_risco = triagem.get("alerta_risco", False)
-
-    data_emissao = datetime.now().strftime("%d/%m/%Y às %H:%M")
-
-    html = f"""<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Comprovante de Agendamento – SEPET</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: #f0f4f8;
-            padding: 20px;
-            color: #1a202c;
-        }}
-        .comprovante {{
-            max-width: 700px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 16px;
-            box-shadow: 0 4px 24px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #0d9488, #6366f1);
-            color: white;
-            padding: 30px 40px;
-            text-align: center;
-        }}
-        .header h1 {{ font-size: 24px; font-weight: 800; }}
-        .header p {{ font-size: 12px; opacity: 0.9; margin-top: 4px; }}
-        .header .protocolo {{
-            margin-top: 12px;
-            background: rgba(255,255,255,0.2);
-            display: inline-block;
-            padding: 6px 16px;
-            border-radius: 8px;
-            font-size: 12px;
-        }}
-        .body {{ padding: 30px 40px; }}
-        .section {{
-            margin-bottom: 24px;
-            border-bottom: 1px solid #e2e8f0;
-            padding-bottom: 20px;
-        }}
-        .section:last-child {{ border-bottom: none; }}
-        .section h2 {{
-            font-size: 14px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            color: #0d9488;
-            margin-bottom: 12px;
-        }}
-        .info-grid {{
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 8px;
-        }}
-        .info-item {{
-            font-size: 13px;
-        }}
-        .info-item .label {{
-            color: #718096;
-            font-size: 11px;
-            text-transform: uppercase;
-        }}
-        .info-item .value {{
-            font-weight: 600;
-            color: #1a202c;
-        }}
-        .aviso {{
-            background: #fef3c7;
-            border-left: 4px solid #f59e0b;
-            padding: 16px;
-            border-radius: 8px;
-            font-size: 13px;
-            color: #92400e;
-            font-weight: 500;
-        }}
-        .alerta {{
-            background: #fee2e2;
-            border-left: 4px solid #ef4444;
-            padding: 16px;
-            border-radius: 8px;
-            font-size: 13px;
-            color: #991b1b;
-            margin-bottom: 16px;
-        }}
-        .parecer {{
-            background: #ede9fe;
-            border-left: 4px solid #6366f1;
-            padding: 16px;
-            border-radius: 8px;
-            font-size: 13px;
-            color: #3730a3;
-        }}
-        .footer {{
-            background: #1e293b;
-            color: #94a3b8;
-            padding: 20px 40px;
-            text-align: center;
-            font-size: 12px;
-        }}
-        .footer a {{ color: #5eead4; text-decoration: none; }}
-        .footer .contatos {{ margin-bottom: 8px; }}
-    </style>
-</head>
-<body>
-    <div class="comprovante">
-        <div class="header">
-            <h1>🐾 SEPET</h1>
-            <p>Sistema de Esterilização de Pets – Manaus/AM</p>
-            <div class="protocolo">Protocolo: {agendamento_id}</div>
-        </div>
-
-        <div class="body">
-            <div class="section">
-                <h2>📋 Dados do Animal</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <div class="label">Nome</div>
-                        <div class="value">{nome}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Idade</div>
-                        <div class="value">{idade_formatada}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Espécie</div>
-                        <div class="value">{especie}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Raça</div>
-                        <div class="value">{raca}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Porte</div>
-                        <div class="value">{porte}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Sexo</div>
-                        <div class="value">{sexo}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Peso</div>
-                        <div class="value">{peso} kg</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Status</div>
-                        <div class="value">{status_ia}</div>
-                    </div>
-                </div>
-            </div>
-
-            <div class="section">
-                <h2>👤 Dados do Tutor</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <div class="label">Nome</div>
-                        <div class="value">{nome_tutor}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">CPF</div>
-                        <div class="value">{cpf_tutor}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Telefone</div>
-                        <div class="value">{telefone_tutor}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">Data do Atendimento</div>
-                        <div class="value">{data_atendimento}</div>
-                    </div>
-                </div>
-            </div>
-
-            {"<div class='section'><div class='alerta'>🚨 <strong>ALERTA DE RISCO:</strong> Foram identificados fatores de risco na triagem clínica deste animal.</div></div>" if alerta_risco else ""}
-
-            {"<div class='section'><h2>🤖 Parecer da IA</h2><div class='parecer'>" + parecer_ia + "</div></div>" if parecer_ia else ""}
-
-            <div class="section">
-                <div class="aviso">
-                    ⚠️ <strong>AVISO OBRIGATÓRIO:</strong> O questionário de triagem clínica é
-                    indispensável para a anestesia. As informações prestadas são de responsabilidade
-                    do tutor e a veracidade dos dados é essencial para a segurança do animal.
-                </div>
-            </div>
-        </div>
-
-        <div class="footer">
-            <div class="contatos">
-                📧 <a href="mailto:{SEPET_EMAIL}">{SEPET_EMAIL}</a> ·
-                📞 {SEPET_TELEFONE}
-            </div>
-            <div>📍 {SEPET_ENDERECO}</div>
-            <div style="margin-top: 8px; font-size: 10px; color: #64748b;">
-                Emitido em {data_emissao}
-            </div>
-        </div>
-    </div>
-</body>
-</html>"""
-
-    return html
+logger = logging.getLogger("sepet.comprovante")
 
+_DIR_APP = Path(__file__).resolve().parent.parent
+_TEXTO_TEMPLATE = (_DIR_APP / "templates" / "comprovante.html").read_text(encoding="utf-8")
+_TEMPLATE = Template(_TEXTO_TEMPLATE)
+_TEMPLATE_PARECER = Template(
+    "<div class='section'><h2>🤖 Parecer da IA</h2><div class='parecer'>$parecer</div></div>"
+)
+_BLOCO_ALERTA = (
+    "<div class='section'><div class='alerta'>🚨 <strong>ALERTA DE RISCO:</strong> "
+    "Foram identificados fatores de risco na triagem clínica deste animal.</div></div>"
+)
 
-def gerar_comprovante_json(agendamento: dict, triagem: dict | None = None) -> dict:
-    """Gera os dados estruturados do comprovante."""
-    meta_pet = {}
-    meta_tutor = {}
-    if triagem:
-        respostas = triagem.get("respostas_triagem", {})
-        meta_pet = respostas.get("_meta_pet", {})
-        meta_tutor = respostas.get("_meta_tutor", {})
+# O hash do CSS vai na URL, então o navegador pode guardá-lo sem revalidar.
+# O caminho é relativo a /comprovantes/{id} para funcionar também atrás do
+# proxy /api do frontend.
+_CSS = (_DIR_APP / "static" / "comprovante.css").read_bytes()
+VERSAO_CSS = hashlib.sha256(_CSS).hexdigest()[:12]
+URL_CSS = f"../static/comprovante.css?v={VERSAO_CSS}"
+# Nome do CSS dentro do ZIP do lote, relativo aos HTMLs
+CSS_ZIP = "comprovante.css"
+
+# Muda quando o template, o CSS ou os contatos mudam, invalidando os ETags
+VERSAO_TEMPLATE = hashlib.sha256(
+    "\n".join((_TEXTO_TEMPLATE, VERSAO_CSS, SEPET_EMAIL, SEPET_TELEFONE, SEPET_ENDERECO))
+    .encode("utf-8")
+).hexdigest()[:12]
 
+_cache = CacheLRU(
+    "comprovantes",
+    capacidade=CACHE_COMPROVANTES_CAPACIDADE,
+    ttl_segundos=CACHE_COMPROVANTES_TTL_SEGUNDOS,
+)
+
+def _idade_formatada(meta_pet: dict) -> str:
     idade_anos = meta_pet.get("idade_anos", 0)
     idade_meses = meta_pet.get("idade_meses", 0)
     partes = []
@@ -273,12 +78,116 @@ def gerar_comprovante_json(agendamento: dict, triagem: dict | None = None) -> di
         partes.append(f"{idade_anos} Ano{'s' if idade_anos > 1 else ''}")
     if idade_meses > 0:
         partes.append(f"{idade_meses} Mes{'es' if idade_meses > 1 else ''}")
+    return " e ".join(partes) if partes else "Não informado"
+
+
+def _metadados(triagem: dict | None) -> tuple[dict, dict]:
+    """Campos extras armazenados no JSONB da triagem: `_meta_pet` e `_meta_tutor`."""
+    if not triagem:
+        return {}, {}
+    respostas = triagem.get("respostas_triagem") or {}
+    return respostas.get("_meta_pet", {}), respostas.get("_meta_tutor", {})
+
+
+def _data_registro(agendamento: dict) -> str:
+    """Data de criação do agendamento, no lugar do horário de cada requisição."""
+    try:
+        criado_em = datetime.fromisoformat(agendamento["created_at"])
+    except (KeyError, TypeError, ValueError):
+        return ""
+    return f"Registrado em {criado_em.strftime('%d/%m/%Y às %H:%M')}"
+
+
+def versao_comprovante(agendamento: dict, triagem: dict | None = None) -> str:
+    """Hash dos dados que aparecem no comprovante (usado como ETag)."""
+    dados = json.dumps(
+        [VERSAO_TEMPLATE, agendamento, triagem],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()[:32]
+
+
+def gerar_comprovante_html(
+    agendamento: dict,
+    triagem: dict | None = None,
+    css: str = URL_CSS,
+) -> str:
+    """Gera o HTML completo do comprovante de agendamento, ligado ao CSS em `css`."""
+    meta_pet, meta_tutor = _metadados(triagem)
+    parecer_ia = triagem.get("parecer_ia") if triagem else None
+    alerta_risco = triagem.get("alerta_risco") if triagem else False
+
+    valores = {
+        "agendamento_id": agendamento.get("id", "N/A"),
+        "nome": agendamento.get("nome_animal", "N/A"),
+        "idade": _idade_formatada(meta_pet),
+        "especie": agendamento.get("especie", "N/A"),
+        "raca": agendamento.get("raca", "SRD"),
+        "porte": agendamento.get("porte", "N/A"),
+        "sexo": meta_pet.get("sexo", "N/A"),
+        "peso": meta_pet.get("peso_kg", 0),
+        "status_ia": agendamento.get("status_ia", "Pendente"),
+        "nome_tutor": agendamento.get("nome_tutor", "N/A"),
+        "cpf_tutor": agendamento.get("cpf_tutor", "N/A"),
+        "telefone_tutor": meta_tutor.get("telefone", "N/A"),
+        "data_atendimento": agendamento.get("data_atendimento", "N/A"),
+        "email": SEPET_EMAIL,
+        "telefone": SEPET_TELEFONE,
+        "endereco": SEPET_ENDERECO,
+        "emissao": _data_registro(agendamento),
+    }
+    valores = {chave: html.escape(str(valor)) for chave, valor in valores.items()}
+
+    return _TEMPLATE.substitute(
+        valores,
+        css=css,
+        alerta=_BLOCO_ALERTA if alerta_risco else "",
+        parecer=(
+            _TEMPLATE_PARECER.substitute(parecer=html.escape(parecer_ia))
+            if parecer_ia else ""
+        ),
+    )
+
+
+def renderizar_comprovante(
+    agendamento: dict,
+    triagem: dict | None = None,
+    versao: str | None = None,
+) -> tuple[str, str]:
+    """Retorna `(versão, html)`, reaproveitando a página já renderizada."""
+    versao = versao or versao_comprovante(agendamento, triagem)
+    pagina = _cache.obter(versao)
+    if pagina is None:
+        pagina = gerar_comprovante_html(agendamento, triagem)
+        _cache.gravar(versao, pagina)
+    return versao, pagina
+
+
+async def pre_renderizar(agendamento_id: str, tenant_id: str) -> None:
+    """
+    Renderiza o comprovante logo após a análise, para que a primeira visita
+    já encontre o cache de dados e o de páginas preenchidos.
+    """
+    try:
+        registro = await repositorio.obter_agendamento_com_triagem(agendamento_id, tenant_id)
+        if registro is not None:
+            triagem = registro.pop("triagem")
+            renderizar_comprovante(registro, triagem)
+    except Exception as e:
+        logger.warning("[Comprovante] Falha ao pré-renderizar %s: %s", agendamento_id, e)
+
+
+def gerar_comprovante_json(agendamento: dict, triagem: dict | None = None) -> dict:
+    """Gera os dados estruturados do comprovante."""
+    meta_pet, meta_tutor = _metadados(triagem)
 
     return {
         "protocolo": agendamento.get("id"),
         "animal": {
             "nome": agendamento.get("nome_animal"),
-            "idade": " e ".join(partes) if partes else "Não informado",
+            "idade": _idade_formatada(meta_pet),
             "especie": agendamento.get("especie"),
             "raca": agendamento.get("raca"),
             "porte": agendamento.get("porte"),
@@ -305,3 +214,77 @@ def gerar_comprovante_json(agendamento: dict, triagem: dict | None = None) -> di
         },
         "emitido_em": datetime.now().isoformat(),
     }
+
+
+# ── Exportação em lote (ZIP) ─────────────────
+
+class _SaidaZip:
+    """
+    Destino não-posicionável para o `ZipFile`: acumula os bytes escritos
+    até serem despejados. O zipfile detecta a falta de `seek`/`tell` e
+    grava cada entrada com *data descriptor*, sem voltar no arquivo.
+    """
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+
+    def write(self, dados: bytes) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self) -> None:
+        pass
+
+    def despejar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _nome_arquivo(agendamento: dict) -> str:
+    nome = re.sub(r"[^\w-]+", "_", str(agendamento.get("nome_animal") or "animal")).strip("_")
+    return f"{nome or 'animal'}_{agendamento.get('id')}"
+
+
+def _arquivos_comprovante(agendamento: dict) -> list[tuple[str, str]]:
+    """Renderiza o HTML e o JSON de um comprovante."""
+    triagem = agendamento.get("triagem")
+    nome = _nome_arquivo(agendamento)
+    dados = gerar_comprovante_json(agendamento, triagem)
+    return [
+        (f"{nome}.html", gerar_comprovante_html(agendamento, triagem, css=CSS_ZIP)),
+        (f"{nome}.json", json.dumps(dados, ensure_ascii=False, indent=2)),
+    ]
+
+
+def _gravar_pagina(arquivo: zipfile.ZipFile, pagina: list[dict]) -> None:
+    """
+    Renderiza e compacta uma página. A renderização é Python puro (presa ao
+    GIL), então um pool de threads não a paralelizaria: a página inteira
+    roda numa única thread, só para não ocupar o event loop.
+    """
+    for agendamento in pagina:
+        for nome, conteudo in _arquivos_comprovante(agendamento):
+            arquivo.writestr(nome, conteudo)
+
+
+async def gerar_zip_lote(paginas: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """
+    Gera o ZIP com o CSS e o HTML e o JSON de cada agendamento (com
+    `triagem`), emitindo os bytes de cada página assim que ela é
+    compactada. A memória usada é a de uma página, qualquer que seja o total.
+    """
+    saida = _SaidaZip()
+    arquivo = zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED)
+    total = 0
+    try:
+        arquivo.writestr(CSS_ZIP, _CSS)
+        async for pagina in paginas:
+            await asyncio.to_thread(_gravar_pagina, arquivo, pagina)
+            total += len(pagina)
+            yield saida.despejar()
+        arquivo.close()
+        yield saida.despejar()
+        logger.info("[Comprovante] Lote gerado com %s comprovante(s)", total)
+    finally:
+        arquivo.close()
@@ -0,0 +1,119 @@
+"""
+Exportação de agendamentos e triagens — SEPET
+Gera a exportação completa de um tenant em NDJSON (um objeto JSON por
+linha) ou CSV, uma linha por agendamento com a triagem achatada em colunas:
+o parecer, o alerta de risco, os dados extras do pet e do tutor
+(`_meta_pet`/`_meta_tutor`) e cada pergunta do questionário clínico.
+
+As linhas são lidas do banco página a página (keyset, ver
+`repositorio.iterar_agendamentos_com_triagem`) e cada página é codificada
+e enviada ao cliente antes da próxima consulta: a memória usada é a de
+uma página, qualquer que seja o tamanho do tenant.
+
+As colunas são fixas (as do questionário atual, em `TriagemCreate`), para
+o cabeçalho do CSV não depender das linhas; chaves que não fazem mais parte
+do questionário ficam de fora.
+"""
+import csv
+import io
+import logging
+from collections.abc import AsyncIterator
+
+from app import repositorio
+from app.models import TriagemCreate
+from app.serializacao import para_json
+
+logger = logging.getLogger("sepet.exportacao")
+
+FORMATO_NDJSON = "ndjson"
+FORMATO_CSV = "csv"
+
+TIPOS_MIDIA = {
+    FORMATO_NDJSON: "application/x-ndjson",
+    FORMATO_CSV: "text/csv; charset=utf-8",
+}
+
+# Dados extras guardados no JSONB da triagem: (chave de origem, coluna)
+_META_PET = [
+    ("idade_anos", "pet_idade_anos"),
+    ("idade_meses", "pet_idade_meses"),
+    ("sexo", "pet_sexo"),
+    ("peso_kg", "pet_peso_kg"),
+]
+_META_TUTOR = [
+    ("telefone", "tutor_telefone"),
+    ("email", "tutor_email"),
+]
+PERGUNTAS = tuple(TriagemCreate.model_fields)
+
+COLUNAS = (
+    *repositorio.CAMPOS_AGENDAMENTO,
+    "triagem_id",
+    "alerta_risco",
+    "parecer_ia",
+    *(coluna for _, coluna in _META_PET),
+    *(coluna for _, coluna in _META_TUTOR),
+    *PERGUNTAS,
+)
+
+
+def achatar(agendamento: dict) -> dict:
+    """Agendamento com `triagem` → uma linha plana com todas as `COLUNAS`."""
+    linha = {coluna: agendamento.get(coluna) for coluna in repositorio.CAMPOS_AGENDAMENTO}
+    triagem = agendamento.get("triagem") or {}
+    respostas = triagem.get("respostas_triagem") or {}
+    meta_pet = respostas.get("_meta_pet") or {}
+    meta_tutor = respostas.get("_meta_tutor") or {}
+
+    linha["triagem_id"] = triagem.get("id")
+    linha["alerta_risco"] = triagem.get("alerta_risco")
+    linha["parecer_ia"] = triagem.get("parecer_ia")
+    for chave, coluna in _META_PET:
+        linha[coluna] = meta_pet.get(chave)
+    for chave, coluna in _META_TUTOR:
+        linha[coluna] = meta_tutor.get(chave)
+    for pergunta in PERGUNTAS:
+        linha[pergunta] = respostas.get(pergunta)
+    return linha
+
+
+def _valor_csv(valor):
+    """Booleanos como no JSON (`true`/`false`) e vazio para nulo."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    return valor
+
+
+def _pagina_ndjson(pagina: list[dict]) -> bytes:
+    return b"".join(para_json(achatar(agendamento)) + b"\n" for agendamento in pagina)
+
+
+def _pagina_csv(pagina: list[dict], cabecalho: bool = False) -> bytes:
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    if cabecalho:
+        escritor.writerow(COLUNAS)
+    for agendamento in pagina:
+        linha = achatar(agendamento)
+        escritor.writerow([_valor_csv(linha[coluna]) for coluna in COLUNAS])
+    return saida.getvalue().encode("utf-8")
+
+
+async def gerar(formato: str, paginas: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Bytes da exportação no `formato`, uma página do banco por vez."""
+    if formato == FORMATO_CSV:
+        yield _pagina_csv([], cabecalho=True)
+    codificar = _pagina_csv if formato == FORMATO_CSV else _pagina_ndjson
+
+    total = 0
+    try:
+        async for pagina in paginas:
+            total += len(pagina)
+            yield codificar(pagina)
+    except Exception as e:
+        # O status 200 já foi enviado: só resta interromper o download
+        logger.error("[Exportação] Interrompida após %s linha(s): %s", total, e)
+        raise
+    logger.info("[Exportação] %s linha(s) exportada(s) em %s", total, formato)
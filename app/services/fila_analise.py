@@ -0,0 +1,516 @@
+"""
+Fila durável de análises de IA — SEPET
+Persiste os jobs de análise de triagem em SQLite local e os executa com um
+pool configurável de workers, fora do ciclo de requisição HTTP.
+
+Ciclo do `status_ia` do agendamento:
+    Pendente → Em análise → Analisado / Provisório / Falhou
+
+`Provisório` marca o parecer do fallback determinístico (LLM indisponível):
+a triagem tem parecer, mas volta a ser analisada no próximo lote.
+
+Cada job reservado recebe um *lease*, renovado enquanto a análise roda;
+se o processo morrer no meio da análise, o job volta a ficar disponível
+quando o lease expira, então nenhuma análise em andamento é perdida num
+reinício. O número da tentativa funciona como token de posse: um worker
+que perdeu o lease não grava mais nada sobre o job.
+
+Jobs também podem ser agrupados em *lotes* (reprocessamento em massa de
+triagens pendentes). Cada lote tem seu próprio limite de paralelismo e
+seus jobs só são reservados depois dos jobs avulsos de novos agendamentos,
+para que um backfill grande não atrase as análises do balcão.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from app import logs, metricas, repositorio
+from app.agents.clinical_analyst import CAMINHO_FALLBACK, analisar_triagem_async
+from app.agents.limitador import LimiteExcedido
+from app.services import comprovante
+from app.config import (
+    FILA_DB_PATH,
+    FILA_INTERVALO_SEGUNDOS,
+    FILA_LEASE_SEGUNDOS,
+    FILA_MAX_TENTATIVAS,
+    FILA_WORKERS,
+)
+
+logger = logging.getLogger("sepet.fila")
+
+STATUS_PENDENTE = "Pendente"
+STATUS_EM_ANALISE = "Em análise"
+STATUS_ANALISADO = "Analisado"
+STATUS_PROVISORIO = "Provisório"
+STATUS_FALHOU = "Falhou"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs_analise (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    triagem_id      TEXT NOT NULL,
+    agendamento_id  TEXT NOT NULL,
+    tenant_id       TEXT NOT NULL,
+    respostas       TEXT NOT NULL,
+    pet_info        TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    tentativas      INTEGER NOT NULL DEFAULT 0,
+    disponivel_em   REAL NOT NULL,
+    lease_ate       REAL,
+    erro            TEXT,
+    criado_em       REAL NOT NULL,
+    atualizado_em   REAL NOT NULL,
+    lote_id         TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_analise_status
+    ON jobs_analise (status, disponivel_em);
+
+CREATE TABLE IF NOT EXISTS lotes_analise (
+    id           TEXT PRIMARY KEY,
+    tenant_id    TEXT NOT NULL,
+    total        INTEGER NOT NULL,
+    paralelismo  INTEGER NOT NULL,
+    criado_em    REAL NOT NULL
+);
+"""
+
+# Colunas adicionadas depois da criação inicial da tabela de jobs
+_MIGRACOES = {
+    "lote_id": "ALTER TABLE jobs_analise ADD COLUMN lote_id TEXT",
+}
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+_sinal: asyncio.Event | None = None
+_workers: list[asyncio.Task] = []
+
+
+class _LeasePerdido(Exception):
+    """O job foi reservado por outro worker depois que o lease expirou."""
+
+
+# ── Persistência ──────────────────────────────
+
+def _conexao() -> sqlite3.Connection:
+    """Retorna a conexão SQLite da fila (criada sob demanda)."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            FILA_DB_PATH, check_same_thread=False, isolation_level=None
+        )
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA busy_timeout=5000")
+        _conn.executescript(_SCHEMA)
+        colunas = {row["name"] for row in _conn.execute("PRAGMA table_info(jobs_analise)")}
+        for coluna, ddl in _MIGRACOES.items():
+            if coluna not in colunas:
+                _conn.execute(ddl)
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_analise_lote "
+            "ON jobs_analise (lote_id, status)"
+        )
+    return _conn
+
+
+def _inserir_job(
+    triagem_id: str,
+    agendamento_id: str,
+    tenant_id: str,
+    respostas: dict,
+    pet_info: dict,
+) -> int:
+    agora = time.time()
+    with _lock:
+        cur = _conexao().execute(
+            "INSERT INTO jobs_analise (triagem_id, agendamento_id, tenant_id, "
+            "respostas, pet_info, status, disponivel_em, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                triagem_id,
+                agendamento_id,
+                tenant_id,
+                json.dumps(respostas, ensure_ascii=False),
+                json.dumps(pet_info, ensure_ascii=False),
+                STATUS_PENDENTE,
+                agora,
+                agora,
+                agora,
+            ),
+        )
+        return cur.lastrowid
+
+
+def _inserir_lote(tenant_id: str, itens: list[dict], paralelismo: int) -> str:
+    """Grava o lote e todos os seus jobs numa única transação."""
+    lote_id = uuid.uuid4().hex
+    agora = time.time()
+    with _lock:
+        conn = _conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO lotes_analise (id, tenant_id, total, paralelismo, criado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (lote_id, tenant_id, len(itens), paralelismo, agora),
+            )
+            conn.executemany(
+                "INSERT INTO jobs_analise (triagem_id, agendamento_id, tenant_id, "
+                "respostas, pet_info, status, disponivel_em, criado_em, atualizado_em, "
+                "lote_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        item["triagem_id"],
+                        item["agendamento_id"],
+                        tenant_id,
+                        json.dumps(item["respostas"], ensure_ascii=False),
+                        json.dumps(item["pet_info"], ensure_ascii=False),
+                        STATUS_PENDENTE,
+                        agora,
+                        agora,
+                        agora,
+                        lote_id,
+                    )
+                    for item in itens
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return lote_id
+
+
+def _triagens_ativas(tenant_id: str) -> set[str]:
+    """Triagens do tenant que já têm um job pendente ou em análise."""
+    with _lock:
+        rows = _conexao().execute(
+            "SELECT DISTINCT triagem_id FROM jobs_analise "
+            "WHERE tenant_id = ? AND status IN (?, ?)",
+            (tenant_id, STATUS_PENDENTE, STATUS_EM_ANALISE),
+        ).fetchall()
+    return {row["triagem_id"] for row in rows}
+
+
+def _progresso_lote(lote_id: str, tenant_id: str) -> dict | None:
+    with _lock:
+        conn = _conexao()
+        lote = conn.execute(
+            "SELECT * FROM lotes_analise WHERE id = ? AND tenant_id = ?",
+            (lote_id, tenant_id),
+        ).fetchone()
+        if lote is None:
+            return None
+        contagem = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM jobs_analise WHERE lote_id = ? GROUP BY status",
+            (lote_id,),
+        ).fetchall())
+        ultimo = conn.execute(
+            "SELECT MAX(atualizado_em) FROM jobs_analise "
+            "WHERE lote_id = ? AND status IN (?, ?)",
+            (lote_id, STATUS_ANALISADO, STATUS_FALHOU),
+        ).fetchone()[0]
+
+    concluidos = contagem.get(STATUS_ANALISADO, 0)
+    falhas = contagem.get(STATUS_FALHOU, 0)
+    processados = concluidos + falhas
+    finalizado = processados == lote["total"]
+    fim = ultimo if finalizado and ultimo else time.time()
+    decorrido = max(fim - lote["criado_em"], 1e-6)
+
+    return {
+        "lote_id": lote_id,
+        "total": lote["total"],
+        "paralelismo": lote["paralelismo"],
+        "concluidos": concluidos,
+        "falhas": falhas,
+        "em_andamento": contagem.get(STATUS_EM_ANALISE, 0),
+        "restantes": lote["total"] - processados,
+        "finalizado": finalizado,
+        "decorrido_segundos": round(decorrido, 1),
+        "throughput_por_minuto": round(processados / decorrido * 60, 2),
+    }
+
+
+def _reservar_job() -> dict | None:
+    """
+    Reserva atomicamente o próximo job disponível: um job pendente cujo
+    horário já chegou, ou um job em análise cujo lease expirou. Jobs de
+    lote respeitam o paralelismo do lote e ficam atrás dos jobs avulsos.
+    """
+    agora = time.time()
+    with _lock:
+        conn = _conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT j.* FROM jobs_analise j "
+                "LEFT JOIN lotes_analise l ON l.id = j.lote_id "
+                "WHERE ((j.status = ? AND j.disponivel_em <= ?) "
+                "    OR (j.status = ? AND j.lease_ate < ?)) "
+                "  AND (j.lote_id IS NULL OR ("
+                "      SELECT COUNT(*) FROM jobs_analise k "
+                "      WHERE k.lote_id = j.lote_id AND k.status = ? AND k.lease_ate >= ?"
+                "  ) < l.paralelismo) "
+                "ORDER BY j.lote_id IS NOT NULL, j.disponivel_em, j.id LIMIT 1",
+                (STATUS_PENDENTE, agora, STATUS_EM_ANALISE, agora, STATUS_EM_ANALISE, agora),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs_analise SET status = ?, tentativas = tentativas + 1, "
+                "lease_ate = ?, atualizado_em = ? WHERE id = ?",
+                (STATUS_EM_ANALISE, agora + FILA_LEASE_SEGUNDOS, agora, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    job = dict(row)
+    job["tentativas"] += 1
+    job["respostas"] = json.loads(job["respostas"])
+    job["pet_info"] = json.loads(job["pet_info"])
+    return job
+
+
+# As atualizações abaixo só valem enquanto o job ainda pertence a esta
+# tentativa (status `Em análise` e mesmo `tentativas`); retornam False se
+# o lease foi perdido para outro worker ou o job já foi finalizado.
+_POSSE = "id = ? AND status = ? AND tentativas = ?"
+
+
+def _posse(job: dict) -> tuple:
+    return (job["id"], STATUS_EM_ANALISE, job["tentativas"])
+
+
+def _renovar_lease(job: dict) -> bool:
+    agora = time.time()
+    with _lock:
+        cur = _conexao().execute(
+            f"UPDATE jobs_analise SET lease_ate = ?, atualizado_em = ? WHERE {_POSSE}",
+            (agora + FILA_LEASE_SEGUNDOS, agora, *_posse(job)),
+        )
+    return cur.rowcount == 1
+
+
+def _finalizar_job(job: dict, status: str, erro: str | None = None) -> bool:
+    with _lock:
+        cur = _conexao().execute(
+            "UPDATE jobs_analise SET status = ?, erro = ?, lease_ate = NULL, "
+            f"atualizado_em = ? WHERE {_POSSE}",
+            (status, erro, time.time(), *_posse(job)),
+        )
+    return cur.rowcount == 1
+
+
+def _reagendar_job(job: dict, atraso: float, erro: str | None = None) -> bool:
+    agora = time.time()
+    with _lock:
+        cur = _conexao().execute(
+            "UPDATE jobs_analise SET status = ?, erro = ?, lease_ate = NULL, "
+            f"disponivel_em = ?, atualizado_em = ? WHERE {_POSSE}",
+            (STATUS_PENDENTE, erro, agora + atraso, agora, *_posse(job)),
+        )
+    return cur.rowcount == 1
+
+
+def _devolver_job(job: dict, atraso: float) -> bool:
+    """Devolve o job à fila sem contar a tentativa (ex.: limite do LLM atingido)."""
+    agora = time.time()
+    with _lock:
+        cur = _conexao().execute(
+            "UPDATE jobs_analise SET status = ?, tentativas = tentativas - 1, "
+            f"lease_ate = NULL, disponivel_em = ?, atualizado_em = ? WHERE {_POSSE}",
+            (STATUS_PENDENTE, agora + atraso, agora, *_posse(job)),
+        )
+    return cur.rowcount == 1
+
+
+# ── Execução ──────────────────────────────────
+
+def status_resultado(resultado_ia: dict) -> str:
+    """`status_ia` do agendamento após a análise: o parecer do fallback é provisório."""
+    if resultado_ia["caminho"] == CAMINHO_FALLBACK:
+        return STATUS_PROVISORIO
+    return STATUS_ANALISADO
+
+
+async def _executar_job(job: dict) -> None:
+    """Roda a análise de um job e grava o resultado no Supabase."""
+    triagem_id = job["triagem_id"]
+    agendamento_id = job["agendamento_id"]
+
+    await repositorio.atualizar_status(agendamento_id, job["tenant_id"], STATUS_EM_ANALISE)
+
+    logger.info("[Fila] Iniciando análise IA para triagem %s (job %s)", triagem_id, job["id"])
+    resultado_ia = await analisar_triagem_async(job["respostas"], job["pet_info"])
+
+    # Renova uma última vez antes de gravar: se outro worker já reservou o
+    # job, o resultado desta tentativa é descartado
+    if not await asyncio.to_thread(_renovar_lease, job):
+        raise _LeasePerdido
+
+    await repositorio.registrar_analise(
+        triagem_id,
+        job["tenant_id"],
+        resultado_ia["alerta_risco"],
+        resultado_ia["parecer_ia"],
+        status_resultado(resultado_ia),
+    )
+    await comprovante.pre_renderizar(agendamento_id, job["tenant_id"])
+
+    logger.info(
+        "[Fila] Análise IA concluída para triagem %s: alerta_risco=%s | caminho=%s",
+        triagem_id, resultado_ia["alerta_risco"], resultado_ia["caminho"],
+    )
+
+
+async def _registrar_falha(job: dict, erro: Exception) -> None:
+    """Reagenda o job com backoff ou marca como `Falhou` após o limite."""
+    if job["tentativas"] < FILA_MAX_TENTATIVAS:
+        atraso = 2 ** job["tentativas"] * FILA_INTERVALO_SEGUNDOS
+        logger.warning(
+            "[Fila] Job %s falhou (tentativa %s/%s): %s | nova tentativa em %.0fs",
+            job["id"], job["tentativas"], FILA_MAX_TENTATIVAS, erro, atraso,
+        )
+        await asyncio.to_thread(_reagendar_job, job, atraso, str(erro))
+        return
+
+    logger.error(
+        "[Fila] Job %s esgotou as tentativas para triagem %s: %s",
+        job["id"], job["triagem_id"], erro,
+    )
+    if not await asyncio.to_thread(_finalizar_job, job, STATUS_FALHOU, str(erro)):
+        return
+    try:
+        await repositorio.atualizar_status(job["agendamento_id"], job["tenant_id"], STATUS_FALHOU)
+    except Exception as e:
+        logger.error("[Fila] Erro ao marcar agendamento como Falhou: %s", e)
+
+
+async def _manter_lease(job: dict) -> None:
+    """Renova o lease do job enquanto a análise roda."""
+    while True:
+        await asyncio.sleep(FILA_LEASE_SEGUNDOS / 3)
+        try:
+            renovado = await asyncio.to_thread(_renovar_lease, job)
+        except sqlite3.Error as e:
+            logger.warning("[Fila] Erro ao renovar o lease do job %s: %s", job["id"], e)
+            continue
+        if not renovado:
+            logger.warning("[Fila] Job %s perdeu o lease para outro worker", job["id"])
+            return
+
+
+async def _worker(numero: int) -> None:
+    """Laço de um worker: reserva jobs e os executa até ser cancelado."""
+    while True:
+        job = await asyncio.to_thread(_reservar_job)
+        if job is None:
+            try:
+                await asyncio.wait_for(_sinal.wait(), timeout=FILA_INTERVALO_SEGUNDOS)
+            except asyncio.TimeoutError:
+                pass
+            _sinal.clear()
+            continue
+
+        metricas.tenant_atual.set(job["tenant_id"])
+        logs.request_id_atual.set(f"job-{job['id']}")
+        renovacao = asyncio.create_task(_manter_lease(job))
+        try:
+            await _executar_job(job)
+            await asyncio.to_thread(_finalizar_job, job, STATUS_ANALISADO)
+        except _LeasePerdido:
+            logger.warning(
+                "[Fila] Resultado do job %s descartado: o job foi reservado "
+                "por outro worker", job["id"],
+            )
+        except LimiteExcedido as e:
+            logger.info(
+                "[Fila] Job %s devolvido à fila: limite do LLM do tenant %s "
+                "atingido | nova tentativa em %ss",
+                job["id"], job["tenant_id"], e.retry_after,
+            )
+            await asyncio.to_thread(_devolver_job, job, e.retry_after)
+        except asyncio.CancelledError:
+            # Encerramento: o loop está parando, então a devolução é síncrona
+            _reagendar_job(job, 0, "Interrompido no encerramento do processo")
+            raise
+        except Exception as e:
+            await _registrar_falha(job, e)
+        finally:
+            renovacao.cancel()
+            _sinal.set()
+
+
+# ── API pública ───────────────────────────────
+
+async def enfileirar(
+    triagem_id: str,
+    agendamento_id: str,
+    tenant_id: str,
+    respostas: dict,
+    pet_info: dict,
+) -> int:
+    """Persiste um novo job de análise e acorda os workers."""
+    job_id = await asyncio.to_thread(
+        _inserir_job, triagem_id, agendamento_id, tenant_id, respostas, pet_info
+    )
+    if _sinal is not None:
+        _sinal.set()
+    logger.info("[Fila] Job %s enfileirado para triagem %s", job_id, triagem_id)
+    return job_id
+
+
+async def enfileirar_lote(tenant_id: str, itens: list[dict], paralelismo: int) -> str:
+    """
+    Enfileira um lote de análises. Cada item traz `triagem_id`,
+    `agendamento_id`, `respostas` e `pet_info`.
+    """
+    lote_id = await asyncio.to_thread(_inserir_lote, tenant_id, itens, paralelismo)
+    if _sinal is not None:
+        _sinal.set()
+    logger.info(
+        "[Fila] Lote %s com %s job(s) enfileirado para tenant %s (paralelismo %s)",
+        lote_id, len(itens), tenant_id, paralelismo,
+    )
+    return lote_id
+
+
+async def triagens_ativas(tenant_id: str) -> set[str]:
+    return await asyncio.to_thread(_triagens_ativas, tenant_id)
+
+
+async def progresso_lote(lote_id: str, tenant_id: str) -> dict | None:
+    """Progresso do lote (None se não existir para o tenant)."""
+    return await asyncio.to_thread(_progresso_lote, lote_id, tenant_id)
+
+
+async def iniciar() -> None:
+    """Abre a fila e sobe o pool de workers (chamado no `lifespan`)."""
+    global _sinal
+    _sinal = asyncio.Event()
+    await asyncio.to_thread(_conexao)
+    for n in range(FILA_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n), name=f"fila-analise-{n}"))
+    logger.info("[Fila] %s worker(s) iniciados | banco: %s", FILA_WORKERS, FILA_DB_PATH)
+
+
+async def encerrar() -> None:
+    """Cancela os workers e devolve à fila os jobs interrompidos."""
+    global _conn
+    for task in _workers:
+        task.cancel()
+    # Cada worker devolve o seu job interrompido ao ser cancelado
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+    logger.info("[Fila] Workers encerrados")
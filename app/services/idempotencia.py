@@ -0,0 +1,255 @@
+"""
+Chaves de idempotência — SEPET
+Guarda a resposta de cada `POST` feito com o cabeçalho `Idempotency-Key`,
+para que um reenvio (rede instável, botão clicado duas vezes) devolva a
+resposta original sem gravar outro agendamento nem disparar outra análise.
+
+As chaves ficam em SQLite local (`IDEMPOTENCIA_DB_PATH`), compartilhado
+entre os workers do mesmo host, escopadas pelo tenant:
+  - a primeira requisição reserva a chave (`em_andamento`) e executa
+  - requisições concorrentes com a mesma chave esperam a primeira terminar
+    e recebem a mesma resposta; esgotada a espera, recebem `409`, nunca
+    uma nova execução
+  - a reserva vale por `IDEMPOTENCIA_RESERVA_SEGUNDOS` e é renovada
+    enquanto a requisição executa: só é retomada por outra requisição se o
+    processo que a fez morrer
+  - concluída, a resposta vale por `IDEMPOTENCIA_TTL_SEGUNDOS`
+
+Se a primeira requisição falhar, a chave é liberada e o próximo reenvio
+executa de novo. Reusar a chave com outro corpo é um erro do cliente.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from app import metricas
+from app.config import (
+    IDEMPOTENCIA_DB_PATH,
+    IDEMPOTENCIA_ESPERA_SEGUNDOS,
+    IDEMPOTENCIA_RESERVA_SEGUNDOS,
+    IDEMPOTENCIA_TTL_SEGUNDOS,
+)
+
+logger = logging.getLogger("sepet.idempotencia")
+
+CABECALHO_CHAVE = "Idempotency-Key"
+CABECALHO_REPETIDA = "Idempotent-Replayed"
+TAMANHO_MAX_CHAVE = 255
+
+NOVA = "nova"
+REPETIDA = "repetida"
+CONFLITO = "conflito"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDA = "concluida"
+
+# Intervalo de consulta ao SQLite quando a requisição original está em
+# outro worker (no mesmo processo, a espera é acordada por um Event)
+_INTERVALO_ESPERA = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chaves_idempotencia (
+    chave       TEXT PRIMARY KEY,
+    impressao   TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    codigo      INTEGER,
+    resposta    TEXT,
+    expira_em   REAL NOT NULL
+);
+-- Varredura das chaves vencidas, feita a cada reserva
+CREATE INDEX IF NOT EXISTS ix_chaves_idempotencia_expira
+    ON chaves_idempotencia (expira_em);
+"""
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+_eventos: dict[str, asyncio.Event] = {}
+_renovacoes: dict[str, asyncio.Task] = {}
+
+
+@dataclass
+class Reserva:
+    """Resultado de `reservar`: `resposta`/`codigo` só em `REPETIDA`."""
+    situacao: str
+    codigo: int | None = None
+    resposta: dict | None = None
+
+
+def _conexao() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            IDEMPOTENCIA_DB_PATH, check_same_thread=False, isolation_level=None
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA busy_timeout=5000")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def impressao(corpo: dict) -> str:
+    """Hash do corpo da requisição, para detectar a chave reusada com outro corpo."""
+    texto = json.dumps(corpo, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _tentar_reservar(chave: str, impressao_corpo: str) -> Reserva | None:
+    """Reserva a chave ou lê o seu estado; None = outra requisição em andamento."""
+    agora = time.time()
+    with _lock:
+        conn = _conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Chaves vencidas: respostas fora do TTL e reservas de um processo
+            # que morreu (as em andamento são renovadas enquanto executam)
+            conn.execute("DELETE FROM chaves_idempotencia WHERE expira_em < ?", (agora,))
+            row = conn.execute(
+                "SELECT impressao, status, codigo, resposta FROM chaves_idempotencia "
+                "WHERE chave = ?",
+                (chave,),
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO chaves_idempotencia (chave, impressao, status, expira_em) "
+                    "VALUES (?, ?, ?, ?)",
+                    (chave, impressao_corpo, EM_ANDAMENTO, agora + IDEMPOTENCIA_RESERVA_SEGUNDOS),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    if row is None:
+        return Reserva(NOVA)
+    if row[0] != impressao_corpo:
+        return Reserva(CONFLITO)
+    if row[1] == CONCLUIDA:
+        return Reserva(REPETIDA, row[2], json.loads(row[3]))
+    return None
+
+
+def _concluir(chave: str, codigo: int, resposta: dict) -> None:
+    with _lock:
+        _conexao().execute(
+            "UPDATE chaves_idempotencia SET status = ?, codigo = ?, resposta = ?, "
+            "expira_em = ? WHERE chave = ?",
+            (
+                CONCLUIDA,
+                codigo,
+                json.dumps(resposta, ensure_ascii=False),
+                time.time() + IDEMPOTENCIA_TTL_SEGUNDOS,
+                chave,
+            ),
+        )
+
+
+def _renovar(chave: str) -> None:
+    with _lock:
+        _conexao().execute(
+            "UPDATE chaves_idempotencia SET expira_em = ? WHERE chave = ? AND status = ?",
+            (time.time() + IDEMPOTENCIA_RESERVA_SEGUNDOS, chave, EM_ANDAMENTO),
+        )
+
+
+async def _manter_reserva(chave: str) -> None:
+    """Renova a reserva até a requisição concluir ou liberar a chave."""
+    while True:
+        await asyncio.sleep(IDEMPOTENCIA_RESERVA_SEGUNDOS / 3)
+        try:
+            await asyncio.to_thread(_renovar, chave)
+        except sqlite3.Error as e:
+            logger.warning("[Idempotência] Erro ao renovar a chave %s: %s", chave, e)
+
+
+def _liberar(chave: str) -> None:
+    with _lock:
+        _conexao().execute(
+            "DELETE FROM chaves_idempotencia WHERE chave = ? AND status = ?",
+            (chave, EM_ANDAMENTO),
+        )
+
+
+def _encerrar_reserva(chave: str) -> None:
+    """Para a renovação da reserva e acorda quem espera pela chave."""
+    renovacao = _renovacoes.pop(chave, None)
+    if renovacao is not None:
+        renovacao.cancel()
+    evento = _eventos.pop(chave, None)
+    if evento is not None:
+        evento.set()
+
+
+# ── API pública ───────────────────────────────
+
+async def reservar(tenant_id: str, chave: str, impressao_corpo: str) -> Reserva:
+    """
+    Reserva a chave para esta requisição, ou devolve a resposta guardada.
+    Se outra requisição com a mesma chave estiver em andamento, espera até
+    `IDEMPOTENCIA_ESPERA_SEGUNDOS` por ela; esgotado o prazo, devolve
+    `EM_ANDAMENTO` — a reserva dela continua valendo.
+    """
+    chave = f"{tenant_id}:{chave}"
+    limite = time.monotonic() + IDEMPOTENCIA_ESPERA_SEGUNDOS
+    while True:
+        reserva = await asyncio.to_thread(_tentar_reservar, chave, impressao_corpo)
+        if reserva is not None:
+            if reserva.situacao == NOVA:
+                _eventos[chave] = asyncio.Event()
+                _renovacoes[chave] = asyncio.create_task(_manter_reserva(chave))
+            metricas.registrar_idempotencia(reserva.situacao)
+            return reserva
+
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            metricas.registrar_idempotencia(EM_ANDAMENTO)
+            return Reserva(EM_ANDAMENTO)
+        evento = _eventos.get(chave)
+        espera = restante if evento is not None else min(_INTERVALO_ESPERA, restante)
+        try:
+            await asyncio.wait_for(
+                evento.wait() if evento is not None else asyncio.sleep(espera),
+                timeout=espera,
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+async def concluir(tenant_id: str, chave: str, codigo: int, resposta: dict) -> None:
+    """Guarda a resposta da requisição original e acorda quem espera por ela."""
+    chave = f"{tenant_id}:{chave}"
+    try:
+        await asyncio.to_thread(_concluir, chave, codigo, resposta)
+    finally:
+        _encerrar_reserva(chave)
+
+
+async def liberar(tenant_id: str, chave: str) -> None:
+    """Descarta a reserva após uma falha, para o próximo reenvio executar de novo."""
+    chave = f"{tenant_id}:{chave}"
+    try:
+        await asyncio.to_thread(_liberar, chave)
+    except sqlite3.Error as e:
+        logger.error("[Idempotência] Erro ao liberar a chave %s: %s", chave, e)
+    finally:
+        _encerrar_reserva(chave)
+
+
+def encerrar() -> None:
+    """
+    Para as renovações e acorda quem espera antes de fechar o banco: uma
+    renovação atrasada reabriria a conexão depois do encerramento.
+    """
+    global _conn
+    for renovacao in _renovacoes.values():
+        renovacao.cancel()
+    _renovacoes.clear()
+    for evento in _eventos.values():
+        evento.set()
+    _eventos.clear()
+    if _conn is not None:
+        _conn.close()
+        _conn = None
@@ -0,0 +1,563 @@
+"""
+Benchmark de carga — SEPET
+Roda o app FastAPI de verdade (rotas, middleware, fila de análise,
+idempotência, caches) contra dois substitutos locais, sem rede externa:
+
+  - `benchmarks.supabase_local`: o PostgREST do Supabase em memória,
+    populado com agendamentos e triagens dos casos de
+    `benchmarks/fixtures/triagens.json`
+  - `benchmarks.llm_local`: um LLM compatível com a OpenAI no lugar do
+    MiniMax, que reproduz as respostas de `benchmarks/fixtures/respostas_llm.json`
+
+Os dois sobem em servidores uvicorn numa thread à parte, com latência e
+jitter configuráveis; o app é chamado em processo (`httpx.ASGITransport`).
+Usuários virtuais executam, durante `--duracao` segundos, as operações
+de cada cenário sorteadas pelos pesos:
+
+  - agendamentos: rajadas de agendamentos na mesma data, agendamentos
+    avulsos (com Idempotency-Key) e consultas de disponibilidade
+  - painel: painel de gestão paginado e listagens de agendamentos/triagens
+  - comprovantes: comprovante HTML (metade com If-None-Match), em JSON e
+    exportação CSV
+  - analises: análise síncrona, em streaming e reprocessamento em lote
+  - misto: todas as operações acima
+
+O relatório traz, por cenário, o throughput e o p50/p95/p99 de cada rota
+e de cada etapa do `analisar_triagem` (Lupa, Juiz, Relator, Único, também
+das análises feitas pela fila). Gravado com `--saida`, serve de base para
+`--comparar`, que aponta as rotas/etapas cujo p95 piorou além de
+`--tolerancia` (entre as com amostras suficientes nas duas execuções) e
+sai com código 1 nesse caso.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.carga
+    python -m benchmarks.carga --cenarios misto --duracao 60 --usuarios 32 --saida carga.json
+    python -m benchmarks.carga --saida nova.json --comparar carga.json --tolerancia 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.llm_local import RESPOSTAS, LlmLocal
+from benchmarks.supabase_local import BancoLocal
+
+TENANTS = ["clinica-a", "clinica-b", "clinica-c"]
+
+CENARIOS = {
+    "agendamentos": {"rajada_agendamentos": 3, "agendar": 5, "disponibilidade": 2},
+    "painel": {"painel": 5, "listar_agendamentos": 2, "listar_triagens": 2, "disponibilidade": 1},
+    "comprovantes": {"comprovante": 6, "comprovante_json": 3, "exportacao": 1},
+    "analises": {"analise": 4, "analise_stream": 2, "analise_lote": 1},
+}
+CENARIOS["misto"] = {
+    "agendar": 4, "rajada_agendamentos": 1, "disponibilidade": 2,
+    "painel": 4, "listar_agendamentos": 1, "listar_triagens": 1,
+    "comprovante": 4, "comprovante_json": 2, "exportacao": 1,
+    "analise": 2, "analise_stream": 1, "analise_lote": 1,
+}
+
+TAMANHO_RAJADA = 8
+# Abaixo disso o p95 é ruído demais para comparar entre execuções
+MIN_AMOSTRAS_COMPARACAO = 20
+
+
+# ── Servidores locais ─────────────────────────
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Servidores:
+    """Supabase e LLM locais em servidores uvicorn, numa thread com loop próprio."""
+
+    def __init__(self, banco: BancoLocal, llm: LlmLocal):
+        import uvicorn
+
+        self.porta_banco = _porta_livre()
+        self.porta_llm = _porta_livre()
+        self._servidores = [
+            uvicorn.Server(uvicorn.Config(
+                app, host="127.0.0.1", port=porta, log_level="warning", lifespan="off"
+            ))
+            for app, porta in ((banco.app, self.porta_banco), (llm.app, self.porta_llm))
+        ]
+        for servidor in self._servidores:
+            # Os sinais ficam com o processo principal
+            servidor.install_signal_handlers = lambda: None
+        self._thread = threading.Thread(target=self._rodar, daemon=True)
+
+    def _rodar(self) -> None:
+        async def todos():
+            await asyncio.gather(*(s.serve() for s in self._servidores))
+        asyncio.run(todos())
+
+    def __enter__(self):
+        self._thread.start()
+        limite = time.monotonic() + 10
+        while not all(s.started for s in self._servidores):
+            if time.monotonic() > limite or not self._thread.is_alive():
+                raise RuntimeError("Servidores locais não subiram")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        for servidor in self._servidores:
+            servidor.should_exit = True
+        self._thread.join(timeout=10)
+
+
+# ── Coleta ───────────────────────────────────
+
+class Coleta:
+    """Amostras de latência por rota e por etapa durante um cenário."""
+
+    def __init__(self):
+        self.rotas: dict[str, list[float]] = defaultdict(list)
+        self.erros: Counter = Counter()
+        self.recusas: Counter = Counter()
+        self.etapas: dict[str, list[float]] = defaultdict(list)
+        self.caminhos: Counter = Counter()
+        self.exemplos_erro: list[str] = []
+
+    def registrar(self, rota: str, ms: float, status: int | None, erro: str | None = None) -> None:
+        self.rotas[rota].append(ms)
+        if status is None or status >= 500:
+            self.erros[rota] += 1
+            if len(self.exemplos_erro) < 5:
+                self.exemplos_erro.append(f"{rota}: {erro or status}")
+        elif status >= 400:
+            self.recusas[rota] += 1
+
+
+_coleta_atual: Coleta | None = None
+
+
+def _instrumentar_metricas() -> None:
+    """Copia as etapas e os resultados do pipeline para a coleta em curso."""
+    from app import metricas
+
+    registrar_etapa = metricas.registrar_etapa
+    registrar_resultado = metricas.registrar_resultado
+
+    def etapa(nome: str, segundos: float, uso: dict | None) -> None:
+        if _coleta_atual is not None:
+            _coleta_atual.etapas[nome].append(segundos * 1000)
+        registrar_etapa(nome, segundos, uso)
+
+    def resultado(dados: dict) -> None:
+        if _coleta_atual is not None:
+            _coleta_atual.caminhos[dados.get("caminho", "desconhecido")] += 1
+        registrar_resultado(dados)
+
+    metricas.registrar_etapa = etapa
+    metricas.registrar_resultado = resultado
+
+
+# ── Operações ────────────────────────────────
+
+class Carga:
+    """Operações dos usuários virtuais sobre o app."""
+
+    def __init__(self, cliente: httpx.AsyncClient, banco: BancoLocal, casos: list[dict], semente: int):
+        self.cliente = cliente
+        self.banco = banco
+        self.casos = casos
+        self.rng = random.Random(semente)
+        self.etags: dict[str, str] = {}
+        self.coleta = Coleta()
+
+    async def _chamar(self, rota: str, metodo: str, url: str, tenant: str, **kwargs) -> httpx.Response | None:
+        headers = {"X-Tenant-ID": tenant, **kwargs.pop("headers", {})}
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.request(metodo, url, headers=headers, **kwargs)
+        except Exception as e:
+            self.coleta.registrar(rota, (time.perf_counter() - inicio) * 1000, None, repr(e))
+            return None
+        self.coleta.registrar(rota, (time.perf_counter() - inicio) * 1000, resposta.status_code)
+        return resposta
+
+    def _agendamento(self, tenant: str) -> dict | None:
+        linhas = [a for a in self.banco.tabelas["agendamentos"] if a["tenant_id"] == tenant]
+        return self.rng.choice(linhas) if linhas else None
+
+    def _triagem(self, tenant: str) -> dict | None:
+        linhas = [t for t in self.banco.tabelas["triagens"] if t["tenant_id"] == tenant]
+        return self.rng.choice(linhas) if linhas else None
+
+    def _novo_agendamento(self, dia: date) -> dict:
+        caso = self.rng.choice(self.casos)
+        pet = caso["pet_info"]
+        respostas = {k: v for k, v in caso["respostas_triagem"].items() if not k.startswith("_")}
+        return {
+            "nome_tutor": f"Tutor {self.rng.randrange(10**6)}",
+            "cpf_tutor": f"{self.rng.randrange(10**11):011d}",
+            "nome_animal": pet["pet_nome"],
+            "especie": pet["pet_especie"],
+            "raca": pet["pet_raca"],
+            "porte": pet["pet_porte"],
+            "data_atendimento": dia.isoformat(),
+            "idade_anos": self.rng.randint(0, 14),
+            "peso_kg": round(self.rng.uniform(2, 40), 1),
+            "triagem": respostas,
+        }
+
+    def _dia_futuro(self) -> date:
+        return date.today() + timedelta(days=self.rng.randint(1, 60))
+
+    async def agendar(self, tenant: str) -> None:
+        await self._chamar(
+            "POST /agendamentos/", "POST", "/agendamentos/", tenant,
+            json=self._novo_agendamento(self._dia_futuro()),
+            headers={"Idempotency-Key": uuid.uuid4().hex},
+        )
+
+    async def rajada_agendamentos(self, tenant: str) -> None:
+        # Vários tutores disputando as vagas do mesmo dia
+        dia = self._dia_futuro()
+        await asyncio.gather(*(
+            self._chamar(
+                "POST /agendamentos/", "POST", "/agendamentos/", tenant,
+                json=self._novo_agendamento(dia),
+            )
+            for _ in range(TAMANHO_RAJADA)
+        ))
+
+    async def disponibilidade(self, tenant: str) -> None:
+        mes = self._dia_futuro().strftime("%Y-%m")
+        await self._chamar(
+            "GET /agendamentos/disponibilidade", "GET", "/agendamentos/disponibilidade", tenant,
+            params={"mes": mes},
+        )
+
+    async def painel(self, tenant: str) -> None:
+        params = {"limite": 50}
+        for _ in range(self.rng.randint(1, 3)):
+            resposta = await self._chamar("GET /painel/", "GET", "/painel/", tenant, params=params)
+            if resposta is None or resposta.status_code != 200:
+                return
+            cursor = resposta.json().get("proximo_cursor")
+            if not cursor:
+                return
+            params = {"limite": 50, "cursor": cursor}
+
+    async def listar_agendamentos(self, tenant: str) -> None:
+        params = {"limite": 100}
+        if self.rng.random() < 0.5:
+            params["status_ia"] = self.rng.choice(["Pendente", "Analisado", "Falhou"])
+        await self._chamar("GET /agendamentos/", "GET", "/agendamentos/", tenant, params=params)
+
+    async def listar_triagens(self, tenant: str) -> None:
+        params = {"limite": 100}
+        if self.rng.random() < 0.5:
+            params["alerta_risco"] = "true"
+        await self._chamar("GET /triagens/", "GET", "/triagens/", tenant, params=params)
+
+    async def comprovante(self, tenant: str) -> None:
+        agendamento = self._agendamento(tenant)
+        if agendamento is None:
+            return
+        headers = {}
+        etag = self.etags.get(agendamento["id"])
+        if etag and self.rng.random() < 0.5:
+            headers["If-None-Match"] = etag
+        resposta = await self._chamar(
+            "GET /comprovantes/{agendamento_id}", "GET", f"/comprovantes/{agendamento['id']}",
+            tenant, headers=headers,
+        )
+        if resposta is not None and "etag" in resposta.headers:
+            self.etags[agendamento["id"]] = resposta.headers["etag"]
+
+    async def comprovante_json(self, tenant: str) -> None:
+        agendamento = self._agendamento(tenant)
+        if agendamento is not None:
+            await self._chamar(
+                "GET /comprovantes/{agendamento_id}/json", "GET",
+                f"/comprovantes/{agendamento['id']}/json", tenant,
+            )
+
+    async def exportacao(self, tenant: str) -> None:
+        await self._chamar("GET /exportacao/", "GET", "/exportacao/", tenant, params={"formato": "csv"})
+
+    async def analise(self, tenant: str) -> None:
+        triagem = self._triagem(tenant)
+        if triagem is not None:
+            await self._chamar(
+                "POST /analise/{triagem_id}", "POST", f"/analise/{triagem['id']}", tenant,
+            )
+
+    async def analise_stream(self, tenant: str) -> None:
+        triagem = self._triagem(tenant)
+        if triagem is not None:
+            # O corpo é lido até o fim: a latência é a do stream completo
+            await self._chamar(
+                "GET /analise/{triagem_id}/stream", "GET", f"/analise/{triagem['id']}/stream", tenant,
+            )
+
+    async def analise_lote(self, tenant: str) -> None:
+        resposta = await self._chamar("POST /analise/lote", "POST", "/analise/lote", tenant)
+        if resposta is not None and resposta.status_code == 202:
+            await self._chamar(
+                "GET /analise/lote/{lote_id}", "GET", resposta.json()["progresso"], tenant,
+            )
+
+    async def usuario(self, pesos: dict[str, int], fim: float) -> None:
+        operacoes = list(pesos)
+        while time.perf_counter() < fim:
+            operacao = self.rng.choices(operacoes, weights=[pesos[o] for o in operacoes])[0]
+            await getattr(self, operacao)(self.rng.choice(TENANTS))
+
+
+# ── Execução ─────────────────────────────────
+
+def _resumo_latencias(amostras: list[float]) -> dict:
+    from benchmarks.comparar_modos import _percentil
+
+    return {
+        "n": len(amostras),
+        "p50_ms": round(_percentil(amostras, 50), 1),
+        "p95_ms": round(_percentil(amostras, 95), 1),
+        "p99_ms": round(_percentil(amostras, 99), 1),
+        "max_ms": round(max(amostras, default=0.0), 1),
+    }
+
+
+async def _esperar_fila(limite_segundos: float) -> float:
+    """Espera a fila de análise esvaziar (até o limite); devolve os segundos esperados."""
+    from app.services import fila_analise
+
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite_segundos:
+        ativas = await asyncio.gather(*(fila_analise.triagens_ativas(t) for t in TENANTS))
+        if not any(ativas):
+            break
+        await asyncio.sleep(0.2)
+    return round(time.perf_counter() - inicio, 1)
+
+
+async def _cenario(
+    nome: str,
+    cliente: httpx.AsyncClient,
+    banco: BancoLocal,
+    llm: LlmLocal,
+    casos: list[dict],
+    args: argparse.Namespace,
+) -> dict:
+    global _coleta_atual
+
+    carga = Carga(cliente, banco, casos, args.semente)
+    _coleta_atual = carga.coleta
+    requisicoes_db = banco.requisicoes
+    chamadas_llm = dict(llm.chamadas)
+
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(carga.usuario(CENARIOS[nome], fim) for _ in range(args.usuarios)))
+    duracao = time.perf_counter() - inicio
+    espera_fila = await _esperar_fila(args.espera_fila)
+    _coleta_atual = None
+
+    coleta = carga.coleta
+    total = sum(len(a) for a in coleta.rotas.values())
+    return {
+        "duracao_segundos": round(duracao, 1),
+        "espera_fila_segundos": espera_fila,
+        "requisicoes": total,
+        "throughput_rps": round(total / duracao, 1),
+        "erros": sum(coleta.erros.values()),
+        "exemplos_erro": coleta.exemplos_erro,
+        "rotas": {
+            rota: {
+                **_resumo_latencias(amostras),
+                "erros": coleta.erros[rota],
+                "recusas_4xx": coleta.recusas[rota],
+            }
+            for rota, amostras in sorted(coleta.rotas.items())
+        },
+        "etapas": {etapa: _resumo_latencias(a) for etapa, a in sorted(coleta.etapas.items())},
+        "analises_por_caminho": dict(coleta.caminhos),
+        "chamadas_llm": {
+            etapa: n - chamadas_llm.get(etapa, 0) for etapa, n in llm.chamadas.items()
+            if n - chamadas_llm.get(etapa, 0)
+        },
+        "requisicoes_db": banco.requisicoes - requisicoes_db,
+    }
+
+
+async def _rodar_cenarios(banco: BancoLocal, llm: LlmLocal, casos: list[dict], args) -> dict:
+    from app.main import app
+
+    _instrumentar_metricas()
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://sepet", timeout=120) as cliente:
+            for nome in args.cenarios:
+                print(f"[{nome}] {args.usuarios} usuários por {args.duracao}s...")
+                resultados[nome] = await _cenario(nome, cliente, banco, llm, casos, args)
+    return resultados
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(args: argparse.Namespace) -> dict:
+    banco = BancoLocal(args.db_latencia_ms, args.db_jitter_ms, args.semente)
+    llm = LlmLocal(
+        args.respostas, args.llm_ttft_ms, args.llm_ms_por_token, args.llm_jitter,
+        args.llm_taxa_erro, semente=args.semente,
+    )
+
+    with _Servidores(banco, llm) as servidores, tempfile.TemporaryDirectory() as pasta:
+        # Antes de importar qualquer módulo do app: a configuração é lida na importação
+        os.environ.update({
+            "SUPABASE_URL": f"http://127.0.0.1:{servidores.porta_banco}",
+            "SUPABASE_KEY": "benchmark",
+            "MINIMAX_API_KEY": "benchmark",
+            "MINIMAX_BASE_URL": f"http://127.0.0.1:{servidores.porta_llm}/v1",
+            "FILA_DB_PATH": str(Path(pasta) / "fila.db"),
+            "IDEMPOTENCIA_DB_PATH": str(Path(pasta) / "idempotencia.db"),
+            "LOG_NIVEL": os.environ.get("LOG_NIVEL", "ERROR"),
+        })
+        from benchmarks.comparar_modos import carregar_casos
+
+        casos = carregar_casos()
+        banco.popular(TENANTS, args.agendamentos, casos, date.today(), 60)
+        resultados = asyncio.run(_rodar_cenarios(banco, llm, casos, args))
+
+    return {
+        "versao": 1,
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "config": {
+            "usuarios": args.usuarios,
+            "duracao_segundos": args.duracao,
+            "agendamentos_por_tenant": args.agendamentos,
+            "tenants": TENANTS,
+            "db_latencia_ms": args.db_latencia_ms,
+            "db_jitter_ms": args.db_jitter_ms,
+            "llm_ttft_ms": args.llm_ttft_ms,
+            "llm_ms_por_token": args.llm_ms_por_token,
+            "llm_jitter": args.llm_jitter,
+            "llm_taxa_erro": args.llm_taxa_erro,
+            "semente": args.semente,
+        },
+        "cenarios": resultados,
+    }
+
+
+def comparar(base: dict, atual: dict, tolerancia: float) -> list[str]:
+    """Rotas e etapas cujo p95 piorou mais que `tolerancia` em relação à base."""
+    regressoes = []
+    for nome, cenario in atual["cenarios"].items():
+        anterior = base.get("cenarios", {}).get(nome)
+        if anterior is None:
+            continue
+        for grupo in ("rotas", "etapas"):
+            for chave, medida in cenario[grupo].items():
+                antes = anterior.get(grupo, {}).get(chave)
+                if not antes or not antes["p95_ms"]:
+                    continue
+                if min(antes["n"], medida["n"]) < MIN_AMOSTRAS_COMPARACAO:
+                    continue
+                variacao = medida["p95_ms"] / antes["p95_ms"] - 1
+                linha = (
+                    f"[{nome}] {chave}: p95 {antes['p95_ms']} → {medida['p95_ms']} ms "
+                    f"({variacao:+.0%})"
+                )
+                print(linha)
+                if variacao > tolerancia:
+                    regressoes.append(linha)
+    return regressoes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--cenarios", default=",".join(CENARIOS),
+        help=f"Lista separada por vírgulas entre: {', '.join(CENARIOS)}",
+    )
+    parser.add_argument("--duracao", type=float, default=20, help="Segundos por cenário")
+    parser.add_argument("--usuarios", type=int, default=16, help="Usuários virtuais simultâneos")
+    parser.add_argument("--agendamentos", type=int, default=500, help="Carga inicial por tenant")
+    parser.add_argument("--espera-fila", type=float, default=30,
+                        help="Segundos, no máximo, esperando a fila de análise esvaziar")
+    parser.add_argument("--db-latencia-ms", type=float, default=5)
+    parser.add_argument("--db-jitter-ms", type=float, default=2)
+    parser.add_argument("--respostas", type=Path, default=RESPOSTAS, help="Respostas gravadas do LLM")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300)
+    parser.add_argument("--llm-ms-por-token", type=float, default=4)
+    parser.add_argument("--llm-jitter", type=float, default=0.25)
+    parser.add_argument("--llm-taxa-erro", type=float, default=0.0)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o relatório completo")
+    parser.add_argument("--comparar", type=Path, help="Relatório anterior para comparar o p95")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Piora relativa de p95 aceita na comparação (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    args.cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = [c for c in args.cenarios if c not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"Cenário(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    relatorio = executar(args)
+
+    for nome, cenario in relatorio["cenarios"].items():
+        print(
+            f"\n── {nome}: {cenario['requisicoes']} requisições, "
+            f"{cenario['throughput_rps']} req/s, {cenario['erros']} erro(s) ──"
+        )
+        for rota, medida in cenario["rotas"].items():
+            print(
+                f"  {rota:<42} n={medida['n']:<5} p50={medida['p50_ms']:<8} "
+                f"p95={medida['p95_ms']:<8} p99={medida['p99_ms']}"
+            )
+        for etapa, medida in cenario["etapas"].items():
+            print(
+                f"  etapa {etapa:<36} n={medida['n']:<5} p50={medida['p50_ms']:<8} "
+                f"p95={medida['p95_ms']:<8} p99={medida['p99_ms']}"
+            )
+        for exemplo in cenario["exemplos_erro"]:
+            print(f"  erro: {exemplo}")
+
+    if args.saida:
+        Path(args.saida).write_text(
+            json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"\nRelatório gravado em {args.saida}")
+
+    if args.comparar:
+        print(f"\n── p95 em relação a {args.comparar} ──")
+        base = json.loads(args.comparar.read_text(encoding="utf-8"))
+        regressoes = comparar(base, relatorio, args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
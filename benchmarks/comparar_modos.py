@@ -0,0 +1,146 @@
+"""
+Benchmark dos modos de análise — SEPET
+Roda o pipeline `multi` (Lupa → Juiz → Relator) e o `single` (uma chamada
+estruturada) sobre o conjunto gravado de triagens em
+`benchmarks/fixtures/triagens.json` e compara latência, uso de tokens e
+concordância dos vereditos.
+
+Uso (a partir da raiz do projeto, com MINIMAX_API_KEY configurada):
+    python -m benchmarks.comparar_modos
+    python -m benchmarks.comparar_modos --repeticoes 3 --saida resultado.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from app.agents.clinical_analyst import MODO_MULTI, MODO_SINGLE, executar_pipeline
+
+FIXTURES = Path(__file__).parent / "fixtures" / "triagens.json"
+
+
+def carregar_casos(caminho: Path = FIXTURES) -> list[dict]:
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)["casos"]
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+async def _medir(caso: dict, modo: str) -> dict:
+    """Executa um caso em um modo, medindo tempo de parede e tokens."""
+    inicio = time.perf_counter()
+    with get_usage_metadata_callback() as uso:
+        try:
+            resultado = await executar_pipeline(
+                caso["respostas_triagem"], caso["pet_info"], modo
+            )
+            erro = None
+        except Exception as e:
+            resultado, erro = None, str(e)
+    duracao = time.perf_counter() - inicio
+
+    tokens_entrada = sum(u.get("input_tokens", 0) for u in uso.usage_metadata.values())
+    tokens_saida = sum(u.get("output_tokens", 0) for u in uso.usage_metadata.values())
+    return {
+        "caso": caso["id"],
+        "modo": modo,
+        "segundos": round(duracao, 3),
+        "tokens_entrada": tokens_entrada,
+        "tokens_saida": tokens_saida,
+        "alerta_risco": resultado["alerta_risco"] if resultado else None,
+        "caminho": resultado["caminho"] if resultado else None,
+        "erro": erro,
+    }
+
+
+def _resumo(execucoes: list[dict], casos: list[dict]) -> dict:
+    esperado = {c["id"]: c.get("alerta_esperado") for c in casos}
+    ok = [e for e in execucoes if e["erro"] is None]
+    latencias = [e["segundos"] for e in ok]
+    acertos = [e for e in ok if e["alerta_risco"] == esperado[e["caso"]]]
+    return {
+        "execucoes": len(execucoes),
+        "erros": len(execucoes) - len(ok),
+        "latencia_media_s": round(statistics.mean(latencias), 3) if latencias else 0.0,
+        "latencia_p50_s": round(_percentil(latencias, 50), 3),
+        "latencia_p95_s": round(_percentil(latencias, 95), 3),
+        "tokens_entrada_medio": round(statistics.mean(e["tokens_entrada"] for e in ok), 1) if ok else 0.0,
+        "tokens_saida_medio": round(statistics.mean(e["tokens_saida"] for e in ok), 1) if ok else 0.0,
+        "concordancia_esperado": round(len(acertos) / len(ok), 3) if ok else 0.0,
+    }
+
+
+def _concordancia_entre_modos(execucoes: list[dict]) -> float:
+    """Fração dos casos em que os dois modos emitiram o mesmo veredito."""
+    vereditos: dict[str, dict[str, set]] = {}
+    for e in execucoes:
+        if e["erro"] is None:
+            vereditos.setdefault(e["caso"], {}).setdefault(e["modo"], set()).add(e["alerta_risco"])
+    comparaveis = [v for v in vereditos.values() if len(v) == 2]
+    if not comparaveis:
+        return 0.0
+    iguais = [v for v in comparaveis if v[MODO_MULTI] == v[MODO_SINGLE]]
+    return round(len(iguais) / len(comparaveis), 3)
+
+
+async def executar(modos: list[str], repeticoes: int) -> dict:
+    casos = carregar_casos()
+    execucoes = []
+    for modo in modos:
+        for _ in range(repeticoes):
+            for caso in casos:
+                execucao = await _medir(caso, modo)
+                execucoes.append(execucao)
+                print(
+                    f"{modo:6} {caso['id']:38} {execucao['segundos']:7.2f}s "
+                    f"in={execucao['tokens_entrada']:5} out={execucao['tokens_saida']:5} "
+                    f"alerta={execucao['alerta_risco']}"
+                    + (f" ERRO: {execucao['erro']}" if execucao["erro"] else "")
+                )
+
+    relatorio = {
+        "modos": {
+            modo: _resumo([e for e in execucoes if e["modo"] == modo], casos)
+            for modo in modos
+        },
+        "execucoes": execucoes,
+    }
+    if len(modos) == 2:
+        relatorio["concordancia_entre_modos"] = _concordancia_entre_modos(execucoes)
+    return relatorio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modos", default=f"{MODO_MULTI},{MODO_SINGLE}")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o relatório completo")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(executar(args.modos.split(","), args.repeticoes))
+
+    print("\n── Resumo ──")
+    for modo, resumo in relatorio["modos"].items():
+        print(f"[{modo}] " + " | ".join(f"{k}={v}" for k, v in resumo.items()))
+    if "concordancia_entre_modos" in relatorio:
+        print(f"Concordância de veredito entre modos: {relatorio['concordancia_entre_modos']}")
+
+    if args.saida:
+        Path(args.saida).write_text(
+            json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"Relatório gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
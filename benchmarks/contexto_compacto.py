@@ -0,0 +1,355 @@
+"""
+Contexto compacto vs. legado — SEPET
+Compara o `_montar_contexto` compacto com o formato anterior (JSON indentado
+de todas as respostas, incluindo `_meta_*` e contatos do tutor) sobre as
+triagens de `benchmarks/fixtures/triagens.json`.
+
+Sem LLM (padrão), para cada caso:
+  - estima os tokens de entrada da Lupa nos dois formatos
+  - reconstrói as respostas a partir do contexto compacto e confere que as
+    regras obrigatórias disparam exatamente como nas respostas originais
+  - confere que nenhum dado do tutor aparece no contexto
+  - roda o pipeline `multi` completo (regras, Juiz pulado ou não, leitura
+    do JSON do Relator) nos dois formatos com um LLM simulado, que aplica
+    as regras de cada prompt ao texto que recebe, e confere que o veredito
+    do Juiz e o `alerta_risco` final são os mesmos
+
+O LLM simulado garante que o contexto compacto leva ao pipeline todos os
+fatos de que o veredito depende; não mede como o modelo real interpreta
+o novo formato. Para isso, `--llm` (requer MINIMAX_API_KEY) roda o
+pipeline `multi` com o MiniMax nos dois formatos e compara tokens reais
+por etapa e os vereditos.
+
+Sai com código 1 se algum caso divergir.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.contexto_compacto
+    python -m benchmarks.contexto_compacto --llm --saida contexto.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+from prometheus_client import REGISTRY
+
+from app.agents import clinical_analyst
+from app.agents.clinical_analyst import (
+    CAMPOS_OBRIGATORIOS,
+    ETAPA_JUIZ,
+    ETAPA_LUPA,
+    ETAPA_RELATOR,
+    MODO_MULTI,
+    PROMPT_JUIZ,
+    PROMPT_LUPA,
+    _montar_contexto,
+    _veredito_juiz,
+    executar_pipeline,
+)
+from app.agents.regras import avaliar_regras
+from app.metricas import tenant_atual
+from benchmarks.comparar_modos import carregar_casos
+
+try:
+    import tiktoken
+    _codificador = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken ausente ou sem o vocabulário em cache
+    _codificador = None
+
+ETAPAS = (ETAPA_LUPA, ETAPA_JUIZ, ETAPA_RELATOR)
+
+# Sinais que levam a ALTO RISCO pelas regras do PROMPT_JUIZ
+_SINAIS_CRITICOS = ("desmaio", "convulsao", "dificuldade_respirar")
+_MARCADOR_LEGADO = "Respostas do Questionário de Triagem:\n"
+
+
+def _contexto_legado(respostas: dict, pet_info: dict) -> str:
+    """Formato anterior de `_montar_contexto`, mantido só para comparação."""
+    return (
+        f"Dados do Animal:\n"
+        f"- Nome: {pet_info.get('pet_nome', 'N/A')}\n"
+        f"- Espécie: {pet_info.get('pet_especie', 'N/A')}\n"
+        f"- Raça: {pet_info.get('pet_raca', 'N/A')}\n"
+        f"- Porte: {pet_info.get('pet_porte', 'N/A')}\n"
+        f"- Idade: {pet_info.get('pet_idade_anos', 0)} ano(s) e "
+        f"{pet_info.get('pet_idade_meses', 0)} mese(s)\n"
+        f"- Peso: {pet_info.get('pet_peso_kg', 0)} kg\n"
+        f"- Sexo: {pet_info.get('pet_sexo', 'N/A')}\n\n"
+        f"Respostas do Questionário de Triagem:\n"
+        f"{json.dumps(respostas, indent=2, ensure_ascii=False)}"
+    )
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens pelo tiktoken, ou estimativa de ~4 caracteres por token."""
+    if _codificador is not None:
+        return len(_codificador.encode(texto))
+    return max(1, len(texto) // 4)
+
+
+def _reconstruir_respostas(contexto: str, campos: list[str]) -> dict:
+    """Lê de volta as respostas booleanas a partir do contexto compacto."""
+    respostas = {campo: False for campo in campos}
+    for linha in contexto.splitlines():
+        rotulo, _, conteudo = linha.partition(": ")
+        if rotulo == "Sinais positivos":
+            lista = conteudo.rsplit(" (", 1)[0]
+            if lista != "nenhum":
+                for campo in lista.split(", "):
+                    respostas[campo] = True
+        elif rotulo == "Obrigatórios":
+            for par in conteudo.split("; "):
+                campo, _, valor = par.partition("=")
+                respostas[campo] = valor == "true"
+    return respostas
+
+
+def _dados_tutor(respostas: dict) -> list[str]:
+    meta = respostas.get("_meta_tutor") or {}
+    return [str(v) for v in meta.values() if v]
+
+
+def verificar_caso(caso: dict) -> dict:
+    """Tokens da Lupa nos dois formatos e checagens de equivalência."""
+    respostas, pet_info = caso["respostas_triagem"], caso["pet_info"]
+    compacto = _montar_contexto(respostas, pet_info)
+    legado = _contexto_legado(respostas, pet_info)
+
+    campos = [c for c, v in respostas.items() if isinstance(v, bool)]
+    reconstruidas = _reconstruir_respostas(compacto, campos)
+    regras_originais = avaliar_regras(respostas, pet_info).regras_disparadas
+    regras_compacto = avaliar_regras(reconstruidas, pet_info).regras_disparadas
+
+    problemas = []
+    if regras_originais != regras_compacto:
+        problemas.append(f"regras {regras_originais} != {regras_compacto}")
+    faltando = [c for c in CAMPOS_OBRIGATORIOS if f"{c}=" not in compacto]
+    if faltando:
+        problemas.append(f"obrigatórios ausentes: {faltando}")
+    vazados = [d for d in _dados_tutor(respostas) if d in compacto]
+    if vazados:
+        problemas.append(f"dados do tutor no contexto: {vazados}")
+
+    tokens_legado = contar_tokens(PROMPT_LUPA) + contar_tokens(legado)
+    tokens_compacto = contar_tokens(PROMPT_LUPA) + contar_tokens(compacto)
+    return {
+        "caso": caso["id"],
+        "tokens_lupa_legado": tokens_legado,
+        "tokens_lupa_compacto": tokens_compacto,
+        "reducao": round(1 - tokens_compacto / tokens_legado, 3),
+        "problemas": problemas,
+    }
+
+
+def _tokens_etapas() -> dict[str, float]:
+    """Leitura atual do contador `sepet_llm_tokens` de entrada por etapa."""
+    return {
+        etapa: REGISTRY.get_sample_value(
+            "sepet_llm_tokens_total",
+            {"etapa": etapa, "tipo": "entrada", "tenant": tenant_atual.get()},
+        ) or 0.0
+        for etapa in ETAPAS
+    }
+
+
+async def _rodar_llm(caso: dict, montar) -> dict:
+    """Roda o pipeline `multi` com o serializador dado, medindo tokens por etapa."""
+    original = clinical_analyst._montar_contexto
+    clinical_analyst._montar_contexto = montar
+    antes = _tokens_etapas()
+    try:
+        resultado = await executar_pipeline(
+            caso["respostas_triagem"], caso["pet_info"], MODO_MULTI
+        )
+    finally:
+        clinical_analyst._montar_contexto = original
+    depois = _tokens_etapas()
+    return {
+        "alerta_risco": resultado["alerta_risco"],
+        "tokens_entrada": {e: int(depois[e] - antes[e]) for e in ETAPAS},
+    }
+
+
+class LlmSimulado:
+    """
+    Substituto determinístico do `llm` no pipeline `multi`. Cada etapa
+    segue o próprio prompt sobre o texto que recebe: a Lupa lê os fatos do
+    contexto (compacto ou legado) e os relata, o Juiz aplica as regras do
+    PROMPT_JUIZ ao relatório da Lupa e o Relator devolve o JSON com o
+    veredito do Juiz. O veredito depende só do que o contexto carrega.
+    """
+
+    def __init__(self):
+        self.veredito: str | None = None
+
+    async def ainvoke(self, mensagens: list) -> AIMessage:
+        sistema, usuario = mensagens[0].content, mensagens[-1].content
+        if sistema == PROMPT_LUPA:
+            return AIMessage(content=self._lupa(usuario))
+        if sistema == PROMPT_JUIZ:
+            return AIMessage(content=self._juiz(usuario))
+        return AIMessage(content=self._relator(usuario))
+
+    @staticmethod
+    def _lupa(contexto: str) -> str:
+        if _MARCADOR_LEGADO in contexto:
+            respostas = json.loads(contexto.split(_MARCADOR_LEGADO, 1)[1])
+        else:
+            respostas = _reconstruir_respostas(contexto, list(CAMPOS_OBRIGATORIOS))
+        positivos = sorted(
+            campo for campo, valor in respostas.items()
+            if valor is True and campo not in CAMPOS_OBRIGATORIOS
+        )
+        obrigatorios = "; ".join(
+            f"{campo}={'true' if respostas.get(campo) else 'false'}"
+            for campo in CAMPOS_OBRIGATORIOS
+        )
+        return f"Sinais positivos: {', '.join(positivos) or 'nenhum'}\nObrigatórios: {obrigatorios}"
+
+    @staticmethod
+    def _juiz(relatorio: str) -> str:
+        respostas = _reconstruir_respostas(relatorio, list(CAMPOS_OBRIGATORIOS))
+        riscos = [c for c in _SINAIS_CRITICOS if respostas.get(c)]
+        riscos += [
+            f"{c}=false" for c in ("entendeu_risco_anestesico", "jejum_12h")
+            if not respostas.get(c)
+        ]
+        veredito = "ALTO RISCO" if riscos else "BAIXO RISCO"
+        return f"VEREDITO: {veredito}\nRiscos: {', '.join(riscos) or 'nenhum'}"
+
+    def _relator(self, entrada: str) -> str:
+        saida_juiz = entrada.split("VEREDITO DO AUDITOR:", 1)[-1]
+        alerta = _veredito_juiz(saida_juiz)
+        self.veredito = "ALTO RISCO" if alerta else "BAIXO RISCO"
+        return json.dumps({"alerta_risco": alerta, "parecer_ia": f"Veredito: {self.veredito}."})
+
+
+async def _rodar_simulado(caso: dict, montar) -> dict:
+    """Roda o pipeline `multi` com o LLM simulado e o serializador dado."""
+    simulado = LlmSimulado()
+    originais = clinical_analyst.llm, clinical_analyst._montar_contexto
+    clinical_analyst.llm, clinical_analyst._montar_contexto = simulado, montar
+    try:
+        resultado = await executar_pipeline(
+            caso["respostas_triagem"], caso["pet_info"], MODO_MULTI
+        )
+    finally:
+        clinical_analyst.llm, clinical_analyst._montar_contexto = originais
+    return {"veredito": simulado.veredito, "alerta_risco": resultado["alerta_risco"]}
+
+
+async def comparar_simulado(casos: list[dict]) -> list[dict]:
+    """Veredito e `alerta_risco` dos dois formatos, caso a caso, com o LLM simulado."""
+    execucoes = []
+    for caso in casos:
+        legado = await _rodar_simulado(caso, _contexto_legado)
+        compacto = await _rodar_simulado(caso, _montar_contexto)
+        execucoes.append({
+            "caso": caso["id"],
+            "alerta_esperado": caso.get("alerta_esperado"),
+            "legado": legado,
+            "compacto": compacto,
+            "veredito_igual": legado == compacto,
+        })
+    return execucoes
+
+
+async def comparar_llm(casos: list[dict]) -> list[dict]:
+    execucoes = []
+    for caso in casos:
+        legado = await _rodar_llm(caso, _contexto_legado)
+        compacto = await _rodar_llm(caso, _montar_contexto)
+        execucao = {
+            "caso": caso["id"],
+            "alerta_esperado": caso.get("alerta_esperado"),
+            "legado": legado,
+            "compacto": compacto,
+            "veredito_igual": legado["alerta_risco"] == compacto["alerta_risco"],
+        }
+        execucoes.append(execucao)
+        print(
+            f"{caso['id']:38} legado={legado['tokens_entrada']} "
+            f"compacto={compacto['tokens_entrada']} "
+            f"alerta={legado['alerta_risco']}/{compacto['alerta_risco']}"
+        )
+    return execucoes
+
+
+def _reducao_por_etapa(execucoes: list[dict]) -> dict[str, dict]:
+    resumo = {}
+    for etapa in ETAPAS:
+        legado = sum(e["legado"]["tokens_entrada"][etapa] for e in execucoes)
+        compacto = sum(e["compacto"]["tokens_entrada"][etapa] for e in execucoes)
+        resumo[etapa] = {
+            "legado": legado,
+            "compacto": compacto,
+            "reducao": round(1 - compacto / legado, 3) if legado else 0.0,
+        }
+    return resumo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--llm", action="store_true", help="Compara também com o LLM real")
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o relatório completo")
+    args = parser.parse_args()
+
+    casos = carregar_casos()
+    verificacoes = [verificar_caso(caso) for caso in casos]
+    for v in verificacoes:
+        print(
+            f"{v['caso']:38} lupa {v['tokens_lupa_legado']:5} → {v['tokens_lupa_compacto']:5} "
+            f"(-{v['reducao']:.0%})" + (f"  FALHA: {'; '.join(v['problemas'])}" if v["problemas"] else "")
+        )
+
+    total_legado = sum(v["tokens_lupa_legado"] for v in verificacoes)
+    total_compacto = sum(v["tokens_lupa_compacto"] for v in verificacoes)
+    relatorio = {
+        "tokenizador": "cl100k_base" if _codificador is not None else "estimativa_4_caracteres",
+        "lupa": {
+            "legado": total_legado,
+            "compacto": total_compacto,
+            "reducao": round(1 - total_compacto / total_legado, 3),
+        },
+        "casos": verificacoes,
+    }
+    falhas = [v for v in verificacoes if v["problemas"]]
+
+    print("\n── Resumo ──")
+    print(f"Lupa (entrada): {total_legado} → {total_compacto} tokens (-{relatorio['lupa']['reducao']:.0%})")
+
+    simuladas = asyncio.run(comparar_simulado(casos))
+    relatorio["llm_simulado"] = simuladas
+    divergentes = [e["caso"] for e in simuladas if not e["veredito_igual"]]
+    print(
+        f"Vereditos com LLM simulado: {len(simuladas) - len(divergentes)}/{len(simuladas)} iguais"
+        + (f" — divergentes: {divergentes}" if divergentes else "")
+    )
+    falhas += divergentes
+
+    if args.llm:
+        execucoes = asyncio.run(comparar_llm(casos))
+        relatorio["llm"] = {
+            "por_etapa": _reducao_por_etapa(execucoes),
+            "execucoes": execucoes,
+        }
+        for etapa, r in relatorio["llm"]["por_etapa"].items():
+            print(f"{etapa:8} {r['legado']:6} → {r['compacto']:6} tokens (-{r['reducao']:.0%})")
+        divergentes = [e["caso"] for e in execucoes if not e["veredito_igual"]]
+        if divergentes:
+            print(f"Vereditos divergentes: {divergentes}")
+            falhas += divergentes
+
+    print(f"Casos com divergência: {len(falhas)}")
+    if args.saida:
+        Path(args.saida).write_text(
+            json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"Relatório gravado em {args.saida}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+LLM local compatível com a OpenAI — SEPET
+Substituto do MiniMax para os benchmarks: responde em
+`/v1/chat/completions` (com e sem `stream`, inclusive a saída estruturada
+do modo `single`) reproduzindo as respostas de um arquivo, com latência
+configurável: tempo até o primeiro token + tempo por token de saída, ambos
+com jitter, e uma fração opcional de erros 500/429.
+
+A etapa de cada chamada (Lupa, Juiz, Relator, Relator em texto, Único) é
+reconhecida pelo prompt de sistema; a resposta reproduzida é escolhida
+entre as gravadas para a etapa por um hash da mensagem do usuário, então
+a mesma triagem recebe sempre a mesma resposta.
+
+O arquivo versionado (`benchmarks/fixtures/respostas_llm.json`) traz
+respostas de exemplo no formato de cada etapa. Para gravar respostas
+reais, rode em modo proxy (`--gravar`): as chamadas
+são repassadas ao MiniMax (`--upstream`, com a MINIMAX_API_KEY de quem
+chama) e cada resposta é acrescentada ao arquivo de respostas. Por
+exemplo, com `MINIMAX_BASE_URL=http://127.0.0.1:8089/v1`, o benchmark
+`comparar_modos` grava uma resposta de cada etapa por triagem.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.llm_local --porta 8089
+    python -m benchmarks.llm_local --porta 8089 --gravar benchmarks/fixtures/respostas_llm.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+RESPOSTAS = Path(__file__).parent / "fixtures" / "respostas_llm.json"
+UPSTREAM = "https://api.minimaxi.chat/v1"
+
+ETAPA_LUPA = "lupa"
+ETAPA_JUIZ = "juiz"
+ETAPA_RELATOR = "relator"
+ETAPA_RELATOR_TEXTO = "relator_texto"
+ETAPA_UNICO = "unico"
+
+
+def etapa_da_chamada(corpo: dict) -> str:
+    """Reconhece a etapa do pipeline pelo prompt de sistema (ou pelo schema)."""
+    if corpo.get("response_format", {}).get("type") == "json_schema":
+        return ETAPA_UNICO
+    sistema = next(
+        (m.get("content", "") for m in corpo.get("messages", []) if m.get("role") == "system"),
+        "",
+    )
+    if "Analista de Triagem" in sistema:
+        return ETAPA_LUPA
+    if "Auditor de Segurança" in sistema:
+        return ETAPA_JUIZ
+    if "Redator" in sistema:
+        return ETAPA_RELATOR if "formato JSON" in sistema else ETAPA_RELATOR_TEXTO
+    return ETAPA_UNICO
+
+
+def _mensagem_usuario(corpo: dict) -> str:
+    return next(
+        (m.get("content", "") for m in reversed(corpo.get("messages", [])) if m.get("role") == "user"),
+        "",
+    )
+
+
+def _estimar_tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+class LlmLocal:
+    """Servidor ASGI que reproduz (ou grava) respostas do MiniMax."""
+
+    def __init__(
+        self,
+        respostas: Path = RESPOSTAS,
+        ttft_ms: float = 300,
+        ms_por_token: float = 4,
+        jitter: float = 0.25,
+        taxa_erro: float = 0.0,
+        gravar: bool = False,
+        upstream: str = UPSTREAM,
+        semente: int = 0,
+    ):
+        self.caminho = respostas
+        self.ttft_ms = ttft_ms
+        self.ms_por_token = ms_por_token
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.gravar = gravar
+        self.upstream = upstream.rstrip("/")
+        self._rng = random.Random(semente)
+        self.chamadas: dict[str, int] = {}
+        dados = json.loads(respostas.read_text(encoding="utf-8")) if respostas.exists() else {}
+        self.respostas: dict[str, list[dict]] = dados.get("respostas", {})
+        self.app = Starlette(routes=[
+            Route("/v1/chat/completions", self._completions, methods=["POST"]),
+        ])
+
+    def _variar(self, valor: float) -> float:
+        return max(0.0, valor * (1 + self._rng.gauss(0, self.jitter)))
+
+    def _escolher(self, etapa: str, corpo: dict) -> dict:
+        gravadas = self.respostas.get(etapa)
+        if not gravadas:
+            raise KeyError(f"Nenhuma resposta gravada para a etapa {etapa!r} em {self.caminho}")
+        chave = hashlib.sha256(_mensagem_usuario(corpo).encode()).digest()
+        return gravadas[int.from_bytes(chave[:4], "big") % len(gravadas)]
+
+    async def _gravar(self, etapa: str, request: Request, corpo: dict) -> dict:
+        """Repassa a chamada ao MiniMax (sem stream) e guarda a resposta."""
+        async with httpx.AsyncClient(timeout=120) as cliente:
+            resposta = await cliente.post(
+                f"{self.upstream}/chat/completions",
+                json={
+                    **{k: v for k, v in corpo.items() if k not in ("stream", "stream_options")},
+                    "stream": False,
+                },
+                headers={"Authorization": request.headers.get("authorization", "")},
+            )
+        resposta.raise_for_status()
+        dados = resposta.json()
+        uso = dados.get("usage") or {}
+        gravada = {
+            "conteudo": dados["choices"][0]["message"]["content"],
+            "tokens_entrada": uso.get("prompt_tokens"),
+            "tokens_saida": uso.get("completion_tokens"),
+        }
+        self.respostas.setdefault(etapa, []).append(gravada)
+        self.caminho.write_text(
+            json.dumps({"versao": 1, "respostas": self.respostas}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        return gravada
+
+    async def _completions(self, request: Request) -> Response:
+        corpo = json.loads(await request.body())
+        etapa = etapa_da_chamada(corpo)
+        self.chamadas[etapa] = self.chamadas.get(etapa, 0) + 1
+
+        if self.gravar:
+            gravada = await self._gravar(etapa, request, corpo)
+        else:
+            if self.taxa_erro and self._rng.random() < self.taxa_erro:
+                await asyncio.sleep(self._variar(self.ttft_ms) / 1000)
+                status = self._rng.choice([500, 429])
+                return JSONResponse(
+                    {"error": {"message": "erro simulado", "type": "server_error"}}, status_code=status
+                )
+            gravada = self._escolher(etapa, corpo)
+
+        conteudo = gravada["conteudo"]
+        uso = {
+            "prompt_tokens": gravada.get("tokens_entrada") or _estimar_tokens(_mensagem_usuario(corpo)),
+            "completion_tokens": gravada.get("tokens_saida") or _estimar_tokens(conteudo),
+        }
+        uso["total_tokens"] = uso["prompt_tokens"] + uso["completion_tokens"]
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": corpo.get("model", "MiniMax-Text-01"),
+        }
+        atraso_token = self.ms_por_token / 1000 if not self.gravar else 0
+        ttft = self._variar(self.ttft_ms) / 1000 if not self.gravar else 0
+
+        if corpo.get("stream"):
+            return StreamingResponse(
+                self._stream(base, conteudo, uso, ttft, atraso_token, corpo),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(ttft + self._variar(atraso_token * uso["completion_tokens"]))
+        return JSONResponse({
+            **base,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": conteudo, "refusal": None},
+                "finish_reason": "stop",
+            }],
+            "usage": uso,
+        })
+
+    async def _stream(self, base, conteudo, uso, ttft, atraso_token, corpo):
+        def pedaco(delta: dict, finish=None, **extra) -> str:
+            dados = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            return f"data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+        await asyncio.sleep(ttft)
+        yield pedaco({"role": "assistant", "content": ""})
+        palavras = conteudo.split(" ")
+        tokens_por_palavra = uso["completion_tokens"] / max(1, len(palavras))
+        for i, palavra in enumerate(palavras):
+            await asyncio.sleep(self._variar(atraso_token * tokens_por_palavra))
+            yield pedaco({"content": palavra if i == 0 else f" {palavra}"})
+        yield pedaco({}, finish="stop")
+        if (corpo.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': uso})}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--respostas", type=Path, default=RESPOSTAS)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="Tempo até o primeiro token")
+    parser.add_argument("--ms-por-token", type=float, default=4, help="Tempo por token de saída")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Desvio relativo das latências")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500/429")
+    parser.add_argument("--gravar", type=Path, help="Modo proxy: grava as respostas do MiniMax neste arquivo")
+    parser.add_argument("--upstream", default=UPSTREAM)
+    args = parser.parse_args()
+
+    servidor = LlmLocal(
+        args.gravar or args.respostas,
+        args.ttft_ms,
+        args.ms_por_token,
+        args.jitter,
+        args.taxa_erro,
+        gravar=args.gravar is not None,
+        upstream=args.upstream,
+    )
+    uvicorn.run(servidor.app, host="127.0.0.1", port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
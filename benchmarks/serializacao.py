@@ -0,0 +1,212 @@
+"""
+Serialização das respostas — SEPET
+Mede o tempo para transformar linhas do banco no corpo JSON das respostas,
+por 10 mil linhas, em três caminhos:
+
+  - legado: um modelo por linha na rota + `jsonable_encoder` + `json.dumps`
+    (o que o FastAPI faz sem o atalho de serialização do Pydantic)
+  - antes: um modelo por linha na rota + revalidação da lista no
+    `response_model` + `dump_json` (FastAPI recente)
+  - depois: `app.serializacao.serializar_lista`, as linhas recortadas nas
+    colunas do modelo e a página inteira serializada pelo `orjson`
+
+Cobre `GET /agendamentos/` e `GET /triagens/` (com e sem `fields=`), e os
+dicionários do comprovante em JSON, em que o `json.dumps` é comparado ao
+`orjson`. Linhas sintéticas, sem banco.
+
+Sai com código 1 se algum caminho gerar um JSON diferente do legado.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.serializacao
+    python -m benchmarks.serializacao --linhas 50000 --repeticoes 7 --saida serializacao.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+from app.models import AgendamentoResponse, TriagemCreate, TriagemResponse
+from app.serializacao import para_json, serializar_lista
+from app.services.comprovante import gerar_comprovante_json
+
+POR_LINHAS = 10_000
+
+_PERGUNTAS = [campo for campo in TriagemCreate.model_fields if campo != "observacoes"]
+
+
+def _agendamentos(n: int, rng: random.Random) -> list[dict]:
+    inicio = date(2026, 1, 5)
+    return [
+        {
+            "id": f"ag-{i:08d}",
+            "tenant_id": "clinica-a",
+            "nome_tutor": f"Tutor {i}",
+            "cpf_tutor": f"{rng.randrange(10**11):011d}",
+            "nome_animal": rng.choice(["Mel", "Thor", "Luna", "Bidu", "Nina"]),
+            "especie": rng.choice(["Canina", "Felina"]),
+            "raca": "SRD",
+            "porte": rng.choice(["P", "M", "G", "XG"]),
+            "data_atendimento": (inicio + timedelta(days=i % 90)).isoformat(),
+            "status_ia": rng.choice(["Pendente", "Em análise", "Analisado", "Falhou"]),
+            "created_at": f"2026-01-01T12:{i % 60:02d}:00+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def _triagens(n: int, rng: random.Random) -> list[dict]:
+    linhas = []
+    for i in range(n):
+        respostas = {pergunta: rng.random() < 0.2 for pergunta in _PERGUNTAS}
+        respostas["observacoes"] = "Sem intercorrências." if i % 3 else ""
+        respostas["_meta_pet"] = {
+            "idade_anos": i % 15, "idade_meses": i % 12, "sexo": "F", "peso_kg": 8.5,
+        }
+        linhas.append({
+            "id": f"tr-{i:08d}",
+            "agendamento_id": f"ag-{i:08d}",
+            "respostas_triagem": respostas,
+            "alerta_risco": respostas["convulsao"] or respostas["desmaio"],
+            "parecer_ia": "Apto para o procedimento, sem achados relevantes." if i % 2 else None,
+            "created_at": f"2026-01-01T12:{i % 60:02d}:00+00:00",
+        })
+    return linhas
+
+
+def _so_campos(linhas: list[dict], campos: tuple[str, ...]) -> list[dict]:
+    """Simula `fields=`: só as colunas pedidas vêm do banco."""
+    return [{campo: linha[campo] for campo in campos} for linha in linhas]
+
+
+def _legado(modelo: type[BaseModel]) -> Callable[[list[dict]], bytes]:
+    def serializar(linhas: list[dict]) -> bytes:
+        itens = [modelo(**linha) for linha in linhas]
+        conteudo = jsonable_encoder(itens, exclude_unset=True)
+        return json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode()
+    return serializar
+
+
+def _antes(modelo: type[BaseModel]) -> Callable[[list[dict]], bytes]:
+    adaptador = TypeAdapter(list[modelo])
+
+    def serializar(linhas: list[dict]) -> bytes:
+        itens = [modelo(**linha) for linha in linhas]
+        return adaptador.dump_json(adaptador.validate_python(itens), exclude_unset=True)
+    return serializar
+
+
+def _depois(modelo: type[BaseModel]) -> Callable[[list[dict]], bytes]:
+    return lambda linhas: serializar_lista(modelo, linhas)
+
+
+def _comprovante_legado(dados: list[dict]) -> bytes:
+    """Um corpo por comprovante, como na rota; juntados só para conferência."""
+    corpos = [
+        json.dumps(jsonable_encoder(d), ensure_ascii=False, separators=(",", ":")).encode()
+        for d in dados
+    ]
+    return b"[" + b",".join(corpos) + b"]"
+
+
+def _comprovante_depois(dados: list[dict]) -> bytes:
+    return b"[" + b",".join([para_json(d) for d in dados]) + b"]"
+
+
+def _medir(serializar: Callable[[list], bytes], linhas: list, repeticoes: int) -> tuple[float, bytes]:
+    """Mediana do tempo por 10 mil linhas, em ms, e o JSON da última execução."""
+    serializar(linhas[:100])  # aquece caches de schema e adaptadores
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = serializar(linhas)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000 * POR_LINHAS / len(linhas), corpo
+
+
+def _equivalentes(a: bytes, b: bytes) -> bool:
+    return json.loads(a) == json.loads(b)
+
+
+def executar(n: int, repeticoes: int, semente: int) -> dict:
+    rng = random.Random(semente)
+    agendamentos = _agendamentos(n, rng)
+    triagens = _triagens(n, rng)
+    comprovantes = [
+        gerar_comprovante_json(ag, tr) for ag, tr in zip(agendamentos, triagens)
+    ]
+
+    cenarios = [
+        ("agendamentos", AgendamentoResponse, agendamentos),
+        ("agendamentos_fields", AgendamentoResponse,
+         _so_campos(agendamentos, ("id", "nome_animal", "data_atendimento", "status_ia"))),
+        ("triagens", TriagemResponse, triagens),
+        ("triagens_fields", TriagemResponse,
+         _so_campos(triagens, ("id", "alerta_risco", "parecer_ia"))),
+    ]
+
+    relatorio = {"linhas": n, "repeticoes": repeticoes, "ms_por_10k_linhas": {}, "divergencias": []}
+    for nome, modelo, linhas in cenarios:
+        caminhos = {
+            "legado": _legado(modelo),
+            "antes": _antes(modelo),
+            "depois": _depois(modelo),
+        }
+        resultado, referencia = {}, None
+        for caminho, serializar in caminhos.items():
+            ms, corpo = _medir(serializar, linhas, repeticoes)
+            resultado[caminho] = round(ms, 2)
+            if referencia is None:
+                referencia = corpo
+            elif not _equivalentes(referencia, corpo):
+                relatorio["divergencias"].append(f"{nome}/{caminho}")
+        resultado["ganho_sobre_antes"] = round(resultado["antes"] / resultado["depois"], 2)
+        relatorio["ms_por_10k_linhas"][nome] = resultado
+
+    legado_ms, legado_corpo = _medir(_comprovante_legado, comprovantes, repeticoes)
+    depois_ms, depois_corpo = _medir(_comprovante_depois, comprovantes, repeticoes)
+    resultado = {
+        "legado": round(legado_ms, 2),
+        "depois": round(depois_ms, 2),
+        "ganho_sobre_legado": round(legado_ms / depois_ms, 2),
+    }
+    if not _equivalentes(legado_corpo, depois_corpo):
+        relatorio["divergencias"].append("comprovante_json/depois")
+    relatorio["ms_por_10k_linhas"]["comprovante_json"] = resultado
+    return relatorio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--linhas", type=int, default=POR_LINHAS)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o relatório completo")
+    args = parser.parse_args()
+
+    relatorio = executar(args.linhas, args.repeticoes, args.semente)
+
+    print(f"── ms por {POR_LINHAS} linhas (mediana de {args.repeticoes}) ──")
+    for nome, resultado in relatorio["ms_por_10k_linhas"].items():
+        print(f"[{nome}] " + " | ".join(f"{k}={v}" for k, v in resultado.items()))
+
+    if args.saida:
+        Path(args.saida).write_text(
+            json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"Relatório gravado em {args.saida}")
+
+    if relatorio["divergencias"]:
+        print(f"JSON divergente em: {', '.join(relatorio['divergencias'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
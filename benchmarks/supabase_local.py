@@ -0,0 +1,498 @@
+"""
+Supabase local (PostgREST em memória) — SEPET
+Substituto do PostgREST para os benchmarks: guarda `agendamentos`,
+`triagens`, `capacidade_atendimento` e `ocupacao_diaria` em memória e
+responde ao subconjunto da API REST que `app/repositorio.py` usa:
+
+  - `select` com recursos embutidos (`triagens(...)`, `triagens!inner(...)`,
+    `agendamentos(...)`, `agendamentos!inner()`)
+  - filtros `eq`, `neq`, `gt`, `gte`, `lt`, `lte`, `in`, `is`, `not.*` e
+    `or=(...)` (inclusive `and(...)` aninhado, usado pelo cursor keyset),
+    também sobre colunas do recurso embutido (`triagens.alerta_risco`)
+  - `order`, `limit`, contagem `Prefer: count=exact` (inclusive `HEAD`)
+  - `POST` (insert), `PATCH` (update) e `DELETE`
+  - as RPCs de `supabase/migrations/`: `criar_agendamento_com_triagem`
+    (com a reserva de vagas em `ocupacao_diaria`), `registrar_analise` e
+    `painel_totais`
+
+Cada requisição espera uma latência configurável (base + jitter gaussiano)
+antes de responder, simulando a ida e volta ao banco.
+
+Uso isolado (a partir da raiz do projeto):
+    python -m benchmarks.supabase_local --porta 54321 --agendamentos 5000
+e aponte `SUPABASE_URL=http://127.0.0.1:54321` para ele.
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Relações embutíveis: (tabela, recurso) → (coluna local, coluna remota, muitos?)
+_RELACOES = {
+    ("agendamentos", "triagens"): ("id", "agendamento_id", True),
+    ("triagens", "agendamentos"): ("agendamento_id", "id", False),
+}
+
+_PARAMETROS_ESPECIAIS = {"select", "order", "limit", "offset", "or", "columns", "on_conflict"}
+
+_PESOS_PORTE = {"G": 2, "XG": 3}
+
+
+# ── Parser da sintaxe do PostgREST ───────────
+
+def _dividir(texto: str) -> list[str]:
+    """Divide por vírgulas fora de parênteses e de aspas."""
+    partes, atual, nivel, aspas = [], [], 0, False
+    anterior = ""
+    for c in texto:
+        if c == '"' and anterior != "\\":
+            aspas = not aspas
+        elif not aspas and c == "(":
+            nivel += 1
+        elif not aspas and c == ")":
+            nivel -= 1
+        if c == "," and nivel == 0 and not aspas:
+            partes.append("".join(atual))
+            atual = []
+        else:
+            atual.append(c)
+        anterior = c
+    if atual:
+        partes.append("".join(atual))
+    return partes
+
+
+def _sem_aspas(valor: str) -> str:
+    if len(valor) >= 2 and valor[0] == valor[-1] == '"':
+        return valor[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return valor
+
+
+def _ler_select(texto: str) -> tuple[list[str], dict[str, tuple[list[str], bool]]]:
+    """`id,triagens!inner(id)` → (colunas, {recurso: (colunas, inner)})."""
+    colunas, embutidos = [], {}
+    for item in _dividir(texto or "*"):
+        item = item.strip()
+        if "(" in item:
+            nome, _, resto = item.partition("(")
+            nome, _, dica = nome.partition("!")
+            embutidos[nome] = ([c for c in _dividir(resto[:-1]) if c.strip()], dica == "inner")
+        elif item:
+            colunas.append(item)
+    return colunas, embutidos
+
+
+def _texto(valor) -> str:
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if valor is None:
+        return "null"
+    return str(valor)
+
+
+def _comparar(valor, operador: str, criterio: str) -> bool:
+    if operador.startswith("not."):
+        return not _comparar(valor, operador[4:], criterio)
+    if operador == "is":
+        return _texto(valor) == criterio
+    if operador == "in":
+        return _texto(valor) in {_sem_aspas(v) for v in _dividir(criterio[1:-1])}
+    if valor is None:
+        return False
+    criterio = _sem_aspas(criterio)
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        valor, criterio = float(valor), float(criterio)
+    else:
+        valor = _texto(valor)
+    if operador == "eq":
+        return valor == criterio
+    if operador == "neq":
+        return valor != criterio
+    if operador == "gt":
+        return valor > criterio
+    if operador == "gte":
+        return valor >= criterio
+    if operador == "lt":
+        return valor < criterio
+    if operador == "lte":
+        return valor <= criterio
+    raise ValueError(f"Operador não suportado: {operador}")
+
+
+def _condicao(expressao: str):
+    """`created_at.lt."x"` ou `and(...)`/`or(...)` → função linha → bool."""
+    for logico, combinar in (("and(", all), ("or(", any)):
+        if expressao.startswith(logico):
+            partes = [_condicao(p) for p in _dividir(expressao[len(logico):-1])]
+            return lambda linha: combinar(p(linha) for p in partes)
+    coluna, _, resto = expressao.partition(".")
+    operador, _, criterio = resto.partition(".")
+    if operador == "not":
+        negado, _, criterio = criterio.partition(".")
+        operador = f"not.{negado}"
+    return lambda linha: _comparar(linha.get(coluna), operador, criterio)
+
+
+def _filtro(coluna: str, valor: str):
+    operador, _, criterio = valor.partition(".")
+    if operador == "not":
+        negado, _, criterio = criterio.partition(".")
+        operador = f"not.{negado}"
+    return lambda linha: _comparar(linha.get(coluna), operador, criterio)
+
+
+# ── Banco em memória ─────────────────────────
+
+class _ErroPostgrest(Exception):
+    def __init__(self, status: int, codigo: str, mensagem: str):
+        self.status = status
+        self.codigo = codigo
+        super().__init__(mensagem)
+
+
+class BancoLocal:
+    """Tabelas em memória e o app ASGI que as expõe como o PostgREST."""
+
+    def __init__(self, latencia_ms: float = 0, jitter_ms: float = 0, semente: int = 0):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(semente)
+        self._relogio = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.tabelas: dict[str, list[dict]] = {
+            "agendamentos": [],
+            "triagens": [],
+            "capacidade_atendimento": [],
+            "ocupacao_diaria": [],
+        }
+        self._por_id: dict[str, dict[str, dict]] = defaultdict(dict)
+        self._triagens_por_agendamento: dict[str, list[dict]] = defaultdict(list)
+        self.requisicoes = 0
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{funcao}", self._rpc, methods=["POST"]),
+            Route("/rest/v1/{tabela}", self._tabela, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        ])
+
+    # ── Escrita direta (carga inicial e RPCs) ──
+
+    def _agora(self) -> str:
+        # Sempre crescente: a ordem de inserção é a ordem de created_at
+        self._relogio += timedelta(microseconds=self._rng.randint(1, 5000))
+        return self._relogio.isoformat()
+
+    def inserir(self, tabela: str, linha: dict) -> dict:
+        if tabela not in self.tabelas:
+            raise _ErroPostgrest(404, "PGRST205", f"Could not find the table 'public.{tabela}'")
+        linha = dict(linha)
+        if tabela in ("agendamentos", "triagens"):
+            linha.setdefault("id", str(uuid.uuid4()))
+            linha.setdefault("created_at", self._agora())
+        if tabela == "triagens":
+            linha.setdefault("alerta_risco", False)
+            linha.setdefault("parecer_ia", None)
+            self._triagens_por_agendamento[linha.get("agendamento_id")].append(linha)
+        if "id" in linha:
+            self._por_id[tabela][linha["id"]] = linha
+        self.tabelas[tabela].append(linha)
+        return linha
+
+    def _remover(self, tabela: str, linhas: list[dict]) -> None:
+        ids = {id(linha) for linha in linhas}
+        self.tabelas[tabela] = [l for l in self.tabelas[tabela] if id(l) not in ids]
+        for linha in linhas:
+            self._por_id[tabela].pop(linha.get("id"), None)
+            if tabela == "triagens":
+                irmas = self._triagens_por_agendamento[linha.get("agendamento_id")]
+                irmas[:] = [t for t in irmas if t is not linha]
+
+    def _reservar_vaga(self, tenant_id: str, dia: str, especie: str, peso: int, vagas_padrao):
+        capacidade = {
+            c["especie"]: c["vagas"]
+            for c in self.tabelas["capacidade_atendimento"] if c["tenant_id"] == tenant_id
+        }
+        grupo = especie if especie in capacidade else "*"
+        vagas = capacidade.get(grupo, vagas_padrao)
+        ocupacao = next(
+            (o for o in self.tabelas["ocupacao_diaria"]
+             if o["tenant_id"] == tenant_id and o["data"] == dia and o["grupo"] == grupo),
+            None,
+        )
+        ocupadas = ocupacao["ocupadas"] if ocupacao else 0
+        if vagas is not None and ocupadas + peso > vagas:
+            raise _ErroPostgrest(400, "SEP01", f"Sem vagas para {grupo} em {dia}")
+        if ocupacao is None:
+            self.inserir("ocupacao_diaria", {
+                "tenant_id": tenant_id, "data": dia, "grupo": grupo, "ocupadas": peso,
+            })
+        else:
+            ocupacao["ocupadas"] += peso
+
+    def criar_agendamento_com_triagem(
+        self, agendamento: dict, triagem: dict, peso: int = 1, vagas_padrao: int | None = None
+    ) -> dict:
+        self._reservar_vaga(
+            agendamento["tenant_id"], agendamento["data_atendimento"],
+            agendamento.get("especie", ""), peso, vagas_padrao,
+        )
+        criado = self.inserir("agendamentos", agendamento)
+        triagem = self.inserir("triagens", {**triagem, "agendamento_id": criado["id"]})
+        return {"agendamento": criado, "triagem_id": triagem["id"]}
+
+    def popular(
+        self,
+        tenants: list[str],
+        por_tenant: int,
+        casos: list[dict],
+        inicio: date,
+        dias: int,
+        fracao_analisada: float = 0.7,
+    ) -> None:
+        """Carga inicial: agendamentos com triagem a partir dos casos gravados."""
+        status = ["Analisado", "Pendente", "Falhou"]
+        for n in range(por_tenant):
+            for tenant_id in tenants:
+                caso = self._rng.choice(casos)
+                pet = caso["pet_info"]
+                analisado = self._rng.random() < fracao_analisada
+                dia = (inicio + timedelta(days=n % dias)).isoformat()
+                agendamento = {
+                    "tenant_id": tenant_id,
+                    "nome_tutor": f"Tutor {n}",
+                    "cpf_tutor": f"{self._rng.randrange(10**11):011d}",
+                    "nome_animal": pet["pet_nome"],
+                    "especie": pet["pet_especie"],
+                    "raca": pet["pet_raca"],
+                    "porte": pet["pet_porte"],
+                    "data_atendimento": dia,
+                    "status_ia": status[0] if analisado else self._rng.choice(status[1:]),
+                }
+                # Peso e idade variam de pet para pet, como nas triagens reais
+                respostas = dict(caso["respostas_triagem"])
+                respostas["_meta_pet"] = {
+                    **respostas.get("_meta_pet", {}),
+                    "idade_anos": self._rng.randint(0, 14),
+                    "peso_kg": round(self._rng.uniform(2, 40), 1),
+                }
+                triagem = {
+                    "tenant_id": tenant_id,
+                    "respostas_triagem": respostas,
+                    "alerta_risco": analisado and caso["alerta_esperado"],
+                    "parecer_ia": f"Parecer de {pet['pet_nome']}." if analisado else None,
+                }
+                self.criar_agendamento_com_triagem(
+                    agendamento, triagem, _PESOS_PORTE.get(pet["pet_porte"], 1)
+                )
+
+    # ── Consultas ──
+
+    def _embutir(self, tabela: str, linha: dict, recurso: str) -> list[dict] | dict | None:
+        local, remota, muitos = _RELACOES[(tabela, recurso)]
+        if muitos:
+            return self._triagens_por_agendamento.get(linha.get(local), [])
+        return self._por_id[recurso].get(linha.get(local))
+
+    def consultar(self, tabela: str, parametros: list[tuple[str, str]]) -> list[dict]:
+        if tabela not in self.tabelas:
+            raise _ErroPostgrest(404, "PGRST205", f"Could not find the table 'public.{tabela}'")
+        params = dict(parametros)
+        colunas, embutidos = _ler_select(params.get("select", "*"))
+        filtros, filtros_embutidos = [], defaultdict(list)
+        for chave, valor in parametros:
+            if chave in _PARAMETROS_ESPECIAIS:
+                continue
+            recurso, ponto, coluna = chave.partition(".")
+            if ponto and recurso in embutidos:
+                filtros_embutidos[recurso].append(_filtro(coluna, valor))
+            else:
+                filtros.append(_filtro(chave, valor))
+        if "or" in params:
+            filtros.append(_condicao(f"or{params['or']}"))
+
+        linhas = self.tabelas[tabela]
+        ordem = params.get("order", "")
+        if ordem == "created_at.desc,id.desc":
+            linhas = reversed(linhas)
+        elif ordem:
+            for item in reversed(ordem.split(",")):
+                coluna, _, direcao = item.partition(".")
+                linhas = sorted(
+                    linhas, key=lambda l: _texto(l.get(coluna)), reverse=direcao.startswith("desc")
+                )
+        limite = int(params["limit"]) if "limit" in params else None
+
+        resultado = []
+        for linha in linhas:
+            if not all(f(linha) for f in filtros):
+                continue
+            saida = {c: linha.get(c) for c in colunas} if colunas != ["*"] else dict(linha)
+            descartar = False
+            for recurso, (colunas_recurso, inner) in embutidos.items():
+                valor = self._embutir(tabela, linha, recurso)
+                filtros_recurso = filtros_embutidos.get(recurso, [])
+                relacionadas = valor if isinstance(valor, list) else [valor] if valor else []
+                relacionadas = [r for r in relacionadas if all(f(r) for f in filtros_recurso)]
+                if inner and not relacionadas:
+                    descartar = True
+                    break
+                if colunas_recurso:
+                    projetadas = [
+                        {c: r.get(c) for c in colunas_recurso} if colunas_recurso != ["*"] else dict(r)
+                        for r in relacionadas
+                    ]
+                    saida[recurso] = projetadas if isinstance(valor, list) else (
+                        projetadas[0] if projetadas else None
+                    )
+            if descartar:
+                continue
+            resultado.append(saida)
+            if limite is not None and len(resultado) >= limite:
+                break
+        return resultado
+
+    def _linhas_filtradas(self, tabela: str, parametros: list[tuple[str, str]]) -> list[dict]:
+        """Linhas originais (não copiadas) que passam nos filtros, para escrita."""
+        filtros = [
+            _filtro(chave, valor) for chave, valor in parametros if chave not in _PARAMETROS_ESPECIAIS
+        ]
+        return [linha for linha in self.tabelas[tabela] if all(f(linha) for f in filtros)]
+
+    # ── RPCs ──
+
+    def _registrar_analise(self, p_triagem_id, p_tenant_id, p_alerta_risco, p_parecer_ia, p_status_ia):
+        triagem = self._por_id["triagens"].get(p_triagem_id)
+        if triagem is None or triagem["tenant_id"] != p_tenant_id:
+            return None
+        triagem["alerta_risco"] = p_alerta_risco
+        triagem["parecer_ia"] = p_parecer_ia
+        agendamento = self._por_id["agendamentos"].get(triagem["agendamento_id"])
+        if agendamento is None:
+            return None
+        agendamento["status_ia"] = p_status_ia
+        return agendamento["id"]
+
+    def _painel_totais(self, p_tenant_id, p_data_inicio=None, p_data_fim=None, p_especie=None):
+        base = []
+        for ag in self.tabelas["agendamentos"]:
+            if ag["tenant_id"] != p_tenant_id:
+                continue
+            if p_data_inicio and ag["data_atendimento"] < p_data_inicio:
+                continue
+            if p_data_fim and ag["data_atendimento"] > p_data_fim:
+                continue
+            if p_especie and ag["especie"] != p_especie:
+                continue
+            triagens = self._triagens_por_agendamento.get(ag["id"]) or [{}]
+            for tr in triagens:
+                base.append((ag, tr))
+        por_status, por_data = defaultdict(int), defaultdict(lambda: [0, 0])
+        for ag, tr in base:
+            por_status[ag["status_ia"]] += 1
+            por_data[ag["data_atendimento"]][0] += 1
+            por_data[ag["data_atendimento"]][1] += bool(tr.get("alerta_risco"))
+        return {
+            "agendamentos": len(base),
+            "alertas_risco": sum(1 for _, tr in base if tr.get("alerta_risco")),
+            "com_parecer": sum(1 for _, tr in base if tr.get("parecer_ia") is not None),
+            "por_status": dict(por_status),
+            "por_data": [
+                {"data": dia, "total": total, "alertas": alertas}
+                for dia, (total, alertas) in sorted(por_data.items())
+            ],
+        }
+
+    # ── HTTP ──
+
+    async def _esperar(self) -> None:
+        self.requisicoes += 1
+        atraso = self.latencia_ms + (self._rng.gauss(0, self.jitter_ms) if self.jitter_ms else 0)
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+
+    @staticmethod
+    def _erro(e: _ErroPostgrest) -> JSONResponse:
+        return JSONResponse(
+            {"code": e.codigo, "message": str(e), "details": None, "hint": None},
+            status_code=e.status,
+        )
+
+    async def _rpc(self, request: Request) -> Response:
+        await self._esperar()
+        funcoes = {
+            "criar_agendamento_com_triagem": lambda p: self.criar_agendamento_com_triagem(
+                p["p_agendamento"], p["p_triagem"], p.get("p_peso", 1), p.get("p_vagas_padrao")
+            ),
+            "registrar_analise": lambda p: self._registrar_analise(**p),
+            "painel_totais": lambda p: self._painel_totais(**p),
+        }
+        funcao = request.path_params["funcao"]
+        if funcao not in funcoes:
+            return self._erro(_ErroPostgrest(404, "PGRST202", f"Could not find the function public.{funcao}"))
+        try:
+            resultado = funcoes[funcao](json.loads(await request.body() or b"{}"))
+        except _ErroPostgrest as e:
+            return self._erro(e)
+        return JSONResponse(resultado)
+
+    async def _tabela(self, request: Request) -> Response:
+        await self._esperar()
+        tabela = request.path_params["tabela"]
+        parametros = list(request.query_params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        try:
+            if request.method in ("GET", "HEAD"):
+                linhas = self.consultar(tabela, parametros)
+                headers = {}
+                if "count=" in prefer:
+                    # `limit` não se aplica à contagem
+                    total = len(self.consultar(
+                        tabela, [(k, v) for k, v in parametros if k != "limit"]
+                    ))
+                    headers["Content-Range"] = f"0-{len(linhas) - 1}/{total}" if linhas else f"*/{total}"
+                if request.method == "HEAD":
+                    return Response(status_code=200, headers=headers)
+                return JSONResponse(linhas, headers=headers)
+
+            if request.method == "POST":
+                corpo = json.loads(await request.body())
+                novas = [self.inserir(tabela, linha) for linha in (corpo if isinstance(corpo, list) else [corpo])]
+                return JSONResponse(novas, status_code=201)
+
+            alvos = self._linhas_filtradas(tabela, parametros)
+            if request.method == "PATCH":
+                mudancas = json.loads(await request.body())
+                for linha in alvos:
+                    linha.update(mudancas)
+            else:
+                self._remover(tabela, alvos)
+            return JSONResponse([dict(linha) for linha in alvos])
+        except _ErroPostgrest as e:
+            return self._erro(e)
+
+
+def main() -> None:
+    import uvicorn
+
+    from benchmarks.comparar_modos import carregar_casos
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--porta", type=int, default=54321)
+    parser.add_argument("--tenants", default="clinica-a,clinica-b")
+    parser.add_argument("--agendamentos", type=int, default=1000, help="Agendamentos por tenant")
+    parser.add_argument("--latencia-ms", type=float, default=5)
+    parser.add_argument("--jitter-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    banco = BancoLocal(args.latencia_ms, args.jitter_ms)
+    banco.popular(args.tenants.split(","), args.agendamentos, carregar_casos(), date.today(), 60)
+    uvicorn.run(banco.app, host="127.0.0.1", port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,14 +14,39 @@ export function setTenantId(tenantId) {
     api.defaults.headers['X-Tenant-ID'] = tenantId
 }
 
-export async function criarAgendamento(dados) {
-    const response = await api.post('/agendamentos/', dados)
+// chaveIdempotencia: a mesma em todos os reenvios de um mesmo envio do formulário
+export async function criarAgendamento(dados, chaveIdempotencia) {
+    const headers = chaveIdempotencia ? { 'Idempotency-Key': chaveIdempotencia } : {}
+    const response = await api.post('/agendamentos/', dados, { headers })
     return response.data
 }
 
-export async function listarAgendamentos() {
-    const response = await api.get('/agendamentos/')
-    return response.data
+// Listagens paginadas por cursor: o próximo cursor vem em X-Proximo-Cursor
+async function listarPagina(url, params = {}) {
+    const response = await api.get(url, { params })
+    return {
+        itens: response.data,
+        proximoCursor: response.headers['x-proximo-cursor'] || null,
+    }
+}
+
+async function listarTodasPaginas(url, params = {}) {
+    const itens = []
+    let cursor = null
+    do {
+        const pagina = await listarPagina(url, { limite: 200, ...params, cursor: cursor || undefined })
+        itens.push(...pagina.itens)
+        cursor = pagina.proximoCursor
+    } while (cursor)
+    return itens
+}
+
+export async function listarAgendamentosPagina(params = {}) {
+    return listarPagina('/agendamentos/', params)
+}
+
+export async function listarAgendamentos(params = {}) {
+    return listarTodasPaginas('/agendamentos/', params)
 }
 
 export async function obterAgendamento(id) {
@@ -29,8 +54,16 @@ export async function obterAgendamento(id) {
     return response.data
 }
 
-export async function listarTriagens() {
-    const response = await api.get('/triagens/')
+export async function listarTriagensPagina(params = {}) {
+    return listarPagina('/triagens/', params)
+}
+
+export async function listarTriagens(params = {}) {
+    return listarTodasPaginas('/triagens/', params)
+}
+
+export async function obterPainel(params = {}) {
+    const response = await api.get('/painel/', { params })
     return response.data
 }
 
@@ -44,6 +77,22 @@ export async function analisarTriagem(triagemId) {
     return response.data
 }
 
+export async function reprocessarPendentes(paralelismo) {
+    const response = await api.post('/analise/lote', null, { params: { paralelismo } })
+    return response.data
+}
+
+export async function obterProgressoLote(loteId) {
+    const response = await api.get(`/analise/lote/${loteId}`)
+    return response.data
+}
+
+// Calendário de vagas do mês (mes = 'AAAA-MM')
+export async function obterDisponibilidade(mes) {
+    const response = await api.get('/agendamentos/disponibilidade', { params: { mes } })
+    return response.data
+}
+
 export async function gerarComprovante(agendamentoId) {
     const response = await api.get(`/comprovantes/${agendamentoId}`)
     return response.data
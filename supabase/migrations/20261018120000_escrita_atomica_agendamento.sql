@@ -0,0 +1,73 @@
+-- ──────────────────────────────────────────────
+-- SEPET – escrita atômica de agendamento + triagem
+-- ──────────────────────────────────────────────
+-- Cada função roda numa única transação e é chamada pela API com um único
+-- POST /rest/v1/rpc/<função>. Os payloads JSON são convertidos com
+-- jsonb_populate_record, então os tipos vêm das próprias tabelas.
+
+-- Cria o agendamento e a triagem juntos; se qualquer insert falhar, nada
+-- é gravado. Retorna a linha do agendamento e o id da triagem.
+create or replace function public.criar_agendamento_com_triagem(
+    p_agendamento jsonb,
+    p_triagem jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_agendamento public.agendamentos;
+    v_triagem_id  public.triagens.id%type;
+begin
+    insert into public.agendamentos (
+        tenant_id, nome_tutor, cpf_tutor, nome_animal, especie, raca, porte,
+        data_atendimento, status_ia
+    )
+    select
+        tenant_id, nome_tutor, cpf_tutor, nome_animal, especie, raca, porte,
+        data_atendimento, status_ia
+    from jsonb_populate_record(null::public.agendamentos, p_agendamento)
+    returning * into v_agendamento;
+
+    insert into public.triagens (
+        agendamento_id, tenant_id, respostas_triagem, alerta_risco, parecer_ia
+    )
+    select
+        v_agendamento.id, tenant_id, respostas_triagem, alerta_risco, parecer_ia
+    from jsonb_populate_record(null::public.triagens, p_triagem)
+    returning id into v_triagem_id;
+
+    return jsonb_build_object(
+        'agendamento', to_jsonb(v_agendamento),
+        'triagem_id', v_triagem_id
+    );
+end;
+$$;
+
+-- Grava o resultado da análise na triagem e o status_ia do agendamento
+-- num único statement. Os parâmetros usam os tipos das colunas (%type) para
+-- que os filtros usem os índices das chaves. Retorna o id do agendamento (null se a triagem não
+-- existe para o tenant).
+create or replace function public.registrar_analise(
+    p_triagem_id public.triagens.id%type,
+    p_tenant_id public.triagens.tenant_id%type,
+    p_alerta_risco boolean,
+    p_parecer_ia text,
+    p_status_ia text
+)
+returns text
+language sql
+as $$
+    with triagem as (
+        update public.triagens
+           set alerta_risco = p_alerta_risco,
+               parecer_ia   = p_parecer_ia
+         where id = p_triagem_id
+           and tenant_id = p_tenant_id
+        returning agendamento_id
+    )
+    update public.agendamentos a
+       set status_ia = p_status_ia
+      from triagem t
+     where a.id = t.agendamento_id
+    returning a.id::text;
+$$;
@@ -0,0 +1,64 @@
+-- ──────────────────────────────────────────────
+-- SEPET – painel de gestão
+-- ──────────────────────────────────────────────
+
+-- Índices das listagens paginadas por keyset (created_at desc, id desc)
+-- e do join agendamento → triagem.
+create index if not exists agendamentos_tenant_created_id_idx
+    on public.agendamentos (tenant_id, created_at desc, id desc);
+create index if not exists triagens_tenant_created_id_idx
+    on public.triagens (tenant_id, created_at desc, id desc);
+create index if not exists triagens_agendamento_id_idx
+    on public.triagens (agendamento_id);
+
+-- Totais do painel calculados no banco: agendamentos, alertas de risco,
+-- pareceres, contagem por status_ia e por data de atendimento.
+create or replace function public.painel_totais(
+    p_tenant_id public.agendamentos.tenant_id%type,
+    p_data_inicio public.agendamentos.data_atendimento%type default null,
+    p_data_fim public.agendamentos.data_atendimento%type default null,
+    p_especie public.agendamentos.especie%type default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    with base as (
+        select a.status_ia, a.data_atendimento, t.alerta_risco, t.parecer_ia
+          from public.agendamentos a
+          left join public.triagens t on t.agendamento_id = a.id
+         where a.tenant_id = p_tenant_id
+           and (p_data_inicio is null or a.data_atendimento >= p_data_inicio)
+           and (p_data_fim is null or a.data_atendimento <= p_data_fim)
+           and (p_especie is null or a.especie = p_especie)
+    ),
+    por_status as (
+        select status_ia, count(*) as total from base group by status_ia
+    ),
+    por_data as (
+        select data_atendimento as data,
+               count(*) as total,
+               count(*) filter (where alerta_risco) as alertas
+          from base
+         group by data_atendimento
+    )
+    select jsonb_build_object(
+        'agendamentos', (select count(*) from base),
+        'alertas_risco', (select count(*) from base where alerta_risco),
+        'com_parecer', (select count(*) from base where parecer_ia is not null),
+        'por_status', (
+            select coalesce(jsonb_object_agg(status_ia, total), '{}'::jsonb)
+              from por_status
+        ),
+        'por_data', (
+            select coalesce(
+                jsonb_agg(
+                    jsonb_build_object('data', data, 'total', total, 'alertas', alertas)
+                    order by data
+                ),
+                '[]'::jsonb
+            )
+              from por_data
+        )
+    );
+$$;
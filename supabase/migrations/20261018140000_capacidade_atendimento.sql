@@ -0,0 +1,139 @@
+-- ──────────────────────────────────────────────
+-- SEPET – capacidade diária de atendimento
+-- ──────────────────────────────────────────────
+-- Cada tenant tem um número de vagas por dia. Uma linha com especie = '*'
+-- define o grupo geral; linhas com uma espécie criam um grupo separado só
+-- para ela (ex.: 30 vagas gerais e 10 reservadas para Felina). Sem linha,
+-- vale o padrão da API (CAPACIDADE_VAGAS_PADRAO).
+--
+-- Cada agendamento ocupa um peso conforme o porte (CAPACIDADE_PESOS_PORTE,
+-- ex.: G=2), calculado pela API. A ocupação fica materializada em
+-- `ocupacao_diaria`, mantida a cada reserva: a consulta de disponibilidade
+-- lê no máximo uma linha por dia e grupo, sem contar agendamentos.
+--
+-- tenant_id é texto nas tabelas novas e os parâmetros são convertidos com
+-- ::text, para funcionar com o tipo que `agendamentos.tenant_id` tiver.
+
+create table if not exists public.capacidade_atendimento (
+    tenant_id  text    not null,
+    especie    text    not null default '*',
+    vagas      integer not null check (vagas >= 0),
+    primary key (tenant_id, especie)
+);
+
+create table if not exists public.ocupacao_diaria (
+    tenant_id  text    not null,
+    data       date    not null,
+    grupo      text    not null,
+    ocupadas   integer not null default 0,
+    primary key (tenant_id, data, grupo)
+);
+
+-- Ocupação dos agendamentos já existentes, no grupo geral e com os pesos
+-- padrão (G=2, XG=3; demais portes = 1).
+insert into public.ocupacao_diaria (tenant_id, data, grupo, ocupadas)
+select tenant_id::text,
+       data_atendimento,
+       '*',
+       sum(case porte when 'G' then 2 when 'XG' then 3 else 1 end)
+  from public.agendamentos
+ where data_atendimento is not null
+ group by tenant_id::text, data_atendimento
+on conflict (tenant_id, data, grupo) do nothing;
+
+-- Reserva `p_peso` vagas no grupo da espécie, na data. A linha de
+-- ocupação é travada pelo upsert, então reservas concorrentes para o
+-- mesmo dia são serializadas e nunca passam da capacidade. Sem vagas,
+-- levanta SQLSTATE SEP01 (a API responde 409).
+create or replace function public.reservar_vaga(
+    p_tenant_id text,
+    p_data date,
+    p_especie text,
+    p_peso integer,
+    p_vagas_padrao integer default null
+)
+returns void
+language plpgsql
+as $$
+declare
+    v_grupo text := '*';
+    v_vagas integer := p_vagas_padrao;
+begin
+    select c.especie, c.vagas
+      into v_grupo, v_vagas
+      from public.capacidade_atendimento c
+     where c.tenant_id = p_tenant_id
+       and c.especie in (p_especie, '*')
+     order by c.especie = '*'
+     limit 1;
+    if not found then
+        v_grupo := '*';
+        v_vagas := p_vagas_padrao;
+    end if;
+
+    if v_vagas is null or p_peso <= v_vagas then
+        insert into public.ocupacao_diaria as o (tenant_id, data, grupo, ocupadas)
+        values (p_tenant_id, p_data, v_grupo, p_peso)
+        on conflict (tenant_id, data, grupo) do update
+           set ocupadas = o.ocupadas + excluded.ocupadas
+         where v_vagas is null or o.ocupadas + excluded.ocupadas <= v_vagas;
+        if found then
+            return;
+        end if;
+    end if;
+
+    raise exception 'Sem vagas para % em %', v_grupo, p_data
+        using errcode = 'SEP01',
+              detail = format('grupo=%s vagas=%s peso=%s', v_grupo, v_vagas, p_peso);
+end;
+$$;
+
+-- Substitui a versão de 20261018120000: reserva a vaga na mesma transação
+-- que cria o agendamento e a triagem.
+drop function if exists public.criar_agendamento_com_triagem(jsonb, jsonb);
+
+create or replace function public.criar_agendamento_com_triagem(
+    p_agendamento jsonb,
+    p_triagem jsonb,
+    p_peso integer default 1,
+    p_vagas_padrao integer default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_agendamento public.agendamentos;
+    v_triagem_id  public.triagens.id%type;
+begin
+    insert into public.agendamentos (
+        tenant_id, nome_tutor, cpf_tutor, nome_animal, especie, raca, porte,
+        data_atendimento, status_ia
+    )
+    select
+        tenant_id, nome_tutor, cpf_tutor, nome_animal, especie, raca, porte,
+        data_atendimento, status_ia
+    from jsonb_populate_record(null::public.agendamentos, p_agendamento)
+    returning * into v_agendamento;
+
+    perform public.reservar_vaga(
+        v_agendamento.tenant_id::text,
+        v_agendamento.data_atendimento,
+        v_agendamento.especie,
+        p_peso,
+        p_vagas_padrao
+    );
+
+    insert into public.triagens (
+        agendamento_id, tenant_id, respostas_triagem, alerta_risco, parecer_ia
+    )
+    select
+        v_agendamento.id, tenant_id, respostas_triagem, alerta_risco, parecer_ia
+    from jsonb_populate_record(null::public.triagens, p_triagem)
+    returning id into v_triagem_id;
+
+    return jsonb_build_object(
+        'agendamento', to_jsonb(v_agendamento),
+        'triagem_id', v_triagem_id
+    );
+end;
+$$;